@@ -15,7 +15,7 @@ router = APIRouter()
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(), cursor=Depends(get_db)
 ):
-    user = authenticate_user(cursor, form_data.username, form_data.password)
+    user = await authenticate_user(cursor, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -32,23 +32,25 @@ async def login_for_access_token(
 @router.post("/register", response_model=UserResponse)
 async def register_user(user_create: UserCreate, cursor=Depends(get_db)):
     # Check if user exists
-    cursor.execute("SELECT id FROM users WHERE username = %s", (user_create.username,))
-    if cursor.fetchone():
+    await cursor.execute(
+        "SELECT id FROM users WHERE username = %s", (user_create.username,)
+    )
+    if await cursor.fetchone():
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already registered",
         )
 
     # Check if email exists
-    cursor.execute("SELECT id FROM users WHERE email = %s", (user_create.email,))
-    if cursor.fetchone():
+    await cursor.execute("SELECT id FROM users WHERE email = %s", (user_create.email,))
+    if await cursor.fetchone():
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered"
         )
 
     # Create new user
     hashed_password = get_password_hash(user_create.password)
-    cursor.execute(
+    await cursor.execute(
         """
         INSERT INTO users (username, email, hashed_password, is_active)
         VALUES (%s, %s, %s, %s)
@@ -58,9 +60,9 @@ async def register_user(user_create: UserCreate, cursor=Depends(get_db)):
     )
 
     # Get the created user
-    new_user = cursor.fetchone()
+    new_user = await cursor.fetchone()
 
     # Commit the transaction (since cursor is part of a connection)
-    cursor.connection.commit()
+    await cursor.connection.commit()
 
     return new_user
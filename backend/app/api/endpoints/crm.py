@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Depends
+from typing import Any, Dict
+
+from app.services.auth import get_current_active_user
+from app.services.crm_adapters import get_crm_adapter
+
+router = APIRouter()
+
+
+@router.get("/status", response_model=Dict[str, Any])
+async def crm_status(_current_user: dict = Depends(get_current_active_user)):
+    """
+    State of the CRM integration: circuit breaker (closed, open or
+    half_open), requests in flight and rate limit.
+    """
+    return get_crm_adapter().stats()
@@ -1,95 +1,129 @@
-from fastapi import APIRouter, Depends
-from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Any, Dict, Literal
 
 
 from app.db.init_db import get_db
 from app.services.auth import get_current_active_user
+from app.services.cache import dashboard_stats_cache
 from app.models.schemas import DashboardStats
 
 router = APIRouter()
 
+# Bucket width, label format and most buckets per window for each supported
+# granularity. Labels are the keys of the series, so they must stay unique
+# over the longest window: hour labels carry the date, minute windows span
+# at most a day.
+GRANULARITIES = {
+    "minute": ("1 minute", "HH24:MI", 1440),
+    "hour": ("1 hour", "YYYY-MM-DD HH24:00", 24 * 31),
+    "day": ("1 day", "YYYY-MM-DD", 366),
+}
+
+# Lead counts per bucket come from the hourly rollups; minute buckets are
+# finer than the rollups so they are counted from the (short) raw window.
+ROLLUP_LEAD_COUNTS = """
+    SELECT date_trunc(%(unit)s, bucket, 'UTC') AS bucket, SUM(lead_count) AS count
+    FROM lead_hourly_rollups
+    WHERE user_id = %(user_id)s
+      AND bucket >= (SELECT MIN(bucket) FROM buckets)
+    GROUP BY 1
+"""
+
+RAW_LEAD_COUNTS = """
+    SELECT date_trunc(%(unit)s, created_at, 'UTC') AS bucket, COUNT(*) AS count
+    FROM leads
+    WHERE user_id = %(user_id)s
+      AND created_at >= (SELECT MIN(bucket) FROM buckets)
+    GROUP BY 1
+"""
+
+DASHBOARD_STATS_QUERY = """
+    WITH buckets AS (
+        SELECT generate_series(
+            date_trunc(%(unit)s, now(), 'UTC') - (%(buckets)s - 1) * %(step)s::interval,
+            date_trunc(%(unit)s, now(), 'UTC'),
+            %(step)s::interval
+        ) AS bucket
+    ),
+    lead_counts AS ({lead_counts})
+    SELECT
+        COALESCE(ur.total_leads, 0) AS total_leads,
+        COALESCE(ur.successful_crm_saves, 0) AS successful_crm_saves,
+        COALESCE(ur.failed_crm_saves, 0) AS failed_crm_saves,
+        (
+            SELECT json_object_agg(
+                to_char(b.bucket AT TIME ZONE 'UTC', %(label)s),
+                COALESCE(c.count, 0)::bigint
+                ORDER BY b.bucket DESC
+            )
+            FROM buckets b
+            LEFT JOIN lead_counts c ON c.bucket = b.bucket
+        ) AS leads_per_time,
+        (
+            SELECT COALESCE(json_object_agg(event_type, event_count), '{{}}'::json)
+            FROM event_type_rollups
+            WHERE user_id = %(user_id)s
+        ) AS events_per_type
+    FROM (SELECT %(user_id)s AS user_id) me
+    LEFT JOIN user_rollups ur ON ur.user_id = me.user_id
+"""
+
 
 @router.get("/stats", response_model=DashboardStats)
 async def get_dashboard_stats(
-    cursor=Depends(get_db), current_user: dict = Depends(get_current_active_user)
+    granularity: Literal["minute", "hour", "day"] = "hour",
+    buckets: int = Query(24, ge=1),
+    cursor=Depends(get_db),
+    current_user: dict = Depends(get_current_active_user),
 ):
-    """Get dashboard statistics for the current user."""
-    # Total leads count
-    cursor.execute(
-        "SELECT COUNT(*) as count FROM leads WHERE user_id = %s", (current_user["id"],)
-    )
-    total_leads = cursor.fetchone()["count"]
-
-    # CRM success/failure stats
-    # Get the latest attempt for each lead with success status
-    cursor.execute(
-        """
-        WITH latest_attempts AS (
-            SELECT lead_id, MAX(attempt_number) as max_attempt
-            FROM crm_attempts
-            GROUP BY lead_id
+    """
+    Get dashboard statistics for the current user.
+
+    The leads series covers the last `buckets` periods of `granularity`
+    (24 hours by default, e.g. 7 days by day or 60 minutes by minute), at
+    most 1440 minutes, 744 hours or 366 days. The
+    payload is read from the per-user rollup tables in a single statement
+    and cached per user and window until it expires or the user's data changes.
+    """
+    step, label, max_buckets = GRANULARITIES[granularity]
+    if buckets > max_buckets:
+        raise HTTPException(
+            status_code=422,
+            detail=f"At most {max_buckets} buckets by {granularity}",
         )
-        SELECT ca.success, COUNT(*) as count
-        FROM crm_attempts ca
-        JOIN latest_attempts la ON ca.lead_id = la.lead_id AND ca.attempt_number = la.max_attempt
-        JOIN leads l ON l.id = ca.lead_id
-        WHERE l.user_id = %s
-        GROUP BY ca.success
-        """,
-        (current_user["id"],),
-    )
-
-    crm_results = cursor.fetchall()
-
-    successful_crm_saves = 0
-    failed_crm_saves = 0
-
-    for result in crm_results:
-        if result["success"]:
-            successful_crm_saves = result["count"]
-        else:
-            failed_crm_saves = result["count"]
-
-    # Leads per hour for the last 24 hours
-    now = datetime.now(timezone.utc)
-    leads_per_time = {}
 
-    # Get leads per hour for the last 24 hours
-    for i in range(24):
-        hour_start = now - timedelta(hours=i + 1)
-        hour_end = now - timedelta(hours=i)
-
-        cursor.execute(
-            """
-            SELECT COUNT(*) as count
-            FROM leads
-            WHERE user_id = %s AND created_at >= %s AND created_at < %s
-            """,
-            (current_user["id"], hour_start, hour_end),
-        )
-
-        count = cursor.fetchone()["count"]
-        hour_label = hour_end.strftime("%H:00")
-        leads_per_time[hour_label] = count
-
-    # Get events by type
-    cursor.execute(
-        """
-        SELECT event_type, COUNT(*) as count
-        FROM events
-        WHERE user_id = %s
-        GROUP BY event_type
-        """,
-        (current_user["id"],),
+    cache_key = (current_user["id"], granularity, buckets)
+    cached = dashboard_stats_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    lead_counts = RAW_LEAD_COUNTS if granularity == "minute" else ROLLUP_LEAD_COUNTS
+    await cursor.execute(
+        DASHBOARD_STATS_QUERY.format(lead_counts=lead_counts),
+        {
+            "user_id": current_user["id"],
+            "unit": granularity,
+            "step": step,
+            "buckets": buckets,
+            "label": label,
+        },
     )
+    stats = await cursor.fetchone()
+
+    dashboard_stats = DashboardStats(
+        total_leads=stats["total_leads"],
+        successful_crm_saves=stats["successful_crm_saves"],
+        failed_crm_saves=stats["failed_crm_saves"],
+        leads_per_time=stats["leads_per_time"] or {},
+        events_per_type=stats["events_per_type"],
+    )
+    dashboard_stats_cache.set(cache_key, dashboard_stats)
+    return dashboard_stats
 
-    events_per_type = cursor.fetchall()
-    events_per_type_dict = {row["event_type"]: row["count"] for row in events_per_type}
 
-    return DashboardStats(
-        total_leads=total_leads,
-        successful_crm_saves=successful_crm_saves,
-        failed_crm_saves=failed_crm_saves,
-        leads_per_time=leads_per_time,
-        events_per_type=events_per_type_dict,
-    )
+@router.get("/cache-stats", response_model=Dict[str, Any])
+async def get_dashboard_cache_stats(
+    _current_user: dict = Depends(get_current_active_user),
+):
+    """Hit/miss counters of the dashboard stats cache."""
+    return dashboard_stats_cache.stats()
@@ -1,51 +1,267 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from typing import List, Optional
+from datetime import datetime, timedelta, timezone
 
+from app.api.export import ExportFormat, export_filter, export_response
+from app.api.pagination import (
+    APPROXIMATE_TOTAL_HEADER,
+    MAX_PAGE_SIZE,
+    finish_page,
+    page_filter,
+)
 from app.db.init_db import get_db
 from app.services.auth import get_current_active_user
-from app.models.schemas import EventResponse
+from app.services.lead_extractor import CACHE_BACKEND
+from app.models.schemas import EventLatencyReport, EventResponse
 
 router = APIRouter()
 
+# Pipeline stage timestamps of webhook events; created_at is when the
+# message was received
+STAGE_COLUMNS = [
+    "extraction_started_at",
+    "extraction_finished_at",
+    "lead_persisted_at",
+    "crm_finished_at",
+]
+
+EVENT_COLUMNS = [
+    "id",
+    "event_type",
+    "event_id",
+    "user_id",
+    "payload",
+    "status",
+    "lead_id",
+    "created_at",
+    *STAGE_COLUMNS,
+    "extraction_backend",
+]
+
+# Latency stages as (name, start column, end column)
+LATENCY_STAGES = [
+    ("queue", "created_at", "extraction_started_at"),
+    ("extraction", "extraction_started_at", "extraction_finished_at"),
+    ("persist", "extraction_finished_at", "lead_persisted_at"),
+    ("crm", "lead_persisted_at", "crm_finished_at"),
+    ("total", "created_at", "crm_finished_at"),
+]
+
+LATENCY_PERCENTILES = [0.5, 0.95, 0.99]
+
+# Event count and latency percentiles (ms) of one stage; NULL stage
+# timestamps are skipped by both aggregates
+STAGE_LATENCY_SQL = """
+    COUNT({end} - {start}) AS {name}_count,
+    percentile_cont(%(percentiles)s::float8[]) WITHIN GROUP (
+        ORDER BY EXTRACT(EPOCH FROM {end} - {start}) * 1000
+    ) AS {name}_ms
+"""
+
 
 @router.get("/", response_model=List[EventResponse])
 async def read_events(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    page_cursor: Optional[str] = Query(None, alias="cursor"),
+    include_total: bool = False,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
     cursor=Depends(get_db),
     current_user: dict = Depends(get_current_active_user),
 ):
-    """Get all events for the current user."""
-    cursor.execute(
-        """
-        SELECT id, event_type, event_id, user_id, payload, status, created_at
+    """
+    Get the events of the current user, newest first.
+
+    Pass the X-Next-Cursor header of a page as `cursor` to get the next one;
+    `skip` is the legacy OFFSET mode. With `include_total` the approximate
+    number of events is returned in the X-Approximate-Total-Count header.
+    `since`/`until` restrict created_at so only the matching monthly
+    partitions are scanned.
+    """
+    position_sql, position_params, offset = page_filter(page_cursor, skip)
+    await cursor.execute(
+        f"""
+        SELECT {", ".join(EVENT_COLUMNS)}
         FROM events
         WHERE user_id = %s
-        ORDER BY created_at DESC
+          AND created_at >= COALESCE(%s::timestamptz, '-infinity')
+          AND created_at < COALESCE(%s::timestamptz, 'infinity')
+          {position_sql}
+        ORDER BY created_at DESC, id DESC
         LIMIT %s OFFSET %s
         """,
-        (current_user["id"], limit, skip),
+        (current_user["id"], since, until, *position_params, limit + 1, offset),
     )
-    events = cursor.fetchall()
+    events = finish_page(await cursor.fetchall(), limit, response)
+
+    if include_total:
+        await cursor.execute(
+            """
+            SELECT COALESCE(SUM(event_count), 0) AS total
+            FROM event_type_rollups
+            WHERE user_id = %s
+            """,
+            (current_user["id"],),
+        )
+        response.headers[APPROXIMATE_TOTAL_HEADER] = str(
+            (await cursor.fetchone())["total"]
+        )
+
     return events
 
 
+EVENT_EXPORT_COLUMNS = [
+    "id",
+    "event_type",
+    "event_id",
+    "payload",
+    "status",
+    "lead_id",
+    "created_at",
+    *STAGE_COLUMNS,
+    "extraction_backend",
+]
+
+
+@router.get("/latency", response_model=EventLatencyReport)
+async def read_event_latency(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor=Depends(get_db),
+    current_user: dict = Depends(get_current_active_user),
+):
+    """
+    p50/p95/p99 latency in milliseconds of each webhook pipeline stage, over
+    the events received between `since` (default: 24 hours ago) and `until`
+    (default: now).
+
+    Stages: queue (received to extraction start, the async mode's wait),
+    extraction, persist (extraction end to lead committed), crm (lead
+    committed to final CRM outcome) and total. Events that did not reach a
+    stage are left out of its percentiles. Also counts the events per
+    extraction backend (rules, cache, llm or regex) and the share of extractions
+    answered by the extraction cache.
+    """
+    until = until or datetime.now(timezone.utc)
+    since = since or until - timedelta(hours=24)
+
+    stage_sql = ",".join(
+        STAGE_LATENCY_SQL.format(name=name, start=start, end=end)
+        for name, start, end in LATENCY_STAGES
+    )
+    await cursor.execute(
+        f"""
+        WITH windowed AS (
+            SELECT *
+            FROM events
+            WHERE user_id = %(user_id)s
+              AND event_type = 'webhook'
+              AND created_at >= %(since)s
+              AND created_at < %(until)s
+        )
+        SELECT
+            COUNT(*) AS events,
+            {stage_sql},
+            (
+                SELECT COALESCE(json_object_agg(extraction_backend, count), '{{}}')
+                FROM (
+                    SELECT extraction_backend, COUNT(*) AS count
+                    FROM windowed
+                    WHERE extraction_backend IS NOT NULL
+                    GROUP BY extraction_backend
+                ) backends
+            ) AS extraction_backends
+        FROM windowed
+        """,
+        {
+            "user_id": current_user["id"],
+            "since": since,
+            "until": until,
+            "percentiles": LATENCY_PERCENTILES,
+        },
+    )
+    row = await cursor.fetchone()
+
+    stages = {}
+    for name, _, _ in LATENCY_STAGES:
+        percentiles = row[f"{name}_ms"] or [None] * len(LATENCY_PERCENTILES)
+        stages[name] = {"count": row[f"{name}_count"]}
+        for percentile, value in zip(LATENCY_PERCENTILES, percentiles):
+            stages[name][f"p{round(percentile * 100)}_ms"] = (
+                round(value, 3) if value is not None else None
+            )
+    backends = row["extraction_backends"]
+    extractions = sum(backends.values())
+    return {
+        "since": since,
+        "until": until,
+        "events": row["events"],
+        "stages": stages,
+        "extraction_backends": backends,
+        "extraction_cache_hit_rate": (
+            round(backends.get(CACHE_BACKEND, 0) / extractions, 4)
+            if extractions
+            else 0.0
+        ),
+    }
+
+
+@router.get("/export")
+async def export_events(
+    export_format: ExportFormat = Query("ndjson", alias="format"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    after_created_at: Optional[datetime] = None,
+    after_id: Optional[int] = None,
+    current_user: dict = Depends(get_current_active_user),
+):
+    """
+    Stream every event of the current user, oldest first, as NDJSON or CSV.
+
+    `since`/`until` restrict created_at (and the partitions scanned). To
+    resume an interrupted export pass the created_at and id of the last
+    event received as `after_created_at` and `after_id`.
+    """
+    where_sql, params = export_filter(since, until, after_created_at, after_id)
+    return export_response(
+        f"""
+        SELECT {", ".join(EVENT_EXPORT_COLUMNS)}
+        FROM events
+        WHERE user_id = %s {where_sql}
+        ORDER BY created_at, id
+        """,
+        (current_user["id"], *params),
+        EVENT_EXPORT_COLUMNS,
+        export_format,
+        "events",
+    )
+
+
 @router.get("/{event_id}", response_model=EventResponse)
 async def read_event(
     event_id: str,
     cursor=Depends(get_db),
     current_user: dict = Depends(get_current_active_user),
 ):
-    """Get a specific event by ID."""
-    cursor.execute(
-        """
-        SELECT id, event_type, event_id, user_id, payload, status, created_at
+    """
+    Get a specific event by ID.
+
+    Webhook events go from queued (asynchronous mode only) to processing and
+    end as success, partial_success or failed, or as crm_queued when the
+    lead waits for the CRM to recover; lead_id is set once the lead has
+    been created.
+    """
+    await cursor.execute(
+        f"""
+        SELECT {", ".join(EVENT_COLUMNS)}
         FROM events
         WHERE event_id = %s AND user_id = %s
         """,
         (event_id, current_user["id"]),
     )
-    event = cursor.fetchone()
+    event = await cursor.fetchone()
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     return event
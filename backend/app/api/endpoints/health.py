@@ -1,5 +1,10 @@
 from fastapi import APIRouter, Depends
+from app.core.config import settings
 from app.db.init_db import get_db
+from app.db.database import get_pool
+from app.services.llm_executor import llm_executor
+from app.services.local_llm import LocalSeq2SeqLLM
+from app.services.webhook_pipeline import get_lead_extractor
 
 router = APIRouter()
 
@@ -8,5 +13,26 @@ router = APIRouter()
 async def health_check(cursor=Depends(get_db)):
     """Simple health check endpoint to verify backend is running"""
 
-    cursor.execute("SELECT 1")
+    await cursor.execute("SELECT 1")
     return {"status": "healthy", "message": "Backend server is running"}
+
+
+@router.get("/db-pool")
+async def db_pool_stats():
+    """Connection pool statistics for monitoring"""
+    return get_pool().stats()
+
+
+@router.get("/llm")
+async def llm_executor_stats():
+    """Extraction tiers, LLM inference pool, micro-batching and cache statistics"""
+    lead_extractor = get_lead_extractor()
+    llm = lead_extractor.llm
+    return {
+        "backend": settings.LLM_BACKEND if llm is not None else "none",
+        "local_model": llm.stats() if isinstance(llm, LocalSeq2SeqLLM) else None,
+        "extraction": lead_extractor.stats(),
+        **llm_executor.stats(),
+        "batching": lead_extractor.batcher.stats(),
+        "cache": lead_extractor.cache.stats(),
+    }
@@ -1,10 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
-
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from typing import List, Optional
+from datetime import datetime
 
+from app.api.export import ExportFormat, export_filter, export_response
+from app.api.pagination import (
+    APPROXIMATE_TOTAL_HEADER,
+    MAX_PAGE_SIZE,
+    finish_page,
+    page_filter,
+)
+from app.db.async_database import pooled_cursor
 from app.db.init_db import get_db
-from app.services.auth import get_current_active_user
-from app.services.crm_service import CRMService
+from app.services.auth import get_authenticated_user, get_current_active_user
+from app.services.crm_service import CRM_DEFERRED, CRM_SAVED, CRMService
 from app.models.schemas import LeadResponse
 
 router = APIRouter()
@@ -12,26 +20,94 @@ router = APIRouter()
 
 @router.get("/", response_model=List[LeadResponse])
 async def read_leads(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    page_cursor: Optional[str] = Query(None, alias="cursor"),
+    include_total: bool = False,
     cursor=Depends(get_db),
     current_user: dict = Depends(get_current_active_user),
 ):
-    """Get all leads for the current user."""
-    cursor.execute(
-        """
-        SELECT id, name, email, company, raw_message, created_at, updated_at, user_id
+    """
+    Get the leads of the current user, newest first.
+
+    Pass the X-Next-Cursor header of a page as `cursor` to get the next one;
+    `skip` is the legacy OFFSET mode. With `include_total` the approximate
+    number of leads is returned in the X-Approximate-Total-Count header.
+    """
+    position_sql, position_params, offset = page_filter(page_cursor, skip)
+    await cursor.execute(
+        f"""
+        SELECT id, name, email, company, raw_message, created_at, updated_at, user_id,
+               crm_status, crm_attempt_count, crm_last_attempt_at, crm_last_error
         FROM leads 
-        WHERE user_id = %s
-        ORDER BY created_at DESC
+        WHERE user_id = %s {position_sql}
+        ORDER BY created_at DESC, id DESC
         LIMIT %s OFFSET %s
         """,
-        (current_user["id"], limit, skip),
+        (current_user["id"], *position_params, limit + 1, offset),
     )
-    leads = cursor.fetchall()
+    leads = finish_page(await cursor.fetchall(), limit, response)
+
+    if include_total:
+        await cursor.execute(
+            "SELECT total_leads FROM user_rollups WHERE user_id = %s",
+            (current_user["id"],),
+        )
+        rollup = await cursor.fetchone()
+        response.headers[APPROXIMATE_TOTAL_HEADER] = str(
+            rollup["total_leads"] if rollup else 0
+        )
+
     return leads
 
 
+LEAD_EXPORT_COLUMNS = [
+    "id",
+    "name",
+    "email",
+    "company",
+    "raw_message",
+    "created_at",
+    "updated_at",
+    "crm_status",
+    "crm_attempt_count",
+    "crm_last_attempt_at",
+    "crm_last_error",
+]
+
+
+@router.get("/export")
+async def export_leads(
+    export_format: ExportFormat = Query("ndjson", alias="format"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    after_created_at: Optional[datetime] = None,
+    after_id: Optional[int] = None,
+    current_user: dict = Depends(get_current_active_user),
+):
+    """
+    Stream every lead of the current user, oldest first, as NDJSON or CSV.
+
+    `since`/`until` restrict created_at. To resume an interrupted export pass
+    the created_at and id of the last lead received as `after_created_at`
+    and `after_id`.
+    """
+    where_sql, params = export_filter(since, until, after_created_at, after_id)
+    return export_response(
+        f"""
+        SELECT {", ".join(LEAD_EXPORT_COLUMNS)}
+        FROM leads
+        WHERE user_id = %s {where_sql}
+        ORDER BY created_at, id
+        """,
+        (current_user["id"], *params),
+        LEAD_EXPORT_COLUMNS,
+        export_format,
+        "leads",
+    )
+
+
 @router.get("/{lead_id}", response_model=LeadResponse)
 async def read_lead(
     lead_id: int,
@@ -39,15 +115,16 @@ async def read_lead(
     current_user: dict = Depends(get_current_active_user),
 ):
     """Get a specific lead by ID."""
-    cursor.execute(
+    await cursor.execute(
         """
-        SELECT id, name, email, company, raw_message, created_at, updated_at, user_id
+        SELECT id, name, email, company, raw_message, created_at, updated_at, user_id,
+               crm_status, crm_attempt_count, crm_last_attempt_at, crm_last_error
         FROM leads 
         WHERE id = %s AND user_id = %s
         """,
         (lead_id, current_user["id"]),
     )
-    lead = cursor.fetchone()
+    lead = await cursor.fetchone()
 
     if not lead:
         raise HTTPException(status_code=404, detail="Lead not found")
@@ -57,34 +134,43 @@ async def read_lead(
 @router.post("/{lead_id}/retry-crm", response_model=LeadResponse)
 async def retry_crm_save(
     lead_id: int,
-    cursor=Depends(get_db),
-    current_user: dict = Depends(get_current_active_user),
+    current_user: dict = Depends(get_authenticated_user),
 ):
-    """Retry saving a lead to CRM."""
-    cursor.execute(
-        "SELECT id FROM leads WHERE id = %s AND user_id = %s",
-        (lead_id, current_user["id"]),
-    )
-    lead = cursor.fetchone()
+    """
+    Retry saving a lead to CRM. Connections are checked out around the push
+    rather than held through it.
+    """
+    async with pooled_cursor() as cursor:
+        await cursor.execute(
+            "SELECT id FROM leads WHERE id = %s AND user_id = %s",
+            (lead_id, current_user["id"]),
+        )
+        lead = await cursor.fetchone()
 
     if not lead:
         raise HTTPException(status_code=404, detail="Lead not found")
 
-    crm_service = CRMService(cursor.connection)
-    success = await crm_service.save_lead_to_crm(lead_id)
+    result = (await CRMService().save_leads_to_crm([lead_id]))[lead_id]
 
-    if not success:
+    if result == CRM_DEFERRED:
+        raise HTTPException(
+            status_code=503,
+            detail="CRM is unavailable or busy, the lead is queued for delivery",
+        )
+    if result != CRM_SAVED:
         raise HTTPException(status_code=500, detail="Failed to save to CRM after retry")
 
     # Get the updated lead
-    cursor.execute(
-        """
-        SELECT id, name, email, company, raw_message, created_at, updated_at, user_id
-        FROM leads 
-        WHERE id = %s
-        """,
-        (lead_id,),
-    )
-    updated_lead = cursor.fetchone()
+    async with pooled_cursor() as cursor:
+        await cursor.execute(
+            """
+            SELECT id, name, email, company, raw_message, created_at, updated_at, user_id,
+                   crm_status, crm_attempt_count, crm_last_attempt_at, crm_last_error
+            FROM leads 
+            WHERE id = %s
+            """,
+            (lead_id,),
+        )
+        updated_lead = await cursor.fetchone()
 
     return updated_lead
@@ -25,11 +25,11 @@ async def read_user(
         )
 
     # Execute query to find user
-    cursor.execute(
+    await cursor.execute(
         "SELECT id, username, email, is_active, created_at FROM users WHERE id = %s",
         (user_id,),
     )
-    user = cursor.fetchone()
+    user = await cursor.fetchone()
 
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -1,119 +1,136 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+import json
+import math
 import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
+from typing import Any, Dict, Literal, Optional
 
 
 import logging
 
-from app.db.init_db import get_db
-from app.services.lead_extractor import LeadExtractor
-from app.services.crm_service import CRMService
-from app.services.auth import get_current_active_user
-from app.models.schemas import WebhookMessage, LeadExtracted
+from app.db.async_database import pooled_cursor
+from app.services.auth import get_authenticated_user, get_current_active_user
+from app.services.cache import invalidate_dashboard_stats
+from app.services.idempotency import (
+    MAX_KEY_LENGTH,
+    REPLAYED_HEADER,
+    IdempotencyConflict,
+    IdempotencyKeyReused,
+    claim_key,
+    complete_key,
+    dedupe_key,
+    release_key,
+)
+from app.services.job_queue import enqueue_job
+from app.services.resilience import QUEUE_FULL, AdmissionController, AdmissionRejected
+from app.services.rollups import record_event
+from app.services.webhook_pipeline import get_lead_extractor, ingest_message
+from app.services.webhook_batch import process_webhook_batch
+from app.services.webhook_stream import ingest_stream
+from app.core.config import settings
+from app.models.schemas import (
+    WebhookMessage,
+    LeadExtracted,
+    WebhookAccepted,
+    WebhookBatchResponse,
+)
+from pydantic import ValidationError
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-lead_extractor = LeadExtractor()
+# Bounds the synchronous messages this worker extracts at once and the ones
+# waiting for a slot, so a burst is shed instead of exhausting the LLM and
+# the connection pool.
+webhook_admission = AdmissionController(
+    max_in_flight=settings.WEBHOOK_MAX_IN_FLIGHT,
+    max_queue=settings.WEBHOOK_MAX_QUEUE,
+    queue_timeout=settings.WEBHOOK_QUEUE_TIMEOUT,
+    max_retry_after=settings.WEBHOOK_MAX_RETRY_AFTER,
+)
 
 
-@router.post("/", response_model=LeadExtracted)
-async def process_webhook(
-    webhook_message: WebhookMessage,
-    cursor=Depends(get_db),
-    current_user: dict = Depends(get_current_active_user),
+async def admit_webhook_batch(
+    current_user: dict = Depends(get_authenticated_user),
 ):
     """
-    Process an incoming webhook message.
+    Admission control for batches, which take one slot for the whole batch;
+    extraction within a batch is bounded by WEBHOOK_BATCH_CONCURRENCY.
+    Requests are authenticated first, so unauthenticated ones never take a
+    slot.
+    """
+    async with _admitted():
+        yield
 
-    Steps:
-    1. Log the incoming event
-    2. Extract lead information using LLM
-    3. Save the lead to the database
-    4. Attempt to save to CRM
-    5. Return the extracted lead info
+
+@asynccontextmanager
+async def _admitted():
+    """
+    Hold a webhook admission slot, answering 429 or 503 when rejected.
+    Waiting requests hold no connection, callers check them out per
+    database step.
     """
+    try:
+        async with webhook_admission.admit():
+            yield
+    except AdmissionRejected as e:
+        logger.warning(f"Webhook message rejected: {e.reason}")
+        raise HTTPException(
+            status_code=429 if e.reason == QUEUE_FULL else 503,
+            detail="Too many webhook messages in progress, retry later",
+            headers={"Retry-After": str(math.ceil(e.retry_after))},
+        )
+
+
+async def _handle_webhook(message: str, mode: str, current_user: dict) -> tuple:
+    """Run a webhook message through the pipeline, returning (status, body)."""
     # Log the received message
-    logger.info(f"Received webhook message: {webhook_message.message[:100]}...")
+    logger.info(f"Received webhook message: {message[:100]}...")
 
-    # Create event record
-    event_id = str(uuid.uuid4())
-    cursor.execute(
-        """
-        INSERT INTO events (event_type, event_id, user_id, payload, status, created_at)
-        VALUES (%s, %s, %s, %s, %s, %s)
-        RETURNING id
-        """,
-        (
-            "webhook",
-            event_id,
-            current_user["id"],
-            webhook_message.message,
-            "processing",
-            datetime.now(timezone.utc),
-        ),
-    )
-    event_db_id = cursor.fetchone()["id"]
-    cursor.connection.commit()
+    # Asynchronous messages only record an event and are always admitted
+    if mode == "sync":
+        async with _admitted():
+            return await _handle_sync_webhook(message, current_user)
 
-    try:
-        # Extract lead info using LangChain with free model
-        try:
-            extracted_info = await lead_extractor.extract_lead_info(
-                webhook_message.message
-            )
-        except ValueError as ve:
-            # Model error
-            cursor.execute(
-                "UPDATE events SET status = %s WHERE id = %s", ("failed", event_db_id)
-            )
-            cursor.connection.commit()
-
-            error_detail = str(ve)
-            logger.error(f"Lead extraction error: {error_detail}")
-
-            raise HTTPException(
-                status_code=400, detail=f"Error processing request: {error_detail}"
-            )
-
-        # Create lead record
-        cursor.execute(
+    # Create event record and queue it for the workers
+    event_id = str(uuid.uuid4())
+    async with pooled_cursor() as cursor:
+        await cursor.execute(
             """
-            INSERT INTO leads (name, email, company, raw_message, user_id, created_at)
+            INSERT INTO events (event_type, event_id, user_id, payload, status, created_at)
             VALUES (%s, %s, %s, %s, %s, %s)
-            RETURNING id
             """,
             (
-                extracted_info["name"],
-                extracted_info["email"],
-                extracted_info["company"],
-                webhook_message.message,
+                "webhook",
+                event_id,
                 current_user["id"],
+                message,
+                "queued",
                 datetime.now(timezone.utc),
             ),
         )
-        lead_id = cursor.fetchone()["id"]
-        cursor.connection.commit()
+        await record_event(cursor, current_user["id"], "webhook")
+        await enqueue_job(cursor, "webhook", {"event_id": event_id})
+        await cursor.connection.commit()
+    invalidate_dashboard_stats(current_user["id"])
 
-        # Save to CRM with retry logic
-        crm_service = CRMService(cursor.connection)
-        crm_result = await crm_service.save_lead_to_crm(lead_id)
+    return 202, {"event_id": event_id, "status": "queued"}
 
-        # Update event status
-        cursor.execute(
-            "UPDATE events SET status = %s WHERE id = %s",
-            ("success" if crm_result else "partial_success", event_db_id),
-        )
-        cursor.connection.commit()
 
-        return extracted_info
+async def _handle_sync_webhook(message: str, current_user: dict) -> tuple:
+    try:
+        result = await ingest_message(current_user["id"], message)
+    except ValueError as ve:
+        # Model error
+        error_detail = str(ve)
+        logger.error(f"Lead extraction error: {error_detail}")
 
-    except Exception as e:
-        cursor.execute(
-            "UPDATE events SET status = %s WHERE id = %s", ("failed", event_db_id)
+        raise HTTPException(
+            status_code=400, detail=f"Error processing request: {error_detail}"
         )
-        cursor.connection.commit()
-
+    except Exception as e:
         # Log the error for debugging
         logger.error(f"Webhook processing error: {str(e)}")
         logger.exception(e)
@@ -124,6 +141,191 @@ async def process_webhook(
             detail=f"An error occurred during request processing: {str(e)}",
         )
 
+    return 200, LeadExtracted.model_validate(result["lead"]).model_dump()
+
+
+@router.post(
+    "/",
+    response_model=LeadExtracted,
+    responses={202: {"model": WebhookAccepted}},
+)
+async def process_webhook(
+    webhook_message: WebhookMessage,
+    mode: Literal["sync", "async"] = "sync",
+    idempotency_key: Optional[str] = Header(
+        None, alias="Idempotency-Key", max_length=MAX_KEY_LENGTH
+    ),
+    current_user: dict = Depends(get_authenticated_user),
+):
+    """
+    Process an incoming webhook message.
+
+    Steps:
+    1. Log the incoming event
+    2. Extract lead information using LLM
+    3. Save the lead to the database
+    4. Attempt to save to CRM
+    5. Return the extracted lead info
+
+    With `mode=async` only step 1 runs in the request: the event is queued
+    and 202 is returned with its `event_id` right away. A background worker
+    runs the remaining steps; follow them with GET /events/{event_id}.
+
+    Requests sent again with the same Idempotency-Key header (or, when
+    WEBHOOK_DEDUPE_WINDOW is set, the same message within that window) get
+    the original response back, marked with an Idempotency-Replayed header,
+    instead of being processed twice. A repeat arriving while the original
+    is still running waits for it, or gets 409 if it takes too long. A key
+    reused with another message or mode gets 422.
+
+    Synchronous messages go through admission control: beyond
+    WEBHOOK_MAX_IN_FLIGHT messages in progress they queue, and the request
+    gets 429 when the queue is full or 503 when it waited longer than
+    WEBHOOK_QUEUE_TIMEOUT, with a Retry-After header estimated from the
+    current drain rate (see GET /webhook/admission). Replayed responses
+    are not admitted, so repeats never take a slot.
+    """
+    user_id = current_user["id"]
+    key, ttl = dedupe_key(idempotency_key, webhook_message.message, mode)
+    if key is None:
+        status_code, body = await _handle_webhook(
+            webhook_message.message, mode, current_user
+        )
+        return body if status_code == 200 else JSONResponse(body, status_code)
+
+    # The request holds no connection of its own: each database step checks
+    # one out, so none stays checked out while the message is extracted
+    try:
+        original = await claim_key(user_id, key, webhook_message.message, mode, ttl)
+    except IdempotencyKeyReused:
+        raise HTTPException(
+            status_code=422,
+            detail=(
+                "Idempotency-Key was already used with a different message or mode"
+            ),
+        )
+    except IdempotencyConflict:
+        raise HTTPException(
+            status_code=409,
+            detail="A request with this Idempotency-Key is still being processed",
+        )
+    if original is not None:
+        logger.info(f"Replaying webhook response for idempotency key {key}")
+        return JSONResponse(
+            original["response"],
+            original["status_code"],
+            headers={REPLAYED_HEADER: "true"},
+        )
+
+    try:
+        status_code, body = await _handle_webhook(
+            webhook_message.message, mode, current_user
+        )
+    except HTTPException as e:
+        async with pooled_cursor() as cursor:
+            # Client errors are final, server errors and rejections by
+            # admission control may succeed when retried
+            if e.status_code < 500 and e.status_code != 429:
+                await complete_key(
+                    cursor, user_id, key, e.status_code, {"detail": e.detail}
+                )
+            else:
+                await release_key(cursor, user_id, key)
+        raise
+    except Exception:
+        async with pooled_cursor() as cursor:
+            await release_key(cursor, user_id, key)
+        raise
+
+    async with pooled_cursor() as cursor:
+        await complete_key(cursor, user_id, key, status_code, body)
+    return body if status_code == 200 else JSONResponse(body, status_code)
+
+
+@router.get("/admission", response_model=Dict[str, Any])
+async def webhook_admission_stats(
+    _current_user: dict = Depends(get_current_active_user),
+):
+    """
+    Admission control metrics of this worker: messages in flight, queue
+    depth, rejections and the drain rate behind Retry-After.
+    """
+    return webhook_admission.stats()
+
+
+def _parse_batch(body: bytes, content_type: str) -> list:
+    """
+    Split a batch body into (message, error) tuples.
+
+    The body is either a JSON array of webhook messages or, with an
+    application/x-ndjson content type, one webhook message per line.
+    """
+    try:
+        if "ndjson" in content_type:
+            raw_items = [
+                json.loads(line) for line in body.decode().splitlines() if line.strip()
+            ]
+        else:
+            raw_items = json.loads(body)
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Malformed batch body: {e}")
+
+    if not isinstance(raw_items, list):
+        raise HTTPException(
+            status_code=400, detail="Batch body must be a JSON array of messages"
+        )
+
+    items = []
+    for raw_item in raw_items:
+        try:
+            items.append((WebhookMessage.model_validate(raw_item).message, None))
+        except ValidationError as e:
+            items.append((None, f"Invalid message: {e.errors()[0]['msg']}"))
+    return items
+
+
+@router.post("/batch", response_model=WebhookBatchResponse)
+async def process_webhook_batch_request(
+    request: Request,
+    current_user: dict = Depends(get_authenticated_user),
+    _admission: None = Depends(admit_webhook_batch),
+):
+    """
+    Process a batch of webhook messages in one request.
+
+    Accepts a JSON array of webhook messages or newline-delimited JSON
+    (application/x-ndjson). Events and leads are inserted with one
+    multi-row statement each and extraction runs concurrently, so a batch
+    costs a handful of round trips instead of several per message. Each
+    item gets its own result, in input order, and a bad item does not
+    fail the rest of the batch.
+
+    A batch takes one admission slot (see GET /webhook/admission) and holds
+    no connection while its messages are extracted or pushed to the CRM.
+    """
+    items = _parse_batch(await request.body(), request.headers.get("content-type", ""))
+    if len(items) > settings.WEBHOOK_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch exceeds {settings.WEBHOOK_BATCH_MAX_SIZE} messages",
+        )
+
+    logger.info(f"Received webhook batch of {len(items)} messages")
+    results = await process_webhook_batch(
+        get_lead_extractor(), current_user["id"], items
+    )
+
+    succeeded = sum(
+        result["status"] in ("success", "partial_success", "crm_queued")
+        for result in results
+    )
+    return {
+        "total": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "results": results,
+    }
+
 
 @router.options("/")
 async def webhook_options(request: Request):
@@ -132,3 +334,45 @@ async def webhook_options(request: Request):
         f"Received OPTIONS request for webhook endpoint from {request.client.host if request.client else 'unknown'}"
     )
     return {}
+
+
+class _DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse sent while the request body is still being read.
+
+    StreamingResponse listens for the client disconnecting by calling
+    receive(), which would swallow body chunks; here the body reader is the
+    only receiver and notices the disconnect itself.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+@router.post("/stream")
+async def process_webhook_stream(
+    request: Request,
+    current_user: dict = Depends(get_authenticated_user),
+):
+    """
+    Long-lived ingestion channel for high-volume message sources.
+
+    The request body is newline-delimited JSON webhook messages, sent with
+    chunked transfer encoding for as long as the source has messages. The
+    response streams back one NDJSON ack per message as soon as it is
+    processed (in completion order, `index` is the message's position in the
+    stream) with its status, event_id and extracted lead or error, and ends
+    with a line holding the total, succeeded and failed counts.
+
+    WEBHOOK_STREAM_CONCURRENCY messages are processed at once, each admitted
+    like a synchronous message. When the extraction or the reading of the
+    acks falls behind, the server stops reading the body, pushing back on the
+    sender.
+    """
+    logger.info(f"Webhook stream opened by user {current_user['id']}")
+    return _DuplexStreamingResponse(
+        ingest_stream(request.stream(), current_user["id"], webhook_admission),
+        media_type="application/x-ndjson",
+    )
@@ -0,0 +1,112 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Literal, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.core.config import settings
+from app.db.database import db_connection
+
+ExportFormat = Literal["ndjson", "csv"]
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def export_filter(
+    since: Optional[datetime],
+    until: Optional[datetime],
+    after_created_at: Optional[datetime],
+    after_id: Optional[int],
+) -> tuple:
+    """
+    Build the time-range and resume part of an oldest-first export query.
+
+    An export resumes after the (created_at, id) of the last row received, so
+    an interrupted download continues without gaps or duplicates.
+
+    Returns:
+        (where_sql, params) to append to a WHERE clause
+    """
+    if (after_created_at is None) != (after_id is None):
+        raise HTTPException(
+            status_code=400,
+            detail="after_created_at and after_id must be given together",
+        )
+
+    where_sql = """
+        AND created_at >= COALESCE(%s::timestamptz, '-infinity')
+        AND created_at < COALESCE(%s::timestamptz, 'infinity')
+    """
+    params = [since, until]
+    if after_id is not None:
+        where_sql += " AND (created_at, id) > (%s, %s)"
+        params += [after_created_at, after_id]
+    return where_sql, params
+
+
+def _json_default(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def _ndjson_chunk(rows, columns) -> str:
+    return "".join(
+        json.dumps({column: row[column] for column in columns}, default=_json_default)
+        + "\n"
+        for row in rows
+    )
+
+
+def _csv_chunk(rows, columns) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(
+            (
+                row[column].isoformat()
+                if isinstance(row[column], datetime)
+                else row[column]
+            )
+            for column in columns
+        )
+    return buffer.getvalue()
+
+
+def stream_rows(query: str, params, columns: list, export_format: ExportFormat):
+    """
+    Yield the rows of a query as NDJSON or CSV, one chunk at a time.
+
+    Rows come from a named (server-side) cursor on a pooled connection, so
+    only EXPORT_CHUNK_SIZE rows are held in memory whatever the result size.
+    """
+    if export_format == "csv":
+        header = io.StringIO()
+        csv.writer(header).writerow(columns)
+        yield header.getvalue()
+
+    format_chunk = _csv_chunk if export_format == "csv" else _ndjson_chunk
+    with db_connection() as conn:
+        with conn.cursor(name="export") as cursor:
+            cursor.itersize = settings.EXPORT_CHUNK_SIZE
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(settings.EXPORT_CHUNK_SIZE)
+                if not rows:
+                    break
+                yield format_chunk(rows, columns)
+
+
+def export_response(
+    query: str, params, columns: list, export_format: ExportFormat, filename: str
+) -> StreamingResponse:
+    """Stream an export as a file download."""
+    extension = "csv" if export_format == "csv" else "ndjson"
+    return StreamingResponse(
+        stream_rows(query, params, columns, export_format),
+        media_type=MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}.{extension}"'
+        },
+    )
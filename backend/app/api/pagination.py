@@ -0,0 +1,62 @@
+import base64
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException, Response
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+APPROXIMATE_TOTAL_HEADER = "X-Approximate-Total-Count"
+
+# Largest page a list endpoint returns
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Encode a (created_at, id) position as an opaque page cursor."""
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """Decode a page cursor back into its (created_at, id) position."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+
+def page_filter(page_cursor: Optional[str], skip: int) -> tuple:
+    """
+    Build the positioning part of a newest-first listing query.
+
+    With a cursor the query seeks directly past the (created_at, id) position
+    of the previous page; without one it falls back to the legacy OFFSET. The
+    plain created_at bound lets Postgres prune partitions of partitioned tables.
+
+    Returns:
+        A (where_sql, where_params, offset) tuple
+    """
+    if page_cursor:
+        created_at, row_id = decode_cursor(page_cursor)
+        return (
+            "AND created_at <= %s AND (created_at, id) < (%s, %s)",
+            [created_at, created_at, row_id],
+            0,
+        )
+    return "", [], skip
+
+
+def finish_page(rows: list, limit: int, response: Response) -> list:
+    """
+    Trim the extra look-ahead row and advertise the next cursor if any.
+    Queries fetch limit + 1 rows so a full page can tell whether more exist.
+    """
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            last["created_at"], last["id"]
+        )
+    return rows
@@ -8,6 +8,7 @@ from app.api.endpoints import (
     config,
     dashboard,
     health,
+    crm,
 )
 
 api_router = APIRouter()
@@ -19,4 +20,5 @@ api_router.include_router(leads.router, prefix="/leads", tags=["Leads"])
 api_router.include_router(events.router, prefix="/events", tags=["Events"])
 api_router.include_router(config.router, prefix="/config", tags=["Configuration"])
 api_router.include_router(dashboard.router, prefix="/dashboard", tags=["Dashboard"])
+api_router.include_router(crm.router, prefix="/crm", tags=["CRM"])
 api_router.include_router(health.router, prefix="/health", tags=["Health"])
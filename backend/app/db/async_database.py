@@ -0,0 +1,136 @@
+import asyncio
+import functools
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from psycopg2.extras import execute_values
+
+from app.core.config import settings
+from app.db.database import get_db_connection, release_db_connection
+from app.db.pool import PoolTimeout
+
+# Dedicated threads for blocking psycopg2 calls, sized to the connection pool
+# so every checked-out connection can always make progress.
+_executor = ThreadPoolExecutor(
+    max_workers=settings.DB_POOL_MAX_SIZE, thread_name_prefix="db"
+)
+
+# One checkout limiter per event loop, bounding coroutines that hold or wait
+# for a pooled connection to the number of executor threads.
+_checkout_limiters = weakref.WeakKeyDictionary()
+
+
+async def run_in_db_executor(func, *args, **kwargs):
+    """Run a blocking database call on the database thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _executor, functools.partial(func, *args, **kwargs)
+    )
+
+
+@asynccontextmanager
+async def checkout_limiter():
+    """
+    Hold one of the event loop's checkout slots for the block.
+
+    Raises:
+        PoolTimeout: No slot came free within DB_POOL_TIMEOUT, as when the
+            pool itself has no connection to hand out
+    """
+    loop = asyncio.get_running_loop()
+    limiter = _checkout_limiters.get(loop)
+    if limiter is None:
+        limiter = asyncio.Semaphore(settings.DB_POOL_MAX_SIZE)
+        _checkout_limiters[loop] = limiter
+
+    try:
+        await asyncio.wait_for(limiter.acquire(), settings.DB_POOL_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise PoolTimeout(
+            f"No database connection available after {settings.DB_POOL_TIMEOUT}s "
+            f"(pool size {settings.DB_POOL_MAX_SIZE})"
+        )
+    try:
+        yield
+    finally:
+        limiter.release()
+
+
+class AsyncCursor:
+    """
+    Awaitable wrapper around a psycopg2 cursor.
+
+    Statements run on the database thread pool so the event loop keeps
+    serving other requests while Postgres works. Fetching reads rows that
+    psycopg2 already buffered client-side and does not leave the loop.
+    """
+
+    def __init__(self, cursor, connection: "AsyncConnection"):
+        self._cursor = cursor
+        self.connection = connection
+
+    @property
+    def rowcount(self) -> int:
+        return self._cursor.rowcount
+
+    async def execute(self, query, params=None):
+        await run_in_db_executor(self._cursor.execute, query, params)
+
+    async def executemany(self, query, params_seq):
+        await run_in_db_executor(self._cursor.executemany, query, params_seq)
+
+    async def execute_values(self, query, argslist, template=None, fetch=False):
+        """Multi-row statement through psycopg2.extras.execute_values."""
+        return await run_in_db_executor(
+            execute_values,
+            self._cursor,
+            query,
+            argslist,
+            template=template,
+            page_size=max(len(argslist), 1),
+            fetch=fetch,
+        )
+
+    async def fetchone(self):
+        return self._cursor.fetchone()
+
+    async def fetchall(self):
+        return self._cursor.fetchall()
+
+    async def fetchmany(self, size=None):
+        if size is None:
+            return self._cursor.fetchmany()
+        return self._cursor.fetchmany(size)
+
+    def close(self):
+        self._cursor.close()
+
+
+class AsyncConnection:
+    """Awaitable wrapper around a pooled psycopg2 connection."""
+
+    def __init__(self, conn):
+        self.raw = conn
+
+    def cursor(self, **kwargs) -> AsyncCursor:
+        return AsyncCursor(self.raw.cursor(**kwargs), self)
+
+    async def commit(self):
+        await run_in_db_executor(self.raw.commit)
+
+    async def rollback(self):
+        await run_in_db_executor(self.raw.rollback)
+
+
+@asynccontextmanager
+async def pooled_cursor():
+    """AsyncCursor on a connection checked out of the pool for the block."""
+    async with checkout_limiter():
+        conn = await run_in_db_executor(get_db_connection)
+        cursor = AsyncConnection(conn).cursor()
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+            await run_in_db_executor(release_db_connection, conn)
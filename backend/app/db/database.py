@@ -1,7 +1,11 @@
+import threading
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from contextlib import contextmanager
 
+from app.core.config import settings
+from app.db.pool import ConnectionPool
+
 # Database connection parameters
 DB_PARAMS = {
     "host": "localhost",
@@ -11,10 +15,13 @@ DB_PARAMS = {
     "port": 5432,
 }
 
+_pool = None
+_pool_lock = threading.Lock()
 
-def get_db_connection():
+
+def _connect():
     """
-    Create and return a database connection.
+    Open a new physical database connection.
     Returns a connection object with RealDictCursor to return results as dictionaries.
     """
     try:
@@ -51,6 +58,45 @@ def get_db_connection():
             raise
 
 
+def get_pool() -> ConnectionPool:
+    """Return the process-wide connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    _connect,
+                    min_size=settings.DB_POOL_MIN_SIZE,
+                    max_size=settings.DB_POOL_MAX_SIZE,
+                    timeout=settings.DB_POOL_TIMEOUT,
+                    pre_ping=settings.DB_POOL_PRE_PING,
+                    max_lifetime=settings.DB_POOL_MAX_LIFETIME,
+                )
+    return _pool
+
+
+def close_pool():
+    """Close the connection pool, e.g. on application shutdown."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def get_db_connection():
+    """
+    Check a connection out of the pool.
+    The connection must be handed back with release_db_connection().
+    """
+    return get_pool().getconn()
+
+
+def release_db_connection(conn, discard=False):
+    """Return a connection obtained from get_db_connection() to the pool."""
+    get_pool().putconn(conn, discard=discard)
+
+
 @contextmanager
 def db_connection():
     """Context manager for database connections"""
@@ -60,7 +106,7 @@ def db_connection():
         yield conn
     finally:
         if conn:
-            conn.close()
+            release_db_connection(conn)
 
 
 @contextmanager
@@ -81,7 +127,7 @@ def db_transaction():
         raise
     finally:
         if conn:
-            conn.close()
+            release_db_connection(conn)
 
 
 def execute_query(query, params=None, fetch=True, many=False):
@@ -170,36 +216,6 @@ def insert_and_return_id(query, params, id_column="id"):
         print(f"Query: {query}")
         print(f"Params: {params}")
         raise
-    conn = None
-    cursor = None
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        if many and params:
-            cursor.executemany(query, params)
-        else:
-            cursor.execute(query, params)
-
-        if fetch:
-            results = cursor.fetchall()
-            return results
-        else:
-            conn.commit()
-            if cursor.rowcount >= 0:
-                return cursor.rowcount
-            return None
-
-    except Exception as e:
-        if conn:
-            conn.rollback()
-        print(f"Query execution error: {e}")
-        raise
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
 
 
 def execute_transaction(queries):
@@ -243,4 +259,4 @@ def execute_transaction(queries):
         if cursor:
             cursor.close()
         if conn:
-            conn.close()
+            release_db_connection(conn)
@@ -1,13 +1,19 @@
 import psycopg2
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 
+from app.db.async_database import pooled_cursor
+from app.db.database import db_connection
+from app.db.migrations import upgrade_database
+from app.db.partitions import maintain_partitions
+from app.services.rollups import rebuild_rollups
+
 
 # Database connection parameters
 DB_PARAMS = {"host": "localhost", "user": "postgres", "password": "2006", "port": 5432}
 
 
 def create_tables():
-    """Create tables if they don't exist."""
+    """Create the database if needed and apply pending schema migrations."""
 
     try:
         # First check if database exists, connect to postgres
@@ -29,109 +35,58 @@ def create_tables():
         cursor.close()
         conn.close()
 
-        # Now connect to the cloudilic database to create tables
-        print("Setting up tables in 'cloudilic' database...")
-        conn = psycopg2.connect(dbname="cloudilic", **DB_PARAMS)
-        cursor = conn.cursor()
+        # Now bring the 'cloudilic' schema up to date with the migrations
+        print("Applying migrations to 'cloudilic' database...")
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT to_regclass('user_rollups') IS NULL AS missing")
+            rollups_missing = cursor.fetchone()["missing"]
+            cursor.close()
 
-        # Create users table
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS users (
-                id SERIAL PRIMARY KEY,
-                username VARCHAR UNIQUE NOT NULL,
-                email VARCHAR UNIQUE NOT NULL,
-                hashed_password VARCHAR NOT NULL,
-                is_active BOOLEAN DEFAULT TRUE,
-                created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-            )
-        """
-        )
-
-        # Create leads table
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS leads (
-                id SERIAL PRIMARY KEY,
-                name VARCHAR,
-                email VARCHAR,
-                company VARCHAR,
-                raw_message TEXT,
-                created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP WITH TIME ZONE,
-                user_id INTEGER REFERENCES users(id)
-            )
-        """
-        )
-
-        # Create crm_attempts table
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS crm_attempts (
-                id SERIAL PRIMARY KEY,
-                lead_id INTEGER REFERENCES leads(id),
-                success BOOLEAN DEFAULT FALSE,
-                attempt_number INTEGER,
-                error_message TEXT,
-                created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-            )
-        """
-        )
-
-        # Create events table
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS events (
-                id SERIAL PRIMARY KEY,
-                event_type VARCHAR,
-                event_id VARCHAR UNIQUE,
-                user_id INTEGER REFERENCES users(id),
-                payload TEXT,
-                status VARCHAR,
-                created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-            )
-        """
-        )
-
-        # Create demo user if it doesn't exist
-        from app.services.auth import get_password_hash
-
-        # Check if demo user exists
-        cursor.execute("SELECT id FROM users WHERE username = 'demo'")
-        demo_user = cursor.fetchone()
-
-        if not demo_user:
-            print("Creating demo user...")
-            # Create a demo user with password 'password'
-            hashed_password = get_password_hash("password")
-            cursor.execute(
-                """
-                INSERT INTO users (username, email, hashed_password, is_active)
-                VALUES (%s, %s, %s, %s)
-                """,
-                ("demo", "demo@example.com", hashed_password, True),
-            )
-            print("Demo user created!")
-
-        conn.commit()
-        print("Database tables are ready!")
+        upgrade_database()
 
-        cursor.close()
-        conn.close()
+        with db_connection() as conn:
+            maintain_partitions(conn)
+
+        with db_connection() as conn:
+            cursor = conn.cursor()
+
+            # Backfill the dashboard rollups when they were just created
+            if rollups_missing:
+                rebuild_rollups(conn)
+
+            # Create demo user if it doesn't exist
+            from app.services.auth import get_password_hash
+
+            # Check if demo user exists
+            cursor.execute("SELECT id FROM users WHERE username = 'demo'")
+            demo_user = cursor.fetchone()
+
+            if not demo_user:
+                print("Creating demo user...")
+                # Create a demo user with password 'password'
+                hashed_password = get_password_hash("password")
+                cursor.execute(
+                    """
+                    INSERT INTO users (username, email, hashed_password, is_active)
+                    VALUES (%s, %s, %s, %s)
+                    """,
+                    ("demo", "demo@example.com", hashed_password, True),
+                )
+                print("Demo user created!")
+
+            conn.commit()
+            print("Database tables are ready!")
+
+            cursor.close()
 
     except Exception as e:
         print(f"Database initialization error: {e}")
         raise
 
 
-# This is a context manager for getting a database connection in FastAPI endpoints
-def get_db():
-    from app.db.database import get_db_connection
-
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
+# This is a context manager for getting a database connection in FastAPI endpoints.
+# It yields an AsyncCursor so queries are awaited instead of blocking the event loop.
+async def get_db():
+    async with pooled_cursor() as cursor:
         yield cursor
-    finally:
-        cursor.close()
-        conn.close()
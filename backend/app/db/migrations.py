@@ -0,0 +1,67 @@
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+
+from app.db.database import DB_PARAMS, db_connection
+
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+
+
+class SchemaOutOfDate(RuntimeError):
+    """Raised at startup when the database is not at the latest migration."""
+
+
+def database_url() -> str:
+    """SQLAlchemy URL of the application database, used by Alembic."""
+    return (
+        "postgresql+psycopg2://{user}:{password}@{host}:{port}/{dbname}".format(
+            **DB_PARAMS
+        )
+    )
+
+
+def alembic_config() -> Config:
+    config = Config(str(ALEMBIC_INI))
+    # Keep the application's logging configuration when run in-process
+    config.attributes["configure_logger"] = False
+    return config
+
+
+def head_revision() -> str:
+    """Latest revision available in migrations/versions."""
+    return ScriptDirectory.from_config(alembic_config()).get_current_head()
+
+
+def current_revision() -> str:
+    """Revision the database is currently at, None if never migrated."""
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT to_regclass('alembic_version') AS version_table")
+            if cursor.fetchone()["version_table"] is None:
+                return None
+            cursor.execute("SELECT version_num FROM alembic_version")
+            row = cursor.fetchone()
+            return row["version_num"] if row else None
+
+
+def upgrade_database(revision: str = "head"):
+    """Apply all pending migrations."""
+    command.upgrade(alembic_config(), revision)
+
+
+def check_schema_version():
+    """
+    Verify that the database schema is at the latest migration.
+
+    Raises:
+        SchemaOutOfDate: If migrations are pending
+    """
+    current, head = current_revision(), head_revision()
+    if current != head:
+        raise SchemaOutOfDate(
+            f"Database schema is at revision {current or 'none'} but the code "
+            f"expects {head}. Run 'python create_database.py' (or "
+            f"'alembic upgrade head') to apply the pending migrations."
+        )
@@ -0,0 +1,273 @@
+import asyncio
+import gzip
+import logging
+import os
+import re
+from datetime import date, datetime, timezone
+
+from app.core.config import settings
+from app.db.async_database import run_in_db_executor
+from app.db.database import db_connection
+from app.services.rollups import forget_events
+
+logger = logging.getLogger(__name__)
+
+# Tables range-partitioned by month on created_at. Monthly partitions are
+# named <table>_YYYY_MM; rows outside every partition land in <table>_default.
+PARTITIONED_TABLES = ("events",)
+
+PARTITION_NAME = re.compile(r"^(?P<table>\w+)_(?P<year>\d{4})_(?P<month>\d{2})$")
+
+
+def add_months(month: date, count: int) -> date:
+    """First day of the month `count` months after `month`."""
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_start(value: datetime = None) -> date:
+    value = value or datetime.now(timezone.utc)
+    return date(value.year, value.month, 1)
+
+
+def month_bound(month: date) -> datetime:
+    """Partition bound for a month, pinned to UTC whatever the session time zone."""
+    return datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_{month.year:04d}_{month.month:02d}"
+
+
+def list_partitions(conn, table: str) -> list:
+    """Monthly partitions of a table as (name, month) tuples, oldest first."""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname AS name
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s
+            """,
+            (table,),
+        )
+        rows = cursor.fetchall()
+
+    partitions = []
+    for row in rows:
+        match = PARTITION_NAME.match(row["name"])
+        if match and match.group("table") == table:
+            month = date(int(match.group("year")), int(match.group("month")), 1)
+            partitions.append((row["name"], month))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def list_detached_partitions(conn, table: str) -> list:
+    """
+    Monthly tables of `table` that are no longer attached, e.g. left behind
+    by an earlier retention run that failed, as (name, month) tuples.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT relname AS name
+            FROM pg_class
+            WHERE relkind = 'r' AND NOT relispartition
+              AND relnamespace = current_schema()::regnamespace
+              AND relname LIKE %s
+            """,
+            (f"{table}\\_%",),
+        )
+        rows = cursor.fetchall()
+
+    detached = []
+    for row in rows:
+        match = PARTITION_NAME.match(row["name"])
+        if match and match.group("table") == table:
+            month = date(int(match.group("year")), int(match.group("month")), 1)
+            detached.append((row["name"], month))
+    return sorted(detached, key=lambda partition: partition[1])
+
+
+def _columns(cursor, table: str) -> str:
+    cursor.execute(
+        """
+        SELECT string_agg(quote_ident(attname), ', ' ORDER BY attnum) AS columns
+        FROM pg_attribute
+        WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped
+        """,
+        (table,),
+    )
+    return cursor.fetchone()["columns"]
+
+
+def _create_partition(cursor, table: str, name: str, month: date):
+    """
+    Create the partition of a month. Rows of that month already in the
+    default partition would make a plain CREATE ... PARTITION OF fail, so
+    they are moved into the new table before it is attached.
+    """
+    bounds = (month_bound(month), month_bound(add_months(month, 1)))
+    default = f"{table}_default"
+    cursor.execute(
+        f"""
+        SELECT EXISTS (
+            SELECT 1 FROM {default} WHERE created_at >= %s AND created_at < %s
+        ) AS misplaced
+        """,
+        bounds,
+    )
+    if not cursor.fetchone()["misplaced"]:
+        cursor.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table}
+            FOR VALUES FROM (%s) TO (%s)
+            """,
+            bounds,
+        )
+        return
+
+    columns = _columns(cursor, table)
+    cursor.execute(
+        f"""
+        CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS);
+        WITH moved AS (
+            DELETE FROM {default}
+            WHERE created_at >= %(start)s AND created_at < %(end)s
+            RETURNING {columns}
+        )
+        INSERT INTO {name} ({columns}) SELECT {columns} FROM moved;
+        ALTER TABLE {table} ATTACH PARTITION {name}
+        FOR VALUES FROM (%(start)s) TO (%(end)s);
+        """,
+        {"start": bounds[0], "end": bounds[1]},
+    )
+    logger.warning(f"Moved rows of {name} out of the default partition {default}")
+
+
+def ensure_partitions(conn, table: str, months_ahead: int = None) -> list:
+    """
+    Create the monthly partitions from the current month up to `months_ahead`
+    months in the future, so inserts never fall into the default partition.
+
+    Returns:
+        Names of the partitions that were created
+    """
+    if months_ahead is None:
+        months_ahead = settings.PARTITION_MONTHS_AHEAD
+
+    existing = {name for name, _ in list_partitions(conn, table)}
+    created = []
+    current = month_start()
+
+    with conn.cursor() as cursor:
+        for offset in range(months_ahead + 1):
+            month = add_months(current, offset)
+            name = partition_name(table, month)
+            if name in existing:
+                continue
+            _create_partition(cursor, table, name, month)
+            created.append(name)
+
+    conn.commit()
+    if created:
+        logger.info(f"Created partitions: {', '.join(created)}")
+    return created
+
+
+def archive_partition(conn, name: str, archive_dir: str) -> str:
+    """Dump a partition to a gzip-compressed CSV file."""
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{name}.csv.gz")
+    with conn.cursor() as cursor, gzip.open(path, "wb") as archive:
+        cursor.copy_expert(f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER)", archive)
+    return path
+
+
+def apply_retention(
+    conn, table: str, retention_months: int = None, archive_dir: str = None
+) -> list:
+    """
+    Drop monthly partitions that are entirely older than the retention window.
+
+    Expired partitions are optionally archived to `archive_dir` as
+    compressed CSV while still attached, then detached and dropped in one
+    transaction, instead of deleting their rows one by one. A failed archive
+    leaves the partition attached, to be tried again on the next run.
+    Tables of expired months left detached by an earlier version are
+    archived and dropped as well.
+
+    Args:
+        conn: A psycopg2 connection
+        table: The partitioned table
+        retention_months: Months kept besides the current one, 0 keeps everything
+        archive_dir: Directory for the archives, no archiving when empty
+
+    Returns:
+        Names of the partitions that were removed
+    """
+    if retention_months is None:
+        retention_months = settings.EVENTS_RETENTION_MONTHS
+    if archive_dir is None:
+        archive_dir = settings.EVENTS_ARCHIVE_DIR
+    if retention_months <= 0:
+        return []
+
+    cutoff = add_months(month_start(), -retention_months)
+    expired = [
+        (name, month, True)
+        for name, month in list_partitions(conn, table)
+        if month < cutoff
+    ]
+    expired += [
+        (name, month, False)
+        for name, month in list_detached_partitions(conn, table)
+        if month < cutoff
+    ]
+    removed = []
+
+    for name, _, attached in sorted(expired, key=lambda partition: partition[1]):
+        if archive_dir:
+            path = archive_partition(conn, name, archive_dir)
+            logger.info(f"Archived partition {name} to {path}")
+
+        with conn.cursor() as cursor:
+            if table == "events":
+                forget_events(cursor, name)
+            if attached:
+                cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+            cursor.execute(f"DROP TABLE {name}")
+        conn.commit()
+        removed.append(name)
+
+    if removed:
+        logger.info(f"Dropped expired partitions: {', '.join(removed)}")
+    return removed
+
+
+def maintain_partitions(conn) -> dict:
+    """Create upcoming partitions and apply retention for every partitioned table."""
+    report = {}
+    for table in PARTITIONED_TABLES:
+        report[table] = {
+            "created": ensure_partitions(conn, table),
+            "dropped": apply_retention(conn, table),
+        }
+    return report
+
+
+def _run_maintenance() -> dict:
+    with db_connection() as conn:
+        return maintain_partitions(conn)
+
+
+async def partition_maintenance_loop(interval: float = None):
+    """Background task keeping partitions ahead of time and applying retention."""
+    interval = interval or settings.PARTITION_MAINTENANCE_INTERVAL
+    while True:
+        try:
+            await run_in_db_executor(_run_maintenance)
+        except Exception as e:
+            logger.error(f"Partition maintenance failed: {e}")
+        await asyncio.sleep(interval)
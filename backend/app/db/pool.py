@@ -0,0 +1,245 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out before the timeout."""
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of psycopg2 connections.
+
+    Connections are created lazily up to ``max_size`` and kept around for
+    reuse. A connection is validated before it is handed out (optional
+    pre-ping), recycled once it is older than ``max_lifetime`` seconds and
+    rolled back when it is returned so no transaction leaks between users.
+    """
+
+    def __init__(
+        self,
+        connect,
+        min_size: int = 1,
+        max_size: int = 10,
+        timeout: float = 30.0,
+        pre_ping: bool = True,
+        max_lifetime: float = 3600.0,
+    ):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size")
+
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.pre_ping = pre_ping
+        self.max_lifetime = max_lifetime
+
+        self._lock = threading.Condition()
+        self._idle = deque()  # (connection, created_at)
+        self._created_at = {}  # id(connection) -> created_at
+        self._size = 0
+        self._waiting = 0
+        self._closed = False
+
+        # Counters for monitoring
+        self._checkouts = 0
+        self._timeouts = 0
+        self._connections_created = 0
+        self._connections_discarded = 0
+        self._wait_time_total = 0.0
+
+    def open(self):
+        """Create the minimum number of connections up front."""
+        while True:
+            # Reserve one slot per connection, so a failed connect gives
+            # back exactly the slot it took
+            with self._lock:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+
+            try:
+                conn = self._new_connection()
+            except Exception:
+                with self._lock:
+                    self._size -= 1
+                    self._lock.notify()
+                raise
+            with self._lock:
+                self._idle.append((conn, self._created_at[id(conn)]))
+                self._lock.notify()
+
+    def getconn(self, timeout: float = None):
+        """
+        Check a connection out of the pool.
+
+        Args:
+            timeout: Seconds to wait for a free connection, defaults to the pool timeout
+
+        Returns:
+            A validated psycopg2 connection
+        """
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        while True:
+            conn = None
+            create = False
+
+            with self._lock:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed")
+
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(
+                            f"No database connection available after {timeout}s "
+                            f"(pool size {self.max_size})"
+                        )
+                    self._waiting += 1
+                    try:
+                        self._lock.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+
+                if self._idle:
+                    conn, created_at = self._idle.pop()
+                else:
+                    self._size += 1
+                    create = True
+
+            if create:
+                try:
+                    conn = self._new_connection()
+                except Exception:
+                    with self._lock:
+                        self._size -= 1
+                        self._lock.notify()
+                    raise
+            elif not self._is_usable(conn, created_at):
+                self._discard(conn)
+                continue
+
+            with self._lock:
+                self._checkouts += 1
+                self._wait_time_total += time.monotonic() - started
+            return conn
+
+    def putconn(self, conn, discard: bool = False):
+        """
+        Return a connection to the pool.
+
+        Args:
+            conn: A connection previously obtained with getconn
+            discard: Close the connection instead of keeping it for reuse
+        """
+        if not discard and not conn.closed:
+            try:
+                # Never hand a connection with an open transaction to the next user
+                conn.rollback()
+            except Exception as e:
+                logger.warning(f"Discarding connection that failed to reset: {e}")
+                discard = True
+
+        created_at = self._created_at.get(id(conn), 0)
+        if (
+            discard
+            or conn.closed
+            or self._closed
+            or self._expired(created_at)
+        ):
+            self._discard(conn)
+            return
+
+        with self._lock:
+            self._idle.append((conn, created_at))
+            self._lock.notify()
+
+    @contextmanager
+    def connection(self, timeout: float = None):
+        """Context manager that checks a connection out and always returns it."""
+        conn = self.getconn(timeout)
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def close(self):
+        """Close every idle connection and refuse further checkouts."""
+        with self._lock:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._lock.notify_all()
+
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def stats(self) -> dict:
+        """Return a snapshot of the pool state for monitoring."""
+        with self._lock:
+            idle = len(self._idle)
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._size,
+                "idle": idle,
+                "in_use": self._size - idle,
+                "waiting": self._waiting,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "connections_created": self._connections_created,
+                "connections_discarded": self._connections_discarded,
+                "avg_wait_ms": round(
+                    self._wait_time_total / self._checkouts * 1000, 3
+                )
+                if self._checkouts
+                else 0.0,
+            }
+
+    def _new_connection(self):
+        conn = self._connect()
+        with self._lock:
+            self._created_at[id(conn)] = time.monotonic()
+            self._connections_created += 1
+        return conn
+
+    def _expired(self, created_at: float) -> bool:
+        return bool(self.max_lifetime) and (
+            time.monotonic() - created_at > self.max_lifetime
+        )
+
+    def _is_usable(self, conn, created_at: float) -> bool:
+        if conn.closed or self._expired(created_at):
+            return False
+        if not self.pre_ping:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception as e:
+            logger.warning(f"Pre-ping failed, replacing connection: {e}")
+            return False
+
+    def _discard(self, conn):
+        try:
+            if not conn.closed:
+                conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._created_at.pop(id(conn), None)
+            self._size -= 1
+            self._connections_discarded += 1
+            self._lock.notify()
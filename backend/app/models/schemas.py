@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import datetime
 
 
@@ -38,6 +38,26 @@ class LeadExtracted(BaseModel):
     company: str
 
 
+class WebhookAccepted(BaseModel):
+    event_id: str
+    status: str
+
+
+class WebhookBatchItemResult(BaseModel):
+    index: int
+    status: str
+    event_id: Optional[str] = None
+    lead: Optional[LeadExtracted] = None
+    error: Optional[str] = None
+
+
+class WebhookBatchResponse(BaseModel):
+    total: int
+    succeeded: int
+    failed: int
+    results: List[WebhookBatchItemResult]
+
+
 class CRMAttemptResponse(BaseModel):
     id: int
     lead_id: int
@@ -58,6 +78,10 @@ class LeadResponse(BaseModel):
     raw_message: str
     created_at: datetime
     updated_at: Optional[datetime] = None
+    crm_status: str = "pending"
+    crm_attempt_count: int = 0
+    crm_last_attempt_at: Optional[datetime] = None
+    crm_last_error: Optional[str] = None
     crm_attempts: List[CRMAttemptResponse] = []
 
     class Config:
@@ -71,12 +95,34 @@ class EventResponse(BaseModel):
     user_id: int
     payload: Optional[str] = None
     status: str
+    lead_id: Optional[int] = None
     created_at: datetime
+    extraction_started_at: Optional[datetime] = None
+    extraction_finished_at: Optional[datetime] = None
+    extraction_backend: Optional[str] = None
+    lead_persisted_at: Optional[datetime] = None
+    crm_finished_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
 
+class StageLatency(BaseModel):
+    count: int
+    p50_ms: Optional[float] = None
+    p95_ms: Optional[float] = None
+    p99_ms: Optional[float] = None
+
+
+class EventLatencyReport(BaseModel):
+    since: datetime
+    until: datetime
+    events: int
+    stages: Dict[str, StageLatency]
+    extraction_backends: Dict[str, int]
+    extraction_cache_hit_rate: float
+
+
 class UserResponse(BaseModel):
     id: int
     username: str
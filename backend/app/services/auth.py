@@ -7,6 +7,7 @@ from fastapi.security import OAuth2PasswordBearer
 
 from app.models.schemas import TokenData
 from app.core.config import settings
+from app.db.async_database import pooled_cursor
 from app.db.init_db import get_db
 
 # Password hashing
@@ -22,17 +23,17 @@ def get_password_hash(password):
     return pwd_context.hash(password)
 
 
-def get_user(cursor, username: str):
-    cursor.execute(
+async def get_user(cursor, username: str):
+    await cursor.execute(
         "SELECT id, username, email, hashed_password, is_active, created_at FROM users WHERE username = %s",
         (username,),
     )
-    return cursor.fetchone()
+    return await cursor.fetchone()
 
 
-def authenticate_user(cursor, username: str, password: str):
+async def authenticate_user(cursor, username: str, password: str):
     print(f"Attempting to authenticate user: {username}")
-    user = get_user(cursor, username)
+    user = await get_user(cursor, username)
     if not user:
         print(f"User not found: {username}")
         return False
@@ -63,6 +64,10 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 
 
 async def get_current_user(cursor=Depends(get_db), token: str = Depends(oauth2_scheme)):
+    return await _user_from_token(cursor, token)
+
+
+async def _user_from_token(cursor, token: str):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -80,7 +85,7 @@ async def get_current_user(cursor=Depends(get_db), token: str = Depends(oauth2_s
     except JWTError as e:
         print(f"JWT decode error: {str(e)}")
         raise credentials_exception
-    user = get_user(cursor, username=token_data.username)
+    user = await get_user(cursor, username=token_data.username)
     if user is None:
         print(f"User not found in database: {token_data.username}")
         raise credentials_exception
@@ -91,3 +96,14 @@ async def get_current_active_user(current_user: dict = Depends(get_current_user)
     if not current_user["is_active"]:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
+
+
+async def get_authenticated_user(token: str = Depends(oauth2_scheme)):
+    """
+    get_current_active_user on a connection returned right after the lookup,
+    for dependencies that run before the request's connection is checked
+    out, such as admission control, and for long-lived streams.
+    """
+    async with pooled_cursor() as cursor:
+        user = await _user_from_token(cursor, token)
+    return await get_current_active_user(user)
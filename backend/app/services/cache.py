@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import OrderedDict
+
+from app.core.config import settings
+
+
+class TTLCache:
+    """
+    Thread-safe in-process cache with a size bound, per-entry TTL and LRU
+    eviction. Hit, miss, expiration and eviction counters are kept so the
+    cache can be sized from its stats().
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._expirations = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def get(self, key):
+        """Return the cached value for key, or None when missing or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self._expirations += 1
+                self._misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, key, value, ttl: float = None):
+        """Store value under key, evicting the least recently used entries."""
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, key):
+        """Drop a single entry."""
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self._invalidations += 1
+
+    def invalidate_matching(self, predicate):
+        """Drop every entry whose key satisfies predicate(key)."""
+        with self._lock:
+            stale = [key for key in self._data if predicate(key)]
+            for key in stale:
+                del self._data[key]
+            self._invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._data),
+                "max_size": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "expirations": self._expirations,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+            }
+
+
+# Dashboard stats keyed by (user_id, granularity, buckets)
+dashboard_stats_cache = TTLCache(
+    maxsize=settings.DASHBOARD_CACHE_MAX_SIZE, ttl=settings.DASHBOARD_CACHE_TTL
+)
+
+
+def invalidate_dashboard_stats(user_id: int):
+    """Forget every cached dashboard window of a user after their data changed."""
+    dashboard_stats_cache.invalidate_matching(lambda key: key[0] == user_id)
@@ -0,0 +1,251 @@
+import asyncio
+import importlib.util
+import logging
+import random
+from abc import ABC, abstractmethod
+
+import httpx
+
+from app.core.config import settings
+from app.services.resilience import CircuitBreaker, ConcurrencyLimiter, TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class CRMError(Exception):
+    """A CRM call failed."""
+
+
+class CRMTransientError(CRMError):
+    """Timeouts, connection resets and 5xx responses."""
+
+
+class CRMRateLimitError(CRMError):
+    """The CRM asked us to slow down."""
+
+
+class CRMRejectedError(CRMError):
+    """The CRM refused the lead; sending it again will not help."""
+
+
+class CRMCircuitOpenError(CRMError):
+    """The CRM circuit breaker is open; the lead was not sent."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"CRM circuit open, retry in {retry_after:.1f} seconds")
+        self.retry_after = retry_after
+
+
+def _lead_payload(lead: dict) -> dict:
+    return {
+        "id": lead["id"],
+        "name": lead["name"],
+        "email": lead["email"],
+        "company": lead["company"],
+    }
+
+
+class CRMAdapter(ABC):
+    """Interface to the CRM that leads are pushed to."""
+
+    @abstractmethod
+    async def push_leads(self, leads: list) -> dict:
+        """
+        Push leads to the CRM.
+
+        Args:
+            leads: Lead rows with id, name, email and company
+
+        Returns:
+            The CRMError of each lead that failed, keyed by lead ID; leads
+            that are missing from the result were saved
+        """
+
+    async def push_lead(self, lead: dict):
+        """Push a single lead, raising its CRMError when it fails."""
+        error = (await self.push_leads([lead])).get(lead["id"])
+        if error is not None:
+            raise error
+
+    async def close(self):
+        """Release the adapter's resources."""
+
+
+class SimulatedCRMAdapter(CRMAdapter):
+    """Stand-in CRM failing at random with CRM_SIMULATED_FAILURE_RATE."""
+
+    async def push_leads(self, leads: list) -> dict:
+        return {
+            lead["id"]: CRMTransientError("CRM API call failed (simulated failure)")
+            for lead in leads
+            if random.random() < settings.CRM_SIMULATED_FAILURE_RATE
+        }
+
+
+class HTTPCRMAdapter(CRMAdapter):
+    """
+    CRM reached over HTTP with a pooled keep-alive client (HTTP/2 when the
+    h2 package is installed). Leads are sent CRM_BATCH_SIZE at a time to
+    POST {CRM_URL}/leads/batch, which reports an outcome per lead.
+    """
+
+    def __init__(self, base_url: str, api_key: str = "", batch_size: int = None):
+        self.batch_size = batch_size or settings.CRM_BATCH_SIZE
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            http2=importlib.util.find_spec("h2") is not None,
+            timeout=settings.CRM_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=settings.CRM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.CRM_MAX_CONNECTIONS,
+            ),
+        )
+
+    @staticmethod
+    def _error_for_status(status_code: int, detail: str) -> CRMError:
+        if status_code == 429:
+            return CRMRateLimitError(f"CRM rate limited the request: {detail}")
+        if status_code >= 500:
+            return CRMTransientError(f"CRM error {status_code}: {detail}")
+        return CRMRejectedError(f"CRM rejected the lead ({status_code}): {detail}")
+
+    async def _push_batch(self, batch: list) -> dict:
+        try:
+            response = await self.client.post(
+                "/leads/batch", json={"leads": [_lead_payload(lead) for lead in batch]}
+            )
+        except httpx.HTTPError as e:
+            error = CRMTransientError(f"CRM request failed: {e!r}")
+            return {lead["id"]: error for lead in batch}
+
+        if response.status_code != 200:
+            error = self._error_for_status(response.status_code, response.text[:200])
+            return {lead["id"]: error for lead in batch}
+
+        # Partial failures: the CRM reports an outcome per lead. A body that
+        # is not the expected JSON fails the batch like a 5xx would
+        try:
+            outcomes = {result["id"]: result for result in response.json()["results"]}
+        except (ValueError, KeyError, TypeError) as e:
+            error = CRMTransientError(f"Malformed CRM response: {e!r}")
+            return {lead["id"]: error for lead in batch}
+
+        errors = {}
+        for lead in batch:
+            outcome = outcomes.get(lead["id"])
+            try:
+                if outcome is None:
+                    errors[lead["id"]] = CRMTransientError(
+                        "CRM did not report the lead"
+                    )
+                elif not outcome["ok"]:
+                    errors[lead["id"]] = self._error_for_status(
+                        int(outcome.get("status", 500)), str(outcome.get("error", ""))
+                    )
+            except (ValueError, KeyError, TypeError) as e:
+                errors[lead["id"]] = CRMTransientError(
+                    f"Malformed CRM outcome of the lead: {e!r}"
+                )
+        return errors
+
+    async def push_leads(self, leads: list) -> dict:
+        batches = [
+            leads[i : i + self.batch_size]
+            for i in range(0, len(leads), self.batch_size)
+        ]
+        errors = {}
+        for batch_errors in await asyncio.gather(
+            *(self._push_batch(batch) for batch in batches)
+        ):
+            errors.update(batch_errors)
+        return errors
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class ResilientCRMAdapter(CRMAdapter):
+    """
+    Guards another adapter with a circuit breaker, a cap on in-flight
+    requests and a token bucket matched to the CRM's request quota.
+
+    Timeouts, 5xx and 429 answers count as failures for the breaker, and
+    rejected (422) leads as neither failures nor successes; while it is open
+    leads fail with CRMCircuitOpenError without reaching the CRM.
+    """
+
+    def __init__(
+        self,
+        adapter: CRMAdapter,
+        breaker: CircuitBreaker,
+        limiter: ConcurrencyLimiter,
+        bucket: TokenBucket,
+    ):
+        self.adapter = adapter
+        self.breaker = breaker
+        self.limiter = limiter
+        self.bucket = bucket
+
+    async def push_leads(self, leads: list) -> dict:
+        if not self.breaker.allow():
+            error = CRMCircuitOpenError(self.breaker.retry_after())
+            return {lead["id"]: error for lead in leads}
+
+        async with self.limiter.slot():
+            await self.bucket.acquire()
+            errors = await self.adapter.push_leads(leads)
+
+        # Leads the CRM rejected as invalid count as neither: it answered
+        failures = sum(
+            isinstance(error, (CRMTransientError, CRMRateLimitError))
+            for error in errors.values()
+        )
+        self.breaker.record(failures=failures, successes=len(leads) - len(errors))
+        return errors
+
+    def stats(self) -> dict:
+        return {
+            "adapter": type(self.adapter).__name__,
+            "circuit_breaker": self.breaker.stats(),
+            "concurrency": self.limiter.stats(),
+            "rate_limit": self.bucket.stats(),
+        }
+
+    async def close(self):
+        await self.adapter.close()
+
+
+_adapter = None
+
+
+def get_crm_adapter() -> ResilientCRMAdapter:
+    """Return the process-wide CRM adapter selected by CRM_ADAPTER."""
+    global _adapter
+    if _adapter is None:
+        if settings.CRM_ADAPTER == "http":
+            adapter = HTTPCRMAdapter(settings.CRM_URL, settings.CRM_API_KEY)
+            logger.info(f"Pushing leads to the CRM at {settings.CRM_URL}")
+        else:
+            adapter = SimulatedCRMAdapter()
+        _adapter = ResilientCRMAdapter(
+            adapter,
+            CircuitBreaker(
+                failure_rate_threshold=settings.CRM_BREAKER_FAILURE_RATE,
+                window_size=settings.CRM_BREAKER_WINDOW,
+                min_calls=settings.CRM_BREAKER_MIN_CALLS,
+                open_seconds=settings.CRM_BREAKER_OPEN_SECONDS,
+                half_open_calls=settings.CRM_BREAKER_HALF_OPEN_CALLS,
+            ),
+            ConcurrencyLimiter(settings.CRM_MAX_CONCURRENCY),
+            TokenBucket(settings.CRM_RATE_LIMIT, settings.CRM_RATE_LIMIT_BURST),
+        )
+    return _adapter
+
+
+async def close_crm_adapter():
+    global _adapter
+    if _adapter is not None:
+        await _adapter.close()
+        _adapter = None
@@ -1,98 +1,408 @@
 import logging
-import time
-import psycopg2
-from app.core.config import settings
 import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from app.core.config import settings
+from app.db.async_database import pooled_cursor
+from app.services.cache import invalidate_dashboard_stats
+from app.services.crm_adapters import (
+    CRMAdapter,
+    CRMCircuitOpenError,
+    CRMError,
+    CRMRateLimitError,
+    CRMRejectedError,
+    CRMTransientError,
+    get_crm_adapter,
+)
+from app.services.job_queue import enqueue_job, job_handler
+from app.services.rollups import record_crm_outcome
 
 logger = logging.getLogger(__name__)
 
+# Outcomes of save_leads_to_crm per lead
+CRM_SAVED = "saved"
+CRM_FAILED = "failed"
+CRM_DEFERRED = "deferred"  # not sent while the circuit breaker is open
+
+# Outcome of a lead's latest attempt for each leads.crm_status, None when
+# the lead was never attempted (pending or deferred)
+LAST_SUCCESS_BY_STATUS = {CRM_SAVED: True, CRM_FAILED: False}
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """How often and how fast to retry a class of CRM errors."""
+
+    max_attempts: int
+    base_delay: float  # seconds
+    max_delay: float  # seconds
+
+    def delay(self, attempt: int) -> float:
+        """
+        Backoff before the attempt following `attempt`: exponential with
+        full jitter, so failed leads do not retry in lockstep.
+        """
+        ceiling = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return random.uniform(0, ceiling)
+
+
+def retry_policies() -> dict:
+    """Retry policy per CRM error class, derived from the CRM_* settings."""
+    default = RetryPolicy(
+        max_attempts=settings.CRM_MAX_RETRIES,
+        base_delay=settings.CRM_RETRY_DELAY,
+        max_delay=settings.CRM_RETRY_MAX_DELAY,
+    )
+    return {
+        CRMTransientError: default,
+        # Back off harder when throttled, and give it a few more chances
+        CRMRateLimitError: RetryPolicy(
+            max_attempts=settings.CRM_MAX_RETRIES + 2,
+            base_delay=settings.CRM_RETRY_DELAY * 5,
+            max_delay=settings.CRM_RETRY_MAX_DELAY,
+        ),
+        CRMRejectedError: RetryPolicy(max_attempts=1, base_delay=0, max_delay=0),
+        CRMError: default,
+    }
+
+
+def policy_class(error: CRMError) -> type:
+    """The error class whose retry policy applies to an error."""
+    policies = retry_policies()
+    for error_class in type(error).__mro__:
+        if error_class in policies:
+            return error_class
+    return CRMError
+
+
+def policy_for(error: CRMError) -> RetryPolicy:
+    return retry_policies()[policy_class(error)]
+
+
+def policy_for_lead(last_error_class: str) -> RetryPolicy:
+    """
+    Retry policy bounding a lead's attempts: that of the error class of its
+    last failed attempt (as recorded in crm_last_error_class), the default
+    one when it has none.
+    """
+    policies = retry_policies()
+    for error_class, policy in policies.items():
+        if error_class.__name__ == last_error_class:
+            return policy
+    return policies[CRMError]
+
 
 class CRMService:
-    """Service to handle CRM operations with retry logic."""
+    """
+    Service to handle CRM operations with retry logic.
+
+    Each call makes a single attempt per lead. A failed attempt that its
+    error class allows to retry is parked as a crm_retry job due after the
+    backoff delay, and the job workers pick it up then, so no request ever
+    waits on a retry.
+
+    No connection is held over the network call: the leads are claimed in a
+    first short transaction, pushed, and their outcomes recorded in a second
+    one. A lead claimed by a concurrent push is not sent twice.
+    """
 
-    def __init__(self, conn):
-        self.conn = conn
-        self.max_retries = settings.CRM_MAX_RETRIES
-        self.retry_delay = settings.CRM_RETRY_DELAY
+    def __init__(self, adapter: CRMAdapter = None):
+        self.adapter = adapter or get_crm_adapter()
 
-    async def save_lead_to_crm(self, lead_id: int) -> bool:
+    async def save_lead_to_crm(self, lead_id: int, finish=None) -> bool:
         """
-        Save lead to CRM with retry logic.
+        Save lead to CRM, scheduling a retry when the attempt fails.
 
         Args:
             lead_id: The ID of the lead to save to CRM
+            finish: See save_leads_to_crm
 
         Returns:
             True if successful, False otherwise
         """
-        cursor = self.conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        results = await self.save_leads_to_crm([lead_id], finish)
+        return results.get(lead_id) == CRM_SAVED
 
-        try:
-            cursor.execute(
-                "SELECT id, name, email, company FROM leads WHERE id = %s", (lead_id,)
+    async def save_leads_to_crm(self, lead_ids: list, finish=None) -> dict:
+        """
+        Save leads to CRM in batches, scheduling retries for the failed ones.
+
+        Leads refused by the open circuit breaker were never sent: they are
+        queued for delivery once the breaker lets calls through again,
+        without using up one of their attempts. So are leads another push is
+        delivering, to be looked at again once its claim has expired.
+
+        Callers must not hold a pooled connection themselves, as connections
+        are checked out for the claim and the outcomes.
+
+        Args:
+            lead_ids: The IDs of the leads to save to CRM
+            finish: Coroutine function called with (cursor, results) in the
+                transaction recording the outcomes, for the caller's own
+                writes to commit together with them
+
+        Returns:
+            CRM_SAVED, CRM_FAILED or CRM_DEFERRED per lead ID
+        """
+        results = {lead_id: CRM_FAILED for lead_id in lead_ids}
+        leads, busy = await self._claim(lead_ids)
+
+        # Check if we've exceeded the retries the last error allows
+        pushable = []
+        for lead in leads:
+            policy = policy_for_lead(lead["crm_last_error_class"])
+            if lead["count"] + 1 > policy.max_attempts:
+                logger.error(f"Max retries exceeded for lead {lead['id']}")
+            else:
+                pushable.append(lead)
+
+        errors = {}
+        if pushable:
+            try:
+                errors = await self.adapter.push_leads(pushable)
+            except Exception:
+                await self._release(lead["id"] for lead in leads)
+                raise
+
+        async with pooled_cursor() as cursor:
+            await self._record(cursor, leads, pushable, busy, errors, results)
+            if finish is not None:
+                await finish(cursor, results)
+            await cursor.connection.commit()
+        for user_id in {lead["user_id"] for lead in leads}:
+            invalidate_dashboard_stats(user_id)
+        return results
+
+    async def _claim(self, lead_ids: list) -> tuple:
+        """
+        Claim the leads no other push is delivering, for CRM_CLAIM_TIMEOUT
+        seconds, and commit the claim.
+
+        Returns:
+            (claimed lead rows, IDs of the leads claimed by another push)
+        """
+        async with pooled_cursor() as cursor:
+            await cursor.execute(
+                """
+                UPDATE leads
+                SET crm_claimed_until = CURRENT_TIMESTAMP + %s * INTERVAL '1 second'
+                WHERE id = ANY(%s)
+                  AND (crm_claimed_until IS NULL
+                       OR crm_claimed_until < CURRENT_TIMESTAMP)
+                RETURNING
+                    id, name, email, company, user_id,
+                    crm_status, crm_attempt_count AS count, crm_last_error_class
+                """,
+                (settings.CRM_CLAIM_TIMEOUT, list(lead_ids)),
+            )
+            leads = await cursor.fetchall()
+            claimed = {lead["id"] for lead in leads}
+            await cursor.execute(
+                "SELECT id FROM leads WHERE id = ANY(%s)",
+                ([lead_id for lead_id in lead_ids if lead_id not in claimed],),
             )
-            lead = cursor.fetchone()
+            busy = [row["id"] for row in await cursor.fetchall()]
+            await cursor.connection.commit()
 
-            if not lead:
+        for lead_id in lead_ids:
+            if lead_id in busy:
+                logger.warning(f"Lead {lead_id} is already being pushed to the CRM")
+            elif lead_id not in claimed:
                 logger.error(f"Lead with ID {lead_id} not found")
-                return False
+        return leads, busy
 
-            # Get the current attempt number
-            cursor.execute(
-                "SELECT COUNT(*) as count FROM crm_attempts WHERE lead_id = %s",
-                (lead_id,),
+    async def _release(self, lead_ids):
+        async with pooled_cursor() as cursor:
+            await cursor.execute(
+                "UPDATE leads SET crm_claimed_until = NULL WHERE id = ANY(%s)",
+                (list(lead_ids),),
             )
-            attempt_count = cursor.fetchone()["count"]
-            current_attempt = attempt_count + 1
+            await cursor.connection.commit()
 
-            # Check if we've exceeded max retries
-            if current_attempt > self.max_retries:
-                logger.error(f"Max retries exceeded for lead {lead_id}")
-                return False
+    async def _record(
+        self,
+        cursor,
+        leads: list,
+        pushable: list,
+        busy: list,
+        errors: dict,
+        results: dict,
+    ):
+        """Record the outcomes of a push and release the claims, uncommitted."""
+        # Leads claimed by another push are looked at again once its claim
+        # expires; one that push saved by then is left alone
+        for lead_id in busy:
+            await enqueue_job(
+                cursor,
+                "crm_retry",
+                {"lead_id": lead_id},
+                run_after=datetime.now(timezone.utc)
+                + timedelta(seconds=settings.CRM_CLAIM_TIMEOUT),
+            )
+            results[lead_id] = CRM_DEFERRED
 
-            # Simulate CRM API call - 80% chance of success
-            success = random.random() > 0.2
+        # Queue the leads the open breaker kept from the CRM
+        attempted = []
+        deferred = []
+        for lead in pushable:
+            error = errors.get(lead["id"])
+            if not isinstance(error, CRMCircuitOpenError):
+                attempted.append(lead)
+                continue
+            await enqueue_job(
+                cursor,
+                "crm_retry",
+                {"lead_id": lead["id"]},
+                run_after=datetime.now(timezone.utc)
+                + timedelta(seconds=error.retry_after + random.uniform(0, 1)),
+            )
+            results[lead["id"]] = CRM_DEFERRED
+            deferred.append(lead["id"])
+        if deferred:
+            logger.warning(f"CRM circuit open, queued {len(deferred)} leads")
 
-            if not success:
-                error_message = "CRM API call failed (simulated failure)"
-                logger.error(
-                    f"Failed to save lead {lead_id} to CRM on attempt {current_attempt}: {error_message}"
-                )
+        # Release the claims of the leads not attempted (given up or
+        # deferred); the attempt statement releases the others
+        attempted_ids = {lead["id"] for lead in attempted}
+        await cursor.execute(
+            """
+            UPDATE leads
+            SET crm_claimed_until = NULL,
+                crm_status = CASE
+                    WHEN id = ANY(%s) AND crm_attempt_count = 0 THEN %s
+                    ELSE crm_status
+                END
+            WHERE id = ANY(%s)
+            """,
+            (
+                deferred,
+                CRM_DEFERRED,
+                [lead["id"] for lead in leads if lead["id"] not in attempted_ids],
+            ),
+        )
+        if not attempted:
+            return
 
-                # Record the failed attempt
-                cursor.execute(
-                    """
-                    INSERT INTO crm_attempts (lead_id, success, attempt_number, error_message)
-                    VALUES (%s, %s, %s, %s)
-                    """,
-                    (lead_id, False, current_attempt, error_message),
+        # Log every attempt and update the leads' CRM state in one statement
+        # (crm_status values are CRM_SAVED and CRM_FAILED). The leads are
+        # claimed by this push, so the attempt number the UPDATE counts and
+        # the status it replaces are never those of a concurrent push
+        rows = await cursor.execute_values(
+            """
+            WITH attempt (lead_id, success, error_message, error_class) AS (
+                VALUES %s
+            ),
+            updated AS (
+                UPDATE leads
+                SET crm_status = CASE WHEN attempt.success THEN 'saved' ELSE 'failed' END,
+                    crm_attempt_count = leads.crm_attempt_count + 1,
+                    crm_last_attempt_at = CURRENT_TIMESTAMP,
+                    crm_last_error = attempt.error_message,
+                    crm_last_error_class = attempt.error_class,
+                    crm_claimed_until = NULL,
+                    updated_at = CURRENT_TIMESTAMP
+                FROM attempt, (
+                    SELECT id, crm_status FROM leads
+                    WHERE id IN (SELECT lead_id FROM attempt)
+                    FOR UPDATE
+                ) AS previous
+                WHERE leads.id = attempt.lead_id AND previous.id = leads.id
+                RETURNING
+                    leads.id, leads.crm_attempt_count,
+                    previous.crm_status AS previous_status,
+                    attempt.success, attempt.error_message
+            ),
+            logged AS (
+                INSERT INTO crm_attempts
+                    (lead_id, success, attempt_number, error_message)
+                SELECT id, success, crm_attempt_count, error_message
+                FROM updated
+            )
+            SELECT id, crm_attempt_count, previous_status FROM updated
+            """,
+            [
+                (
+                    lead["id"],
+                    lead["id"] not in errors,
+                    str(errors[lead["id"]]) if lead["id"] in errors else None,
+                    (
+                        policy_class(errors[lead["id"]]).__name__
+                        if lead["id"] in errors
+                        else None
+                    ),
                 )
-                self.conn.commit()
-
-                # If we have more retries left, retry after a delay
-                if current_attempt < self.max_retries:
-                    logger.info(
-                        f"Retrying lead {lead_id} after {self.retry_delay} seconds..."
-                    )
-                    time.sleep(self.retry_delay)
-                    return await self.save_lead_to_crm(lead_id)
+                for lead in attempted
+            ],
+            template="(%s::integer, %s::boolean, %s::text, %s::text)",
+            fetch=True,
+        )
+        updated = {row["id"]: row for row in rows}
 
-                return False
-            else:
-                # CRM call was successful
-                cursor.execute(
-                    """
-                    INSERT INTO crm_attempts (lead_id, success, attempt_number)
-                    VALUES (%s, %s, %s)
-                    """,
-                    (lead_id, True, current_attempt),
-                )
-                self.conn.commit()
+        for lead in attempted:
+            lead_id = lead["id"]
+            if lead_id not in updated:
+                logger.error(f"Lead {lead_id} was deleted during its CRM push")
+                continue
+            current_attempt = updated[lead_id]["crm_attempt_count"]
+            error = errors.get(lead_id)
+            await record_crm_outcome(
+                cursor,
+                lead["user_id"],
+                error is None,
+                LAST_SUCCESS_BY_STATUS.get(updated[lead_id]["previous_status"]),
+            )
+            results[lead_id] = CRM_SAVED if error is None else CRM_FAILED
 
+            if error is None:
                 logger.info(
                     f"Successfully saved lead {lead_id} to CRM on attempt {current_attempt}"
                 )
-                return True
+                continue
+
+            logger.error(
+                f"Failed to save lead {lead_id} to CRM on attempt {current_attempt}: {error}"
+            )
+
+            # Park the lead for another attempt after the backoff delay
+            policy = policy_for(error)
+            if current_attempt < policy.max_attempts:
+                delay = policy.delay(current_attempt)
+                await enqueue_job(
+                    cursor,
+                    "crm_retry",
+                    {"lead_id": lead_id},
+                    run_after=datetime.now(timezone.utc) + timedelta(seconds=delay),
+                )
+                logger.info(f"Retrying lead {lead_id} in {delay:.1f} seconds")
+
+
+async def complete_lead_events(cursor, results: dict):
+    """Mark the webhook events of the leads saved to the CRM as successful."""
+    saved = [lead_id for lead_id, result in results.items() if result == CRM_SAVED]
+    if saved:
+        await cursor.execute(
+            """
+            UPDATE events SET status = 'success', crm_finished_at = %s
+            WHERE lead_id = ANY(%s)
+            """,
+            (datetime.now(timezone.utc), saved),
+        )
+
+
+@job_handler("crm_retry", checkout=False)
+async def retry_lead_job(job: dict):
+    """Make the scheduled CRM attempt for a lead whose last attempt failed."""
+    lead_id = job["payload"]["lead_id"]
+    async with pooled_cursor() as cursor:
+        await cursor.execute("SELECT crm_status FROM leads WHERE id = %s", (lead_id,))
+        lead = await cursor.fetchone()
+        if lead is not None and lead["crm_status"] == CRM_SAVED:
+            # Saved by another push meanwhile, its events may still wait
+            await complete_lead_events(cursor, {lead_id: CRM_SAVED})
+            await cursor.connection.commit()
+    if lead is None or lead["crm_status"] == CRM_SAVED:
+        return
 
-        finally:
-            cursor.close()
+    # The webhook event that produced the lead is complete once it is saved
+    await CRMService().save_lead_to_crm(lead_id, finish=complete_lead_events)
@@ -0,0 +1,179 @@
+import asyncio
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+from psycopg2.extras import Json
+
+from app.core.config import settings
+from app.db.async_database import run_in_db_executor
+from app.db.database import db_connection
+from app.services.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Two-tier cache of extraction results: an in-process LRU in front of the
+# extraction_cache table, shared by every worker. Keys hash the message
+# with its whitespace collapsed and case folded, so templated or forwarded
+# copies of a message hit, together with the extractor version, so a new
+# model or prompt never reads results of the old one.
+
+
+def normalize_message(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+
+class ExtractionCache:
+    """
+    Extraction results by normalized message, for one extractor version.
+
+    The database tier is read and written through the caller's cursor, so
+    it never needs a second pooled connection; failed lookups are logged
+    and count as misses.
+    """
+
+    def __init__(self, version: str, maxsize: int, ttl: float, persist: bool = True):
+        self.version = version
+        self.ttl = ttl
+        self.persist = persist
+        self._memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._db_hits = 0
+        self._db_misses = 0
+
+    def key(self, text: str) -> str:
+        payload = f"{self.version}\0{normalize_message(text)}"
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    async def lookup(self, cursor, keys: list) -> dict:
+        """
+        Cached results of the keys found, from memory or else the database
+        in one query. The read is committed so no transaction stays open
+        while the misses are extracted.
+
+        Returns:
+            {key: result} for the keys that hit
+        """
+        found = {}
+        for key in keys:
+            result = self._memory.get(key)
+            if result is not None:
+                found[key] = dict(result)
+
+        missing = [key for key in keys if key not in found]
+        if missing and self.persist:
+            try:
+                await cursor.execute(
+                    """
+                    SELECT key, result
+                    FROM extraction_cache
+                    WHERE key = ANY(%s) AND version = %s
+                      AND expires_at > CURRENT_TIMESTAMP
+                    """,
+                    (missing, self.version),
+                )
+                rows = await cursor.fetchall()
+                await cursor.connection.commit()
+            except Exception as e:
+                logger.warning(f"Extraction cache lookup failed: {e}")
+                await cursor.connection.rollback()
+                rows = []
+            for row in rows:
+                self._memory.set(row["key"], row["result"])
+                found[row["key"]] = dict(row["result"])
+            with self._lock:
+                self._db_hits += len(rows)
+                self._db_misses += len(missing) - len(rows)
+        return found
+
+    async def store(self, cursor, results: dict):
+        """
+        Cache {key: result}. The database rows are written in the caller's
+        transaction, which commits them with its own writes.
+        """
+        if not results:
+            return
+        for key, result in results.items():
+            self._memory.set(key, dict(result))
+        if not self.persist:
+            return
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.ttl)
+        await cursor.execute_values(
+            """
+            INSERT INTO extraction_cache (key, version, result, expires_at)
+            VALUES %s
+            ON CONFLICT (key) DO UPDATE
+            SET result = EXCLUDED.result,
+                created_at = CURRENT_TIMESTAMP,
+                expires_at = EXCLUDED.expires_at
+            """,
+            [
+                (key, self.version, Json(result), expires_at)
+                for key, result in results.items()
+            ],
+        )
+
+    def stats(self) -> dict:
+        """Hit rate overall and per tier; every lookup goes to memory first."""
+        memory = self._memory.stats()
+        with self._lock:
+            db_hits, db_misses = self._db_hits, self._db_misses
+        lookups = memory["hits"] + memory["misses"]
+        hits = memory["hits"] + db_hits
+        return {
+            "version": self.version,
+            "lookups": lookups,
+            "hits": hits,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory": memory,
+            "database": {
+                "enabled": self.persist,
+                "hits": db_hits,
+                "misses": db_misses,
+                "hit_rate": (
+                    round(db_hits / (db_hits + db_misses), 4)
+                    if db_hits + db_misses
+                    else 0.0
+                ),
+            },
+        }
+
+
+def purge_extraction_cache(conn, version: str) -> int:
+    """
+    Delete expired entries and the entries of every other extractor
+    version, returning how many were removed.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(
+            """
+            DELETE FROM extraction_cache
+            WHERE expires_at <= CURRENT_TIMESTAMP OR version <> %s
+            """,
+            (version,),
+        )
+        removed = cursor.rowcount
+    conn.commit()
+    return removed
+
+
+def _run_purge(version: str) -> int:
+    with db_connection() as conn:
+        return purge_extraction_cache(conn, version)
+
+
+async def extraction_cache_cleanup_loop(version: str, interval: float = None):
+    """
+    Background task purging the extraction cache. Its first run at startup
+    drops the results of a previous model or prompt version.
+    """
+    interval = interval or settings.EXTRACTION_CACHE_CLEANUP_INTERVAL
+    while True:
+        try:
+            removed = await run_in_db_executor(_run_purge, version)
+            if removed:
+                logger.info(f"Purged {removed} stale extraction cache entries")
+        except Exception as e:
+            logger.error(f"Extraction cache cleanup failed: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,195 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+from psycopg2.extras import Json
+
+from app.core.config import settings
+from app.db.async_database import pooled_cursor, run_in_db_executor
+from app.db.database import db_connection
+
+logger = logging.getLogger(__name__)
+
+# Webhook deliveries are deduplicated per user on a key: the sender's
+# Idempotency-Key header or, within WEBHOOK_DEDUPE_WINDOW, a hash of the
+# message. The first request claims the key (in_progress) and stores its
+# response when done (completed); repeats replay that response. The request
+# hash covers the delivery mode, so a synchronous response never answers an
+# asynchronous request or the reverse.
+
+REPLAYED_HEADER = "Idempotency-Replayed"
+
+# Length of webhook_idempotency.key
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyConflict(Exception):
+    """The original request with this key is still being processed."""
+
+
+class IdempotencyKeyReused(Exception):
+    """The key was already used for a request with a different payload."""
+
+
+def request_hash(message: str, mode: str) -> str:
+    return hashlib.sha256(f"{mode}:{message}".encode()).hexdigest()
+
+
+def dedupe_key(idempotency_key: str, message: str, mode: str):
+    """
+    Key to deduplicate a webhook request on, with its time to live.
+
+    Returns:
+        (key, ttl_seconds), or (None, None) when the request is not deduplicated
+    """
+    if idempotency_key:
+        return idempotency_key, settings.WEBHOOK_IDEMPOTENCY_TTL
+    if settings.WEBHOOK_DEDUPE_WINDOW > 0:
+        return (
+            f"content:{request_hash(message, mode)}",
+            settings.WEBHOOK_DEDUPE_WINDOW,
+        )
+    return None, None
+
+
+async def claim_key(user_id: int, key: str, message: str, mode: str, ttl: float):
+    """
+    Claim a key for a new request, or wait for the request that holds it.
+
+    Expired keys, and keys left in progress for longer than
+    WEBHOOK_IDEMPOTENCY_LOCK_TIMEOUT by a request that died, are claimed
+    again. A connection is checked out per poll and none is held while
+    waiting for the original request.
+
+    Returns:
+        None when the key was claimed, else the completed record to replay
+        with its status_code and response
+
+    Raises:
+        IdempotencyKeyReused: The key belongs to a different payload or mode
+        IdempotencyConflict: The original request did not finish within
+            WEBHOOK_IDEMPOTENCY_WAIT seconds
+    """
+    payload_hash = request_hash(message, mode)
+    deadline = time.monotonic() + settings.WEBHOOK_IDEMPOTENCY_WAIT
+    while True:
+        async with pooled_cursor() as cursor:
+            claimed = await _try_claim(cursor, user_id, key, payload_hash, ttl)
+            record = None
+            if not claimed:
+                await cursor.execute(
+                    """
+                    SELECT request_hash, status, status_code, response
+                    FROM webhook_idempotency
+                    WHERE user_id = %s AND key = %s
+                    """,
+                    (user_id, key),
+                )
+                record = await cursor.fetchone()
+                await cursor.connection.commit()
+
+        if claimed:
+            return None
+        if record is None:
+            # The original request failed and released the key
+            continue
+        if record["request_hash"] != payload_hash:
+            raise IdempotencyKeyReused(key)
+        if record["status"] == "completed":
+            return record
+        if time.monotonic() >= deadline:
+            raise IdempotencyConflict(key)
+        await asyncio.sleep(0.1)
+
+
+async def _try_claim(cursor, user_id: int, key: str, payload_hash: str, ttl: float):
+    """Claim a key that is new, expired or stuck, returning whether it was."""
+    await cursor.execute(
+        """
+        INSERT INTO webhook_idempotency (user_id, key, request_hash, expires_at)
+        VALUES (%(user_id)s, %(key)s, %(hash)s, %(expires_at)s)
+        ON CONFLICT (user_id, key) DO UPDATE
+        SET request_hash = EXCLUDED.request_hash,
+            status = 'in_progress',
+            status_code = NULL,
+            response = NULL,
+            created_at = CURRENT_TIMESTAMP,
+            expires_at = EXCLUDED.expires_at
+        WHERE webhook_idempotency.expires_at <= CURRENT_TIMESTAMP
+           OR (
+               webhook_idempotency.status = 'in_progress'
+               AND webhook_idempotency.created_at
+                   < CURRENT_TIMESTAMP - %(lock_timeout)s * INTERVAL '1 second'
+           )
+        RETURNING key
+        """,
+        {
+            "user_id": user_id,
+            "key": key,
+            "hash": payload_hash,
+            "expires_at": datetime.now(timezone.utc) + timedelta(seconds=ttl),
+            "lock_timeout": settings.WEBHOOK_IDEMPOTENCY_LOCK_TIMEOUT,
+        },
+    )
+    claimed = await cursor.fetchone()
+    await cursor.connection.commit()
+    return claimed is not None
+
+
+async def complete_key(cursor, user_id: int, key: str, status_code: int, response):
+    """Store the response of the request holding a key."""
+    await cursor.execute(
+        """
+        UPDATE webhook_idempotency
+        SET status = 'completed', status_code = %s, response = %s
+        WHERE user_id = %s AND key = %s
+        """,
+        (status_code, Json(response, dumps=_dumps), user_id, key),
+    )
+    await cursor.connection.commit()
+
+
+async def release_key(cursor, user_id: int, key: str):
+    """Forget a key whose request failed, so a retry processes it again."""
+    await cursor.connection.rollback()
+    await cursor.execute(
+        "DELETE FROM webhook_idempotency WHERE user_id = %s AND key = %s",
+        (user_id, key),
+    )
+    await cursor.connection.commit()
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, default=str)
+
+
+def purge_expired_keys(conn) -> int:
+    """Delete expired keys, returning how many were removed."""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "DELETE FROM webhook_idempotency WHERE expires_at <= CURRENT_TIMESTAMP"
+        )
+        removed = cursor.rowcount
+    conn.commit()
+    return removed
+
+
+def _run_purge() -> int:
+    with db_connection() as conn:
+        return purge_expired_keys(conn)
+
+
+async def idempotency_cleanup_loop(interval: float = None):
+    """Background task purging expired idempotency keys."""
+    interval = interval or settings.WEBHOOK_IDEMPOTENCY_CLEANUP_INTERVAL
+    while True:
+        try:
+            removed = await run_in_db_executor(_run_purge)
+            if removed:
+                logger.info(f"Purged {removed} expired idempotency keys")
+        except Exception as e:
+            logger.error(f"Idempotency key cleanup failed: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,279 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+from datetime import datetime, timedelta, timezone
+
+from app.core.config import settings
+from app.db.async_database import checkout_limiter, pooled_cursor, run_in_db_executor
+from app.db.database import db_connection
+
+logger = logging.getLogger(__name__)
+
+# Durable background jobs stored in the jobs table. A worker claims a job by
+# moving it to "running" with a lease (locked_until); a job whose lease runs
+# out, e.g. because its worker died, is claimed again, so every job runs at
+# least once and handlers must tolerate being repeated. The lease is extended
+# while the handler runs, so only jobs whose worker stopped are reclaimed.
+# Jobs that keep failing end up in the "dead" status for inspection. Done and
+# dead jobs are deleted by job_cleanup_loop once their retention has passed.
+
+# Handlers by job kind: (async callable, checkout) pairs. With checkout the
+# callable takes (cursor, job) and a connection is held for the whole job;
+# without, it takes (job) and checks out connections itself, e.g. to hold
+# none while the extraction model runs.
+_handlers = {}
+
+
+def job_handler(kind: str, checkout: bool = True):
+    """Register the coroutine function handling jobs of a kind."""
+
+    def register(func):
+        _handlers[kind] = (func, checkout)
+        return func
+
+    return register
+
+
+async def enqueue_job(
+    cursor, kind: str, payload: dict, run_after: datetime = None, max_attempts=None
+) -> int:
+    """
+    Add a job to the queue. Run it in the transaction that creates the work,
+    so the job exists exactly when that transaction commits.
+
+    Args:
+        cursor: AsyncCursor of the enqueuing transaction
+        kind: Registered job kind
+        payload: JSON-serializable job arguments
+        run_after: Earliest time to run the job, now when None
+        max_attempts: Attempts before the job is dead-lettered
+
+    Returns:
+        The job ID
+    """
+    await cursor.execute(
+        """
+        INSERT INTO jobs (kind, payload, run_after, max_attempts)
+        VALUES (%s, %s, COALESCE(%s, CURRENT_TIMESTAMP), %s)
+        RETURNING id
+        """,
+        (
+            kind,
+            json.dumps(payload),
+            run_after,
+            max_attempts or settings.JOB_MAX_ATTEMPTS,
+        ),
+    )
+    return (await cursor.fetchone())["id"]
+
+
+def claim_job(worker_id: str):
+    """
+    Claim the next due job, or a running job whose lease expired.
+
+    Expired jobs that already used up their attempts are dead-lettered
+    instead of being claimed again.
+
+    Returns:
+        The claimed job row, None when the queue is empty
+    """
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                UPDATE jobs
+                SET status = 'dead',
+                    last_error = 'Visibility timeout expired on the last attempt',
+                    locked_until = NULL,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE status = 'running'
+                  AND locked_until < CURRENT_TIMESTAMP
+                  AND attempts >= max_attempts
+                """)
+            cursor.execute(
+                """
+                WITH next_job AS (
+                    SELECT id FROM jobs
+                    WHERE (status = 'queued' AND run_after <= CURRENT_TIMESTAMP)
+                       OR (status = 'running' AND locked_until < CURRENT_TIMESTAMP)
+                    ORDER BY run_after
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                )
+                UPDATE jobs
+                SET status = 'running',
+                    attempts = jobs.attempts + 1,
+                    locked_until = CURRENT_TIMESTAMP + %s * INTERVAL '1 second',
+                    locked_by = %s,
+                    updated_at = CURRENT_TIMESTAMP
+                FROM next_job
+                WHERE jobs.id = next_job.id
+                RETURNING jobs.*
+                """,
+                (settings.JOB_VISIBILITY_TIMEOUT, worker_id),
+            )
+            job = cursor.fetchone()
+        conn.commit()
+    return job
+
+
+def complete_job(job_id: int, worker_id: str):
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                UPDATE jobs
+                SET status = 'done', locked_until = NULL, updated_at = CURRENT_TIMESTAMP
+                WHERE id = %s AND locked_by = %s
+                """,
+                (job_id, worker_id),
+            )
+        conn.commit()
+
+
+def extend_lease(job_id: int, worker_id: str) -> bool:
+    """
+    Renew the lease of a running job for JOB_VISIBILITY_TIMEOUT seconds.
+
+    Returns:
+        False when the worker no longer holds the job
+    """
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                UPDATE jobs
+                SET locked_until = CURRENT_TIMESTAMP + %s * INTERVAL '1 second',
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = %s AND locked_by = %s AND status = 'running'
+                """,
+                (settings.JOB_VISIBILITY_TIMEOUT, job_id, worker_id),
+            )
+            held = cursor.rowcount == 1
+        conn.commit()
+    return held
+
+
+async def _renew_lease(job: dict, worker_id: str):
+    """Extend a job's lease every third of the visibility timeout until cancelled."""
+    while True:
+        await asyncio.sleep(settings.JOB_VISIBILITY_TIMEOUT / 3)
+        try:
+            async with checkout_limiter():
+                held = await run_in_db_executor(extend_lease, job["id"], worker_id)
+        except Exception as e:
+            logger.warning(f"Failed to extend the lease of job {job['id']}: {e}")
+            continue
+        if not held:
+            logger.warning(f"Job {job['id']} was reclaimed while running")
+            return
+
+
+def fail_job(job: dict, worker_id: str, error: str):
+    """Schedule another attempt of a failed job, or dead-letter it."""
+    dead = job["attempts"] >= job["max_attempts"]
+    run_after = datetime.now(timezone.utc) + timedelta(seconds=settings.JOB_RETRY_DELAY)
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                UPDATE jobs
+                SET status = %s,
+                    run_after = %s,
+                    last_error = %s,
+                    locked_until = NULL,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = %s AND locked_by = %s
+                """,
+                ("dead" if dead else "queued", run_after, error, job["id"], worker_id),
+            )
+        conn.commit()
+    if dead:
+        logger.error(f"Job {job['id']} ({job['kind']}) is dead: {error}")
+    return dead
+
+
+async def run_job(job: dict, worker_id: str):
+    """Run a claimed job and record its outcome."""
+    handler = _handlers.get(job["kind"])
+    try:
+        if handler is None:
+            raise ValueError(f"No handler registered for job kind {job['kind']}")
+
+        func, checkout = handler
+        lease = asyncio.create_task(_renew_lease(job, worker_id))
+        try:
+            if checkout:
+                async with pooled_cursor() as cursor:
+                    await func(cursor, job)
+            else:
+                await func(job)
+        finally:
+            lease.cancel()
+    except Exception as e:
+        logger.error(f"Job {job['id']} ({job['kind']}) failed: {e}")
+        await run_in_db_executor(fail_job, job, worker_id, str(e))
+    else:
+        await run_in_db_executor(complete_job, job["id"], worker_id)
+
+
+async def job_worker(worker_id: str):
+    """Background task claiming and running jobs until cancelled."""
+    while True:
+        try:
+            async with checkout_limiter():
+                job = await run_in_db_executor(claim_job, worker_id)
+        except Exception as e:
+            logger.error(f"Job worker {worker_id} failed to claim a job: {e}")
+            job = None
+
+        if job is None:
+            await asyncio.sleep(settings.JOB_POLL_INTERVAL)
+            continue
+        await run_job(job, worker_id)
+
+
+def purge_finished_jobs(conn) -> int:
+    """Delete done and dead jobs past their retention, returning how many."""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            """
+            DELETE FROM jobs
+            WHERE (status = 'done'
+                   AND updated_at < CURRENT_TIMESTAMP - %s * INTERVAL '1 second')
+               OR (status = 'dead'
+                   AND updated_at < CURRENT_TIMESTAMP - %s * INTERVAL '1 second')
+            """,
+            (settings.JOB_RETENTION, settings.JOB_DEAD_RETENTION),
+        )
+        removed = cursor.rowcount
+    conn.commit()
+    return removed
+
+
+def _run_purge() -> int:
+    with db_connection() as conn:
+        return purge_finished_jobs(conn)
+
+
+async def job_cleanup_loop(interval: float = None):
+    """Background task purging finished jobs past their retention."""
+    interval = interval or settings.JOB_CLEANUP_INTERVAL
+    while True:
+        try:
+            removed = await run_in_db_executor(_run_purge)
+            if removed:
+                logger.info(f"Purged {removed} finished jobs")
+        except Exception as e:
+            logger.error(f"Job cleanup failed: {e}")
+        await asyncio.sleep(interval)
+
+
+def start_job_workers(count: int = None) -> list:
+    """Start the job worker tasks on the running event loop."""
+    count = settings.JOB_WORKERS if count is None else count
+    prefix = f"{socket.gethostname()}:{os.getpid()}"
+    return [
+        asyncio.create_task(job_worker(f"{prefix}:{index}")) for index in range(count)
+    ]
@@ -2,12 +2,46 @@ from langchain_community.llms import HuggingFaceEndpoint
 from langchain.prompts import PromptTemplate
 from langchain.output_parsers import StructuredOutputParser, ResponseSchema
 
+import hashlib
 import logging
-import re
+import threading
+import time
+from collections import Counter
 
+from app.core.config import settings
+from app.services.extraction_cache import ExtractionCache
+from app.services.lead_rules import LEAD_FIELDS, extract_with_rules
+from app.services.llm_executor import InferenceQueueFull, llm_executor
+from app.services.local_llm import LocalSeq2SeqLLM
+from app.services.micro_batcher import MicroBatcher
 
 logger = logging.getLogger(__name__)
 
+# Extraction backends, as recorded on webhook events
+LLM_BACKEND = "llm"
+REGEX_BACKEND = "regex"
+CACHE_BACKEND = "cache"
+RULES_BACKEND = "rules"
+
+# Values of the fields neither the rules nor the model found
+MISSING_VALUES = {
+    "name": "Unknown",
+    "email": "unknown@example.com",
+    "company": "Unknown",
+}
+
+# How each field is asked for in the prompt
+FIELD_INSTRUCTIONS = {
+    "name": "Full Name of the person",
+    "email": "Email Address",
+    "company": "Company Name",
+}
+
+MODEL_ID = "google/flan-t5-base"  # Free model from HuggingFace
+
+# Bump when the parsing of model output changes, to retire cached results
+EXTRACTOR_VERSION = "2"
+
 
 class LeadExtractor:
     """Service to extract lead information from unstructured text using LangChain with HuggingFace."""
@@ -18,28 +52,25 @@ class LeadExtractor:
         self._initialize_llm_if_possible()
 
         # Define the output schema
-        response_schemas = [
-            ResponseSchema(name="name", description="The full name of the lead"),
-            ResponseSchema(name="email", description="The email address of the lead"),
-            ResponseSchema(
+        self.response_schemas = {
+            "name": ResponseSchema(
+                name="name", description="The full name of the lead"
+            ),
+            "email": ResponseSchema(
+                name="email", description="The email address of the lead"
+            ),
+            "company": ResponseSchema(
                 name="company",
                 description="The company name the lead is associated with",
             ),
-        ]
-
-        self.output_parser = StructuredOutputParser.from_response_schemas(
-            response_schemas
-        )
-        self.format_instructions = self.output_parser.get_format_instructions()
+        }
 
         # Initialize prompt template
         self.template = """
         You are a smart AI assistant that extracts structured lead information from messages.
         
         Extract the following information from the text below:
-        1. Full Name of the person
-        2. Email Address
-        3. Company Name
+        {fields}
         
         If any information is missing, return "Unknown" for that field.
         
@@ -48,25 +79,90 @@ class LeadExtractor:
         Text: {text}
         """
 
-        self.prompt = PromptTemplate(
-            template=self.template,
-            input_variables=["text"],
-            partial_variables={"format_instructions": self.format_instructions},
+        # Prompt and parser per set of fields asked from the model, the
+        # fields the rules could not fill confidently
+        self._prompts = {}
+        self.prompt, self.output_parser = self._prompt_for(LEAD_FIELDS)
+        self.format_instructions = self.output_parser.get_format_instructions()
+
+        # Cached results are only valid for this model, prompt and parser
+        self.version = hashlib.sha256(
+            "\n".join(
+                (
+                    EXTRACTOR_VERSION,
+                    self.model_description,
+                    self.template,
+                    self.format_instructions,
+                    str(settings.EXTRACTION_RULES_MIN_CONFIDENCE),
+                )
+            ).encode()
+        ).hexdigest()[:16]
+        self.cache = ExtractionCache(
+            self.version,
+            maxsize=settings.EXTRACTION_CACHE_MAX_SIZE,
+            ttl=settings.EXTRACTION_CACHE_TTL,
+            persist=settings.EXTRACTION_CACHE_PERSIST,
         )
 
+        # Concurrent extractions share batched model calls, with backends
+        # whose batch() is one model call; the endpoint's sends a request
+        # per prompt, one after the other, so its calls are run separately
+        self.batcher = MicroBatcher(
+            self._predict_batch,
+            max_batch_size=(
+                settings.LLM_BATCH_MAX_SIZE
+                if isinstance(self.llm, LocalSeq2SeqLLM)
+                else 1
+            ),
+            max_wait=settings.LLM_BATCH_MAX_WAIT_MS / 1000,
+            max_concurrency=llm_executor.max_workers,
+            max_pending=llm_executor.max_queue,
+        )
+
+        # Extractions answered by each tier: rules, cache, llm or regex
+        self._tiers = Counter()
+        self._llm_fields = 0
+        self._lock = threading.Lock()
+
+    @property
+    def model_description(self) -> str:
+        """The model whose output is cached; quantization changes the output."""
+        if isinstance(self.llm, LocalSeq2SeqLLM):
+            return f"{self.llm.model_path}{':int8' if self.llm.quantize else ''}"
+        return MODEL_ID
+
+    @property
+    def caches_results(self) -> bool:
+        """Whether results are cached; regex extraction is cheaper than a lookup."""
+        return settings.EXTRACTION_CACHE_ENABLED and self.llm is not None
+
     def _initialize_llm_if_possible(self):
-        """Initialize the free HuggingFace model."""
+        """Initialize the model selected by LLM_BACKEND."""
+        if settings.LLM_BACKEND == "none":
+            logger.info("LLM disabled, using regex extraction")
+            return
         try:
+            if settings.LLM_BACKEND == "local":
+                # Loaded once per process, at startup
+                self.llm = LocalSeq2SeqLLM(
+                    model_path=settings.LLM_MODEL_PATH or MODEL_ID,
+                    quantize=settings.LLM_QUANTIZE,
+                    num_threads=settings.LLM_NUM_THREADS,
+                    max_new_tokens=settings.LLM_MAX_NEW_TOKENS,
+                )
+                logger.info("Local LLM initialized successfully")
+                return
+
             # Initialize with default HuggingFace model
             self.llm = HuggingFaceEndpoint(
-                repo_id="google/flan-t5-base",  # Free model from HuggingFace
+                repo_id=MODEL_ID,
                 temperature=0.1,
                 max_length=1000,
                 huggingfacehub_api_token=None,  # No token needed for most base models
             )
             logger.info("HuggingFace LLM initialized successfully")
         except Exception as e:
-            logger.error(f"Failed to initialize HuggingFace LLM: {e}")
+            logger.error(f"Failed to initialize {settings.LLM_BACKEND} LLM: {e}")
 
     async def extract_lead_info(self, text: str) -> dict:
         """
@@ -78,50 +174,176 @@ class LeadExtractor:
         Returns:
             A dictionary with name, email, and company
         """
+        extracted_info, _ = await self.extract_with_backend(text)
+        return extracted_info
+
+    async def extract_with_backend(self, text: str) -> tuple:
+        """
+        Extract lead information and report which backend produced it.
+
+        The rules run first; the model is only asked for the fields they
+        could not fill with EXTRACTION_RULES_MIN_CONFIDENCE, and its answer
+        is merged with the fields they did fill.
+
+        Returns:
+            (extracted info, RULES_BACKEND, LLM_BACKEND or REGEX_BACKEND)
+        """
+        rule_fields = extract_with_rules(text)
+        extracted_info = self._resolve(rule_fields)
+        if extracted_info is not None:
+            return extracted_info, RULES_BACKEND
+
         if not self.llm:
             logger.warning("LLM not available, falling back to regex extraction")
-            return self._extract_with_regex(text)
+            return self._fallback(rule_fields), REGEX_BACKEND
 
+        confident = self._confident(rule_fields)
+        fields = tuple(field for field in LEAD_FIELDS if field not in confident)
         try:
-            # Generate the prompt
-            _input = self.prompt.format_prompt(text=text)
-            logger.info("Using free HuggingFace model for lead extraction")
+            # Generate the prompt for the fields the rules left open
+            prompt, output_parser = self._prompt_for(fields)
+            _input = prompt.format_prompt(text=text)
+            logger.info(f"Using the LLM to extract {', '.join(fields)}")
 
             # Get the output from the LLM
-            output = self.llm.predict(_input.to_string())
+            output = await self._predict(_input.to_string())
 
             # Parse the output
-            structured_output = self.output_parser.parse(output)
+            structured_output = output_parser.parse(output)
 
-            logger.info(f"Extracted lead info: {structured_output}")
-            return structured_output
+        except InferenceQueueFull as e:
+            logger.warning(f"LLM overloaded, falling back to regex extraction: {e}")
+            return self._fallback(rule_fields), REGEX_BACKEND
 
         except Exception as e:
             logger.error(f"LLM extraction error: {str(e)}")
             # Fall back to regex extraction
-            return self._extract_with_regex(text)
+            return self._fallback(rule_fields), REGEX_BACKEND
 
-    def _extract_with_regex(self, text: str) -> dict:
-        """Extract information using regex as a fallback method"""
-        # Basic name extraction - look for common name patterns
-        name_match = re.search(
-            r"(?:I\'m|I am|name is|this is)\s+([A-Z][a-z]+(?: [A-Z][a-z]+)+)",
-            text,
-        )
-        name = name_match.group(1) if name_match else "Unknown"
+        extracted_info = {
+            field: (
+                confident[field]
+                if field in confident
+                else structured_output.get(field, MISSING_VALUES[field])
+            )
+            for field in LEAD_FIELDS
+        }
+        with self._lock:
+            self._tiers[LLM_BACKEND] += 1
+            self._llm_fields += len(fields)
+        logger.info(f"Extracted lead info: {extracted_info}")
+        return extracted_info, LLM_BACKEND
+
+    def resolve_with_rules(self, text: str):
+        """
+        Lead information when the rules fill every field confidently, else
+        None. Cheaper than an extraction cache lookup, so tried before it.
+        """
+        return self._resolve(extract_with_rules(text))
+
+    def count_cached(self, count: int = 1):
+        """Count extractions answered from the extraction cache."""
+        with self._lock:
+            self._tiers[CACHE_BACKEND] += count
+
+    def _confident(self, rule_fields: dict) -> dict:
+        threshold = settings.EXTRACTION_RULES_MIN_CONFIDENCE
+        return {
+            field: value
+            for field, (value, confidence) in rule_fields.items()
+            if confidence >= threshold
+        }
+
+    def _resolve(self, rule_fields: dict):
+        confident = self._confident(rule_fields)
+        if len(confident) < len(LEAD_FIELDS):
+            return None
+        with self._lock:
+            self._tiers[RULES_BACKEND] += 1
+        extracted_info = {field: confident[field] for field in LEAD_FIELDS}
+        logger.info(f"Rule-based extraction: {extracted_info}")
+        return extracted_info
 
-        # Basic email extraction
-        email_match = re.search(r"[\w.+-]+@[\w-]+\.[\w.-]+", text)
-        email = email_match.group(0) if email_match else "unknown@example.com"
+    def _fallback(self, rule_fields: dict) -> dict:
+        with self._lock:
+            self._tiers[REGEX_BACKEND] += 1
+        return self._regex_result(rule_fields)
 
-        # Basic company extraction
-        company_match = re.search(
-            r"(?:at|from|with|of|founder of|co-founder of)\s+([A-Z][a-zA-Z0-9]+(?:\s+[A-Z][a-zA-Z0-9]+)*)",
-            text,
+    def _prompt_for(self, fields: tuple) -> tuple:
+        """(prompt, output parser) asking the model for the given fields."""
+        if fields not in self._prompts:
+            output_parser = StructuredOutputParser.from_response_schemas(
+                [self.response_schemas[field] for field in fields]
+            )
+            prompt = PromptTemplate(
+                template=self.template,
+                input_variables=["text"],
+                partial_variables={
+                    "fields": "\n".join(
+                        f"{number}. {FIELD_INSTRUCTIONS[field]}"
+                        for number, field in enumerate(fields, 1)
+                    ),
+                    "format_instructions": output_parser.get_format_instructions(),
+                },
+            )
+            self._prompts[fields] = (prompt, output_parser)
+        return self._prompts[fields]
+
+    async def _predict(self, prompt: str) -> str:
+        """
+        Model output for a prompt. Calls run on the inference pool, so the
+        event loop keeps serving other requests meanwhile, and are
+        micro-batched with concurrent ones when the backend batches.
+        """
+        if self.batcher.max_batch_size > 1:
+            return await self.batcher.submit((prompt, time.monotonic()))
+        return await llm_executor.run(self.llm.predict, prompt)
+
+    async def _predict_batch(self, items: list) -> list:
+        """
+        One batched model call for several (prompt, queued at) items, errors
+        returned per prompt. The time spent waiting for the batch counts as
+        queue wait.
+        """
+        prompts, queued_at = zip(*items)
+        return await llm_executor.run(
+            self.llm.batch,
+            list(prompts),
+            queued_at=list(queued_at),
+            return_exceptions=True,
         )
-        company = company_match.group(1) if company_match else "Unknown"
 
-        extracted_info = {"name": name, "email": email, "company": company}
+    def _extract_with_regex(self, text: str) -> dict:
+        """Extract information using regex as a fallback method"""
+        return self._regex_result(extract_with_rules(text))
 
+    def _regex_result(self, rule_fields: dict) -> dict:
+        # Every rule match is kept, however low its confidence
+        extracted_info = {
+            field: rule_fields[field][0] if field in rule_fields else missing
+            for field, missing in MISSING_VALUES.items()
+        }
         logger.info(f"Regex-based extraction: {extracted_info}")
         return extracted_info
+
+    def stats(self) -> dict:
+        """Extractions answered per tier, and the model calls the rules saved."""
+        with self._lock:
+            tiers = {
+                tier: self._tiers[tier]
+                for tier in (RULES_BACKEND, CACHE_BACKEND, LLM_BACKEND, REGEX_BACKEND)
+            }
+            llm_fields = self._llm_fields
+        total = sum(tiers.values())
+        return {
+            "min_confidence": settings.EXTRACTION_RULES_MIN_CONFIDENCE,
+            "extractions": total,
+            "tiers": tiers,
+            "rules_share": round(tiers[RULES_BACKEND] / total, 4) if total else 0.0,
+            # Fields the model was asked for, out of every field of its calls
+            "llm_field_share": (
+                round(llm_fields / (tiers[LLM_BACKEND] * len(LEAD_FIELDS)), 4)
+                if tiers[LLM_BACKEND]
+                else 0.0
+            ),
+        }
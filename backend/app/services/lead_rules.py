@@ -0,0 +1,140 @@
+import re
+
+# Rule-based lead extraction, the fast tier in front of the LLM. Each field
+# has precompiled patterns tried in order, each with the confidence that its
+# match is the right value: an explicit "my name is X" is near certain, a
+# capitalized phrase after "at" or "with" much less so. Matches must also
+# have the shape of the field, e.g. a name of two to four words none of which
+# is a common word. Fields matched with enough confidence are taken as is;
+# the LLM is only asked for the others.
+
+LEAD_FIELDS = ("name", "email", "company")
+
+EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+EMAIL_CONFIDENCE = 1.0
+# Several addresses in one message: which one is the lead's is a guess
+AMBIGUOUS_EMAIL_CONFIDENCE = 0.5
+
+_PERSON = r"([A-Z][a-z]+(?:[-'][A-Z]?[a-z]+)*(?: [A-Z][a-z]*(?:[-'][A-Z]?[a-z]+)*)+)"
+_COMPANY = r"([A-Z][\w&'-]*(?:\s+(?:&\s+)?[A-Z][\w&'-]*)*)"
+
+MAX_NAME_WORDS = 4
+MAX_COMPANY_WORDS = 5
+
+# Capitalized words that are no part of a person's name, as in "I'm
+# Interested In..." or "Best Regards"
+NOT_NAME_WORDS = frozenset(
+    (
+        "a about also an and any at available back best can cheers customer dear "
+        "for from glad going happy hello help here hi hoping in interested it "
+        "just looking many my new not of on or our planning please reaching "
+        "ready regards sales service sincerely sorry still support team thank "
+        "thanks the this to trying very we wondering writing you your"
+    ).split()
+)
+
+# Last words marking a capitalized phrase as a company name rather than,
+# say, a place or a person
+COMPANY_SUFFIXES = frozenset(
+    (
+        "ab ag analytics as bv co company corp corporation gmbh group holdings "
+        "inc industries labs limited llc llp logistics ltd partners plc sa "
+        "software solutions studio studios systems tech technologies ventures"
+    ).split()
+)
+
+
+def _looks_like_name(value: str) -> bool:
+    words = value.casefold().split()
+    return 2 <= len(words) <= MAX_NAME_WORDS and not any(
+        word in NOT_NAME_WORDS or word in COMPANY_SUFFIXES for word in words
+    )
+
+
+def _looks_like_company(value: str) -> bool:
+    return len(value.split()) <= MAX_COMPANY_WORDS
+
+
+def _has_company_suffix(value: str) -> bool:
+    words = value.casefold().rstrip(".").split()
+    return _looks_like_company(value) and words[-1] in COMPANY_SUFFIXES
+
+
+# (pattern, confidence, check of the matched value), tried in order
+NAME_RULES = (
+    (
+        re.compile(r"\b(?i:my name is|name is)\s+" + _PERSON),
+        0.9,
+        _looks_like_name,
+    ),
+    (re.compile(r"\b(?i:i'm|i am)\s+" + _PERSON), 0.85, _looks_like_name),
+    (re.compile(r"(?:^|[.!?]\s+)" + _PERSON + r",? here\b"), 0.8, _looks_like_name),
+    # "This is X" introduces a team or a company as often as a person
+    (re.compile(r"\b(?i:this is)\s+" + _PERSON), 0.6, _looks_like_name),
+    # Signature closing the message, e.g. "Thanks, Jane Doe" or "- Jane Doe"
+    (re.compile(r"(?:^|[,\-|]\s*)" + _PERSON + r"\.?\s*$"), 0.6, _looks_like_name),
+)
+
+_AT_OR_FROM_COMPANY = re.compile(r"\b(?:at|from)\s+" + _COMPANY)
+
+COMPANY_RULES = (
+    (
+        re.compile(
+            r"\b(?i:(?:co-)?founder|owner|ceo|cto|coo|cfo|president|director"
+            r"|manager|head of \w+)\s+(?i:of|at|with)\s+" + _COMPANY
+        ),
+        0.9,
+        _looks_like_company,
+    ),
+    (
+        re.compile(r"\b(?i:work|working|employed)\s+(?i:at|for)\s+" + _COMPANY),
+        0.9,
+        _looks_like_company,
+    ),
+    (
+        re.compile(r"\b(?i:our|my) company,?\s+(?:is\s+)?" + _COMPANY),
+        0.9,
+        _looks_like_company,
+    ),
+    (_AT_OR_FROM_COMPANY, 0.85, _has_company_suffix),
+    # "at Starbucks", "from London": a place as often as a company
+    (_AT_OR_FROM_COMPANY, 0.6, _looks_like_company),
+    (re.compile(r"\b(?:with|of)\s+" + _COMPANY), 0.5, _looks_like_company),
+)
+
+
+def _first_match(rules: tuple, text: str):
+    for pattern, confidence, check in rules:
+        for match in pattern.finditer(text):
+            value = match.group(1).strip()
+            if check(value):
+                return value, confidence
+    return None
+
+
+def extract_with_rules(text: str) -> dict:
+    """
+    Lead fields found by the rules.
+
+    Returns:
+        {field: (value, confidence)} for the fields matched, with confidence
+        between 0 and 1
+    """
+    fields = {}
+
+    emails = list(dict.fromkeys(EMAIL_PATTERN.findall(text)))
+    if emails:
+        fields["email"] = (
+            emails[0],
+            EMAIL_CONFIDENCE if len(emails) == 1 else AMBIGUOUS_EMAIL_CONFIDENCE,
+        )
+
+    name = _first_match(NAME_RULES, text)
+    if name:
+        fields["name"] = name
+
+    company = _first_match(COMPANY_RULES, text)
+    if company:
+        fields["company"] = company
+
+    return fields
@@ -0,0 +1,135 @@
+import asyncio
+import functools
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core.config import settings
+
+
+class InferenceQueueFull(Exception):
+    """Every inference slot is busy and the wait queue is full."""
+
+
+class _Timings:
+    """Running count, mean and max of a duration, plus a recent window for p95."""
+
+    def __init__(self, window: int = 1000):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._recent = deque(maxlen=window)
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self._recent.append(seconds)
+
+    def stats(self) -> dict:
+        recent = sorted(self._recent)
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "p95_ms": (
+                round(recent[int(len(recent) * 0.95)] * 1000, 3) if recent else 0.0
+            ),
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+class InferenceExecutor:
+    """
+    Bounded thread pool for blocking model calls.
+
+    At most `max_workers` calls run at once, each on its own thread so the
+    event loop keeps serving requests, and at most `max_queue` more wait for
+    a thread; calls beyond that fail fast with InferenceQueueFull. The time
+    calls spend queued and running is tracked separately.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="llm"
+        )
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._rejected = 0
+        self._failed = 0
+        self._queue_wait = _Timings()
+        self._inference = _Timings()
+
+    def _call(self, func, queued_at: list):
+        started_at = time.monotonic()
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            for queued in queued_at:
+                self._queue_wait.add(started_at - queued)
+        try:
+            return func()
+        except Exception:
+            with self._lock:
+                self._failed += 1
+            raise
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._inference.add(time.monotonic() - started_at)
+
+    async def run(self, func, *args, queued_at: list = None, **kwargs):
+        """
+        Run a blocking call on the pool and wait for its result.
+
+        `queued_at` lists the monotonic times the work of the call was
+        queued, one per item of a batched call, for the queue wait metric;
+        by default the call itself.
+
+        Raises:
+            InferenceQueueFull: The call was refused, the queue being full
+        """
+        with self._lock:
+            if self._queued + self._running >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise InferenceQueueFull(
+                    f"{self._running} inferences running, {self._queued} queued"
+                )
+            self._queued += 1
+
+        call = functools.partial(func, *args, **kwargs)
+        future = self._executor.submit(
+            self._call, call, queued_at or [time.monotonic()]
+        )
+        future.add_done_callback(self._release_cancelled)
+        return await asyncio.wrap_future(future)
+
+    def _release_cancelled(self, future):
+        # A call cancelled while still queued never reaches _call
+        if future.cancelled():
+            with self._lock:
+                self._queued -= 1
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "queued": self._queued,
+                "rejected": self._rejected,
+                "failed": self._failed,
+                "queue_wait": self._queue_wait.stats(),
+                "inference": self._inference.stats(),
+            }
+
+
+llm_executor = InferenceExecutor(
+    max_workers=settings.LLM_MAX_CONCURRENCY, max_queue=settings.LLM_MAX_QUEUE
+)
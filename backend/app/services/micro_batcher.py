@@ -0,0 +1,126 @@
+import asyncio
+import threading
+import weakref
+
+from app.services.llm_executor import InferenceQueueFull
+
+
+class MicroBatcher:
+    """
+    Dynamic micro-batching of concurrent calls.
+
+    submit() parks an item until `max_batch_size` items are pending or the
+    oldest has waited `max_wait` seconds, then `batch_fn` is called once with
+    the pending items and each caller gets its own result back. While
+    `max_concurrency` batches are already running, items keep accumulating
+    and the next batch starts as soon as one finishes, so batches grow with
+    the load instead of queueing behind each other. At most `max_pending`
+    items wait; submit() raises InferenceQueueFull beyond that.
+
+    `batch_fn` is an async callable taking a list of items and returning one
+    result per item, in order; a result that is an exception is raised to
+    its caller only. Pending items are kept per event loop, as
+    ConcurrencyLimiter.
+    """
+
+    def __init__(
+        self,
+        batch_fn,
+        max_batch_size: int,
+        max_wait: float,
+        max_concurrency: int = None,
+        max_pending: int = None,
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self._pending = weakref.WeakKeyDictionary()  # loop -> [(item, future)]
+        self._timers = weakref.WeakKeyDictionary()  # loop -> TimerHandle
+        self._running = weakref.WeakKeyDictionary()  # loop -> set of batch tasks
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._full_batches = 0
+        self._rejected = 0
+
+    async def submit(self, item):
+        """Add an item to the next batch and wait for its result."""
+        loop = asyncio.get_running_loop()
+        pending = self._pending.setdefault(loop, [])
+        if self.max_pending is not None and len(pending) >= self.max_pending:
+            with self._lock:
+                self._rejected += 1
+            raise InferenceQueueFull(f"{len(pending)} items waiting for a batch")
+        future = loop.create_future()
+        pending.append((item, future))
+
+        if len(pending) >= self.max_batch_size:
+            self._flush(loop)
+        elif loop not in self._timers:
+            self._timers[loop] = loop.call_later(self.max_wait, self._flush, loop)
+        return await future
+
+    def _flush(self, loop):
+        timer = self._timers.pop(loop, None)
+        if timer is not None:
+            timer.cancel()
+        pending = self._pending.get(loop)
+        running = self._running.setdefault(loop, set())
+        if not pending:
+            return
+        if self.max_concurrency and len(running) >= self.max_concurrency:
+            # Started by the next batch to finish
+            return
+
+        batch = pending[: self.max_batch_size]
+        del pending[: self.max_batch_size]
+        with self._lock:
+            self._batches += 1
+            self._items += len(batch)
+            self._full_batches += len(batch) >= self.max_batch_size
+
+        task = loop.create_task(self._run(batch))
+        running.add(task)
+        task.add_done_callback(running.discard)
+        task.add_done_callback(lambda _: self._flush(loop))
+
+        if len(pending) >= self.max_batch_size:
+            self._flush(loop)
+        elif pending:
+            self._timers[loop] = loop.call_later(self.max_wait, self._flush, loop)
+
+    async def _run(self, batch: list):
+        try:
+            results = await self.batch_fn([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(
+                    f"Batch of {len(batch)} items returned {len(results)} results"
+                )
+        except Exception as e:
+            results = [e] * len(batch)
+
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+                "max_concurrency": self.max_concurrency,
+                "max_pending": self.max_pending,
+                "batches": self._batches,
+                "items": self._items,
+                "avg_batch_size": (
+                    round(self._items / self._batches, 2) if self._batches else 0.0
+                ),
+                "full_batches": self._full_batches,
+                "rejected": self._rejected,
+            }
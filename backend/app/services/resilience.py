@@ -0,0 +1,341 @@
+import asyncio
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker over a sliding window of call outcomes.
+
+    Closed: calls pass and their outcomes are recorded. Once the window holds
+    at least `min_calls` outcomes and the failure rate reaches
+    `failure_rate_threshold`, the breaker opens. Open: calls are refused for
+    `open_seconds`. Half-open: up to `half_open_calls` trial calls pass; a
+    failure reopens the breaker, that many successes close it again.
+    """
+
+    def __init__(
+        self,
+        failure_rate_threshold: float,
+        window_size: int,
+        min_calls: int,
+        open_seconds: float,
+        half_open_calls: int,
+    ):
+        self.failure_rate_threshold = failure_rate_threshold
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self._window = deque(maxlen=window_size)  # True for a failed call
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trials_started = 0
+        self._trials_succeeded = 0
+        self._lock = threading.Lock()
+        self._rejected = 0
+        self._times_opened = 0
+
+    def _update_state(self):
+        if (
+            self._state == OPEN
+            and time.monotonic() - self._opened_at >= self.open_seconds
+        ):
+            self._state = HALF_OPEN
+            self._trials_started = 0
+            self._trials_succeeded = 0
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._times_opened += 1
+        self._window.clear()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._update_state()
+            return self._state
+
+    def _retry_after(self) -> float:
+        if self._state == OPEN:
+            return max(0.0, self._opened_at + self.open_seconds - time.monotonic())
+        if self._state == HALF_OPEN:
+            # The trial calls in flight close the breaker or reopen it for
+            # open_seconds; until then no other call passes
+            return self.open_seconds
+        return 0.0
+
+    def retry_after(self) -> float:
+        """Seconds a refused call should wait before trying again."""
+        with self._lock:
+            self._update_state()
+            return self._retry_after()
+
+    def allow(self) -> bool:
+        """Whether a call may go through now."""
+        with self._lock:
+            self._update_state()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._trials_started < self.half_open_calls:
+                self._trials_started += 1
+                return True
+            self._rejected += 1
+            return False
+
+    def record(self, failures: int = 0, successes: int = 0):
+        """
+        Record the outcome of a call, counted per item for batched calls. A
+        call with neither, e.g. every item rejected as invalid, tells nothing
+        of the remote's health; a trial call's slot is given back.
+        """
+        with self._lock:
+            if self._state == HALF_OPEN:
+                if not failures and not successes:
+                    self._trials_started = max(0, self._trials_started - 1)
+                elif failures:
+                    self._open()
+                else:
+                    self._trials_succeeded += 1
+                    if self._trials_succeeded >= self.half_open_calls:
+                        self._state = CLOSED
+                return
+            if self._state == OPEN:
+                return
+
+            self._window.extend([True] * failures + [False] * successes)
+            calls = len(self._window)
+            if (
+                calls >= self.min_calls
+                and sum(self._window) / calls >= self.failure_rate_threshold
+            ):
+                self._open()
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._update_state()
+            calls = len(self._window)
+            return {
+                "state": self._state,
+                "failure_rate": round(sum(self._window) / calls, 4) if calls else 0.0,
+                "window_calls": calls,
+                "retry_after_seconds": round(self._retry_after(), 3),
+                "times_opened": self._times_opened,
+                "rejected_calls": self._rejected,
+            }
+
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter: `rate` tokens per second, bursts of up to
+    `capacity`. acquire() reserves tokens and sleeps until they are due, so
+    callers queue in arrival order. A rate of 0 disables the limit.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._waited = 0.0
+
+    def _reserve(self, tokens: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated_at) * self.rate
+            )
+            self._updated_at = now
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self._waited += wait
+            return wait
+
+    async def acquire(self, tokens: float = 1):
+        if self.rate <= 0:
+            return
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "rate_per_second": self.rate,
+                "capacity": self.capacity,
+                "tokens": round(self._tokens, 3),
+                "total_wait_seconds": round(self._waited, 3),
+            }
+
+
+class ConcurrencyLimiter:
+    """Cap on concurrent calls, with one semaphore per event loop."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._semaphores = weakref.WeakKeyDictionary()
+        self._in_flight = 0
+        self._waiting = 0
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.limit)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    @asynccontextmanager
+    async def slot(self):
+        self._waiting += 1
+        try:
+            await self._semaphore().acquire()
+        finally:
+            self._waiting -= 1
+        self._in_flight += 1
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            self._semaphore().release()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+        }
+
+
+class AdmissionRejected(Exception):
+    """A request the admission controller turned away."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+QUEUE_FULL = "queue_full"
+QUEUE_TIMEOUT = "queue_timeout"
+
+
+class AdmissionController:
+    """
+    Admission control: at most `max_in_flight` requests run at once, at most
+    `max_queue` more wait for a slot, for up to `queue_timeout` seconds.
+
+    Requests arriving to a full queue are rejected with QUEUE_FULL and ones
+    that wait too long with QUEUE_TIMEOUT. Both carry a retry delay derived
+    from the drain rate, an exponentially weighted moving average of how long
+    admitted requests run, so clients back off in proportion to the backlog.
+    One semaphore per event loop, as ConcurrencyLimiter.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int,
+        max_queue: int,
+        queue_timeout: float,
+        max_retry_after: float = 60.0,
+        smoothing: float = 0.2,
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_retry_after = max_retry_after
+        self.smoothing = smoothing
+        self._semaphores = weakref.WeakKeyDictionary()
+        self._in_flight = 0
+        self._waiting = 0
+        self._service_time = None  # EWMA of seconds per admitted request
+        self._admitted = 0
+        self._rejected = {QUEUE_FULL: 0, QUEUE_TIMEOUT: 0}
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_in_flight)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    def drain_rate(self) -> float:
+        """Requests completed per second at the current service time."""
+        if not self._service_time:
+            return 0.0
+        return self.max_in_flight / self._service_time
+
+    def retry_after(self) -> float:
+        """Seconds until the current backlog, plus one request, has drained."""
+        rate = self.drain_rate()
+        if rate <= 0:
+            return 1.0
+        return min(max((self._waiting + 1) / rate, 1.0), self.max_retry_after)
+
+    def _reject(self, reason: str):
+        self._rejected[reason] += 1
+        raise AdmissionRejected(reason, self.retry_after())
+
+    def _record(self, seconds: float):
+        if self._service_time is None:
+            self._service_time = seconds
+        else:
+            self._service_time += self.smoothing * (seconds - self._service_time)
+
+    @asynccontextmanager
+    async def admit(self):
+        """
+        Hold a slot for the duration of the block.
+
+        Raises:
+            AdmissionRejected: The queue is full or the wait timed out
+        """
+        semaphore = self._semaphore()
+        if self._in_flight + self._waiting >= self.max_in_flight + self.max_queue:
+            self._reject(QUEUE_FULL)
+
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(semaphore.acquire(), self.queue_timeout)
+            acquired = True
+        except asyncio.TimeoutError:
+            acquired = False
+        finally:
+            self._waiting -= 1
+        if not acquired:
+            # Rejected after leaving the queue, so its retry delay does not
+            # count this request as still waiting
+            self._reject(QUEUE_TIMEOUT)
+
+        self._in_flight += 1
+        self._admitted += 1
+        started_at = time.monotonic()
+        try:
+            yield
+        finally:
+            self._record(time.monotonic() - started_at)
+            self._in_flight -= 1
+            semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "queue_depth": self._waiting,
+            "admitted": self._admitted,
+            "rejected_queue_full": self._rejected[QUEUE_FULL],
+            "rejected_queue_timeout": self._rejected[QUEUE_TIMEOUT],
+            "avg_service_seconds": round(self._service_time or 0.0, 4),
+            "drain_rate_per_second": round(self.drain_rate(), 3),
+            "retry_after_seconds": round(self.retry_after(), 3),
+        }
@@ -0,0 +1,161 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Per-user analytics rollups, kept in step with the raw tables by the
+# webhook and CRM write paths so the dashboard never scans leads, events
+# or crm_attempts. Events dropped by partition retention are subtracted, so
+# the counts cover the events still stored. rebuild_rollups() reconstructs
+# them from scratch.
+
+
+async def record_event(cursor, user_id: int, event_type: str, count: int = 1):
+    """Count new events. Run it in the transaction that inserts the events."""
+    await cursor.execute(
+        """
+        INSERT INTO event_type_rollups (user_id, event_type, event_count)
+        VALUES (%(user_id)s, %(event_type)s, %(count)s)
+        ON CONFLICT (user_id, event_type)
+        DO UPDATE SET event_count = event_type_rollups.event_count + %(count)s
+        """,
+        {"user_id": user_id, "event_type": event_type, "count": count},
+    )
+
+
+async def record_lead(cursor, user_id: int, created_at, count: int = 1):
+    """Count new leads. Run it in the transaction that inserts the leads."""
+    await cursor.execute(
+        """
+        WITH hourly AS (
+            INSERT INTO lead_hourly_rollups (user_id, bucket, lead_count)
+            VALUES (
+                %(user_id)s,
+                date_trunc('hour', %(created_at)s::timestamptz, 'UTC'),
+                %(count)s
+            )
+            ON CONFLICT (user_id, bucket)
+            DO UPDATE SET lead_count = lead_hourly_rollups.lead_count + %(count)s
+        )
+        INSERT INTO user_rollups (user_id, total_leads)
+        VALUES (%(user_id)s, %(count)s)
+        ON CONFLICT (user_id)
+        DO UPDATE SET total_leads = user_rollups.total_leads + %(count)s
+        """,
+        {"user_id": user_id, "created_at": created_at, "count": count},
+    )
+
+
+async def record_crm_outcome(
+    cursor, user_id: int, success: bool, previous_success: bool = None
+):
+    """
+    Track the latest CRM outcome of a lead.
+
+    Args:
+        cursor: Cursor of the transaction that records the CRM attempt
+        user_id: Owner of the lead
+        success: Outcome of the attempt being recorded
+        previous_success: Outcome of the lead's previous attempt, None for the first
+    """
+    if previous_success is not None and previous_success == success:
+        return
+
+    successful_delta = int(success) - int(bool(previous_success))
+    failed_delta = int(not success) - int(
+        previous_success is not None and not previous_success
+    )
+    await cursor.execute(
+        """
+        INSERT INTO user_rollups (user_id, successful_crm_saves, failed_crm_saves)
+        VALUES (%(user_id)s, %(successful)s, %(failed)s)
+        ON CONFLICT (user_id)
+        DO UPDATE SET
+            successful_crm_saves = user_rollups.successful_crm_saves + %(successful)s,
+            failed_crm_saves = user_rollups.failed_crm_saves + %(failed)s
+        """,
+        {"user_id": user_id, "successful": successful_delta, "failed": failed_delta},
+    )
+
+
+def forget_events(cursor, partition: str):
+    """
+    Subtract the events of a partition from the rollups before it is
+    dropped, so they keep matching the events table. Run it in the
+    transaction that drops the partition.
+    """
+    cursor.execute(f"""
+        UPDATE event_type_rollups
+        SET event_count = event_type_rollups.event_count - dropped.event_count
+        FROM (
+            SELECT user_id, event_type, COUNT(*) AS event_count
+            FROM {partition}
+            WHERE user_id IS NOT NULL AND event_type IS NOT NULL
+            GROUP BY 1, 2
+        ) AS dropped
+        WHERE event_type_rollups.user_id = dropped.user_id
+          AND event_type_rollups.event_type = dropped.event_type
+        """)
+
+
+def rebuild_rollups(conn, user_id: int = None):
+    """
+    Rebuild the rollup tables from the raw tables in one transaction.
+
+    Args:
+        conn: A psycopg2 connection
+        user_id: Only rebuild this user's rollups, all users when None
+    """
+    params = {"user_id": user_id}
+    with conn.cursor() as cursor:
+        for table in ("lead_hourly_rollups", "event_type_rollups", "user_rollups"):
+            cursor.execute(
+                f"""
+                DELETE FROM {table}
+                WHERE %(user_id)s IS NULL OR user_id = %(user_id)s
+                """,
+                params,
+            )
+
+        cursor.execute(
+            """
+            INSERT INTO lead_hourly_rollups (user_id, bucket, lead_count)
+            SELECT user_id, date_trunc('hour', created_at, 'UTC'), COUNT(*)
+            FROM leads
+            WHERE user_id IS NOT NULL
+              AND (%(user_id)s IS NULL OR user_id = %(user_id)s)
+            GROUP BY 1, 2
+            """,
+            params,
+        )
+
+        cursor.execute(
+            """
+            INSERT INTO event_type_rollups (user_id, event_type, event_count)
+            SELECT user_id, event_type, COUNT(*)
+            FROM events
+            WHERE user_id IS NOT NULL AND event_type IS NOT NULL
+              AND (%(user_id)s IS NULL OR user_id = %(user_id)s)
+            GROUP BY 1, 2
+            """,
+            params,
+        )
+
+        cursor.execute(
+            """
+            INSERT INTO user_rollups
+                (user_id, total_leads, successful_crm_saves, failed_crm_saves)
+            SELECT
+                user_id,
+                COUNT(*),
+                COUNT(*) FILTER (WHERE crm_status = 'saved'),
+                COUNT(*) FILTER (WHERE crm_status = 'failed')
+            FROM leads
+            WHERE user_id IS NOT NULL
+              AND (%(user_id)s IS NULL OR user_id = %(user_id)s)
+            GROUP BY user_id
+            """,
+            params,
+        )
+
+    conn.commit()
+    logger.info(f"Rebuilt dashboard rollups for {user_id or 'all users'}")
@@ -0,0 +1,265 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timezone
+
+from app.core.config import settings
+from app.db.async_database import pooled_cursor
+from app.services.cache import invalidate_dashboard_stats
+from app.services.crm_service import CRMService
+from app.services.lead_extractor import CACHE_BACKEND, LLM_BACKEND, RULES_BACKEND
+from app.services.rollups import record_event, record_lead
+from app.services.webhook_pipeline import EVENT_STATUS_BY_CRM_RESULT
+
+logger = logging.getLogger(__name__)
+
+
+async def _extract_all(lead_extractor, messages: list) -> list:
+    """
+    Run extraction for every message with bounded concurrency.
+
+    Returns:
+        Per message, (extracted info, extraction started_at, finished_at,
+        backend) or the exception raised
+    """
+    semaphore = asyncio.Semaphore(settings.WEBHOOK_BATCH_CONCURRENCY)
+
+    async def extract(message):
+        async with semaphore:
+            started_at = datetime.now(timezone.utc)
+            info, backend = await lead_extractor.extract_with_backend(message)
+            return info, started_at, datetime.now(timezone.utc), backend
+
+    return await asyncio.gather(
+        *(extract(message) for message in messages), return_exceptions=True
+    )
+
+
+async def process_webhook_batch(lead_extractor, user_id: int, items: list):
+    """
+    Run a batch of webhook messages through the lead pipeline.
+
+    Events and leads are written with one multi-row statement each, extraction
+    runs concurrently across the batch and every lead is then pushed to the
+    CRM. Items are reported in input order.
+
+    Connections are checked out per database step and none is held while
+    the model or the CRM runs, so a large batch does not pin a connection
+    for its whole duration.
+
+    Args:
+        lead_extractor: The LeadExtractor to use
+        user_id: Owner of the messages
+        items: (message, error) tuples in input order; items that failed
+            validation carry an error and no message
+
+    Returns:
+        A result dict per item with index, status, event_id, lead and error
+    """
+    results = [
+        {"index": index, "status": "invalid", "error": error}
+        for index, (_, error) in enumerate(items)
+    ]
+    valid = [index for index, (message, _) in enumerate(items) if message is not None]
+    if not valid:
+        return results
+
+    # 1. Record all events in one statement
+    received_at = datetime.now(timezone.utc)
+    event_ids = {index: str(uuid.uuid4()) for index in valid}
+    async with pooled_cursor() as cursor:
+        event_rows = await cursor.execute_values(
+            """
+            INSERT INTO events (event_type, event_id, user_id, payload, status, created_at)
+            VALUES %s
+            RETURNING id, event_id
+            """,
+            [
+                (
+                    "webhook",
+                    event_ids[index],
+                    user_id,
+                    items[index][0],
+                    "processing",
+                    received_at,
+                )
+                for index in valid
+            ],
+            fetch=True,
+        )
+        event_db_ids = {row["event_id"]: row["id"] for row in event_rows}
+        await record_event(cursor, user_id, "webhook", count=len(valid))
+        await cursor.connection.commit()
+    invalidate_dashboard_stats(user_id)
+
+    for index in valid:
+        results[index] = {
+            "index": index,
+            "status": "processing",
+            "event_id": event_ids[index],
+        }
+
+    # 2. Extract lead information across the batch. Messages the extraction
+    # rules resolve skip the model and the cache; those seen before are
+    # answered from the extraction cache with one lookup
+    extracted = {}
+    for index in valid:
+        started_at = datetime.now(timezone.utc)
+        info = lead_extractor.resolve_with_rules(items[index][0])
+        if info is not None:
+            extracted[index] = (
+                info,
+                started_at,
+                datetime.now(timezone.utc),
+                RULES_BACKEND,
+            )
+    unresolved = [index for index in valid if index not in extracted]
+
+    cache_keys, cached = {}, {}
+    if unresolved and lead_extractor.caches_results:
+        cache_keys = {
+            index: lead_extractor.cache.key(items[index][0]) for index in unresolved
+        }
+        lookup_started_at = datetime.now(timezone.utc)
+        async with pooled_cursor() as cursor:
+            cached = await lead_extractor.cache.lookup(
+                cursor, list(set(cache_keys.values()))
+            )
+        lookup_finished_at = datetime.now(timezone.utc)
+    to_extract = [index for index in unresolved if cache_keys.get(index) not in cached]
+    outcomes = await _extract_all(
+        lead_extractor, [items[index][0] for index in to_extract]
+    )
+    extracted.update(zip(to_extract, outcomes))
+    for index in unresolved:
+        if index not in extracted:
+            extracted[index] = (
+                cached[cache_keys[index]],
+                lookup_started_at,
+                lookup_finished_at,
+                CACHE_BACKEND,
+            )
+    lead_extractor.count_cached(len(unresolved) - len(to_extract))
+
+    statuses = {}
+    lead_ids = {}
+    leads = []
+    # Stage timestamps per item: extraction started, finished and backend,
+    # lead persisted, CRM finished
+    stages = {index: [None] * 5 for index in valid}
+    for index in valid:
+        outcome = extracted[index]
+        if isinstance(outcome, Exception):
+            logger.error(f"Lead extraction error for batch item {index}: {outcome}")
+            results[index].update(
+                status="failed", error=f"Error processing request: {outcome}"
+            )
+            statuses[index] = "failed"
+        else:
+            info, started_at, finished_at, backend = outcome
+            stages[index][:3] = [started_at, finished_at, backend]
+            results[index]["lead"] = info
+            leads.append((index, info))
+
+    # 3. Create all lead records in one statement
+    if leads:
+        lead_created_at = datetime.now(timezone.utc)
+        async with pooled_cursor() as cursor:
+            try:
+                lead_rows = await cursor.execute_values(
+                    """
+                    INSERT INTO leads (name, email, company, raw_message, user_id, created_at)
+                    VALUES %s
+                    RETURNING id
+                    """,
+                    [
+                        (
+                            info["name"],
+                            info["email"],
+                            info["company"],
+                            items[index][0],
+                            user_id,
+                            lead_created_at,
+                        )
+                        for index, info in leads
+                    ],
+                    fetch=True,
+                )
+                await record_lead(cursor, user_id, lead_created_at, count=len(leads))
+                await lead_extractor.cache.store(
+                    cursor,
+                    {
+                        cache_keys[index]: info
+                        for index, info in leads
+                        if index in cache_keys and stages[index][2] == LLM_BACKEND
+                    },
+                )
+                await cursor.connection.commit()
+                invalidate_dashboard_stats(user_id)
+            except Exception as e:
+                await cursor.connection.rollback()
+                logger.error(f"Batch lead insert failed: {e}")
+                for index, _ in leads:
+                    results[index].update(
+                        status="failed",
+                        error=f"An error occurred during request processing: {e}",
+                    )
+                    statuses[index] = "failed"
+                leads, lead_rows = [], []
+
+        # 4. Push the leads to the CRM in batches
+        for (index, _), lead_row in zip(leads, lead_rows):
+            lead_ids[index] = lead_row["id"]
+            stages[index][3] = lead_created_at
+        try:
+            crm_results = await CRMService().save_leads_to_crm(list(lead_ids.values()))
+        except Exception as e:
+            logger.error(f"CRM save failed for batch: {e}")
+            error = f"An error occurred during request processing: {e}"
+            crm_results = {}
+            for index in lead_ids:
+                results[index]["error"] = error
+        crm_finished_at = datetime.now(timezone.utc)
+        for index, lead_id in lead_ids.items():
+            if lead_id in crm_results:
+                statuses[index] = EVENT_STATUS_BY_CRM_RESULT[crm_results[lead_id]]
+                stages[index][4] = crm_finished_at
+            else:
+                statuses[index] = "failed"
+            results[index]["status"] = statuses[index]
+
+    # 5. Update every event status, lead link and stage in one statement
+    async with pooled_cursor() as cursor:
+        await cursor.execute_values(
+            """
+            UPDATE events SET
+                status = data.status,
+                lead_id = data.lead_id,
+                extraction_started_at = data.extraction_started_at,
+                extraction_finished_at = data.extraction_finished_at,
+                extraction_backend = data.extraction_backend,
+                lead_persisted_at = data.lead_persisted_at,
+                crm_finished_at = data.crm_finished_at
+            FROM (VALUES %s) AS data (
+                id, status, lead_id, extraction_started_at, extraction_finished_at,
+                extraction_backend, lead_persisted_at, crm_finished_at
+            )
+            WHERE events.id = data.id
+            """,
+            [
+                (
+                    event_db_ids[event_ids[index]],
+                    status,
+                    lead_ids.get(index),
+                    *stages[index],
+                )
+                for index, status in statuses.items()
+            ],
+            template=(
+                "(%s, %s, %s::integer, %s::timestamptz, %s::timestamptz, %s::text, "
+                "%s::timestamptz, %s::timestamptz)"
+            ),
+        )
+        await cursor.connection.commit()
+
+    return results
@@ -0,0 +1,365 @@
+import logging
+import uuid
+from datetime import datetime, timezone
+
+from app.db.async_database import pooled_cursor
+from app.services.cache import invalidate_dashboard_stats
+from app.services.crm_service import (
+    CRM_DEFERRED,
+    CRM_FAILED,
+    CRM_SAVED,
+    CRMService,
+)
+from app.services.job_queue import job_handler
+from app.services.lead_extractor import (
+    CACHE_BACKEND,
+    LLM_BACKEND,
+    RULES_BACKEND,
+    LeadExtractor,
+)
+from app.services.rollups import record_event, record_lead
+
+logger = logging.getLogger(__name__)
+
+# Created at startup rather than on import, which would load the model in
+# every process importing the pipeline (migrations, scripts, tests)
+_lead_extractor = None
+
+
+def get_lead_extractor() -> LeadExtractor:
+    """The process's LeadExtractor, created with its model on first use."""
+    global _lead_extractor
+    if _lead_extractor is None:
+        _lead_extractor = LeadExtractor()
+    return _lead_extractor
+
+
+# Event status for each CRM outcome of the event's lead. crm_queued leads
+# wait for the CRM circuit breaker and are delivered by a crm_retry job.
+EVENT_STATUS_BY_CRM_RESULT = {
+    CRM_SAVED: "success",
+    CRM_FAILED: "partial_success",
+    CRM_DEFERRED: "crm_queued",
+}
+
+# Event statuses after which a webhook event is not processed again
+FINAL_EVENT_STATUSES = ("success", "partial_success", "crm_queued", "failed")
+
+
+async def extract_stage(cursor, message: str) -> tuple:
+    """
+    Run the extraction stage of a message. Messages the extraction rules
+    resolve skip the model and the cache; those seen before are answered
+    from the extraction cache.
+
+    Without a cursor a connection is checked out for the cache lookup only,
+    and none is held while the model runs.
+
+    Returns:
+        (extracted info, dict of the event's extraction columns,
+        {cache key: info} to store in the transaction of the lead)
+    """
+    lead_extractor = get_lead_extractor()
+    started_at = datetime.now(timezone.utc)
+    key = None
+    extracted_info = lead_extractor.resolve_with_rules(message)
+    backend = RULES_BACKEND
+    if extracted_info is None and lead_extractor.caches_results:
+        key = lead_extractor.cache.key(message)
+        if cursor is None:
+            async with pooled_cursor() as lookup_cursor:
+                found = await lead_extractor.cache.lookup(lookup_cursor, [key])
+        else:
+            found = await lead_extractor.cache.lookup(cursor, [key])
+        extracted_info = found.get(key)
+        backend = CACHE_BACKEND
+        if extracted_info is not None:
+            lead_extractor.count_cached()
+
+    if extracted_info is None:
+        # Extract lead info using LangChain with free model
+        extracted_info, backend = await lead_extractor.extract_with_backend(message)
+
+    extraction = {
+        "extraction_started_at": started_at,
+        "extraction_finished_at": datetime.now(timezone.utc),
+        "extraction_backend": backend,
+    }
+    to_cache = {key: extracted_info} if key and backend == LLM_BACKEND else {}
+    return extracted_info, extraction, to_cache
+
+
+async def set_event_status(cursor, event_db_id: int, status: str):
+    await cursor.execute(
+        "UPDATE events SET status = %s WHERE id = %s", (status, event_db_id)
+    )
+    await cursor.connection.commit()
+
+
+async def process_event(
+    user_id: int,
+    event_db_id: int,
+    message: str,
+    lead_id: int = None,
+    extracted: tuple = None,
+):
+    """
+    Run the extraction, lead and CRM stages for a recorded webhook event.
+
+    The lead is linked to its event in the transaction that creates it, so a
+    repeated run (e.g. a job retried after a crash) passes the existing
+    `lead_id` and resumes at the CRM stage instead of duplicating the lead.
+    Connections are checked out per stage; none is held while the model or
+    the CRM runs.
+
+    Args:
+        user_id: Owner of the event
+        event_db_id: Database ID of the event
+        message: The webhook message
+        lead_id: Lead already created for the event, if any
+        extracted: Result of extract_stage when the caller already ran it
+
+    Returns:
+        The extracted lead info, None when the lead already existed
+
+    Raises:
+        ValueError: The lead information could not be extracted
+    """
+    extracted_info = None
+    if lead_id is None:
+        if extracted is None:
+            extracted = await extract_stage(None, message)
+        extracted_info, extraction, to_cache = extracted
+
+        # Create lead record and link it to the event in one statement
+        lead_created_at = datetime.now(timezone.utc)
+        async with pooled_cursor() as cursor:
+            await cursor.execute(
+                """
+                WITH lead AS (
+                    INSERT INTO leads (name, email, company, raw_message, user_id, created_at)
+                    VALUES (
+                        %(name)s, %(email)s, %(company)s,
+                        %(message)s, %(user_id)s, %(lead_created_at)s
+                    )
+                    RETURNING id
+                )
+                UPDATE events SET
+                    lead_id = lead.id,
+                    extraction_started_at = %(extraction_started_at)s,
+                    extraction_finished_at = %(extraction_finished_at)s,
+                    extraction_backend = %(extraction_backend)s,
+                    lead_persisted_at = %(lead_created_at)s
+                FROM lead
+                WHERE events.id = %(event_db_id)s
+                RETURNING lead.id
+                """,
+                {
+                    "name": extracted_info["name"],
+                    "email": extracted_info["email"],
+                    "company": extracted_info["company"],
+                    "message": message,
+                    "user_id": user_id,
+                    "lead_created_at": lead_created_at,
+                    "event_db_id": event_db_id,
+                    **extraction,
+                },
+            )
+            lead_id = (await cursor.fetchone())["id"]
+            await record_lead(cursor, user_id, lead_created_at)
+            await get_lead_extractor().cache.store(cursor, to_cache)
+            await cursor.connection.commit()
+        invalidate_dashboard_stats(user_id)
+
+    await deliver_to_crm(user_id, event_db_id, lead_id)
+    return extracted_info
+
+
+async def deliver_to_crm(user_id: int, event_db_id: int, lead_id: int) -> str:
+    """
+    CRM stage: push the lead, then commit its attempt, the event status and
+    crm_finished_at in one transaction. No connection is held during the
+    push.
+
+    Returns:
+        The new event status
+    """
+    status = None
+
+    async def finish(cursor, crm_results):
+        nonlocal status
+        status = EVENT_STATUS_BY_CRM_RESULT[crm_results[lead_id]]
+        await cursor.execute(
+            "UPDATE events SET status = %s, crm_finished_at = %s WHERE id = %s",
+            (status, datetime.now(timezone.utc), event_db_id),
+        )
+
+    await CRMService().save_leads_to_crm([lead_id], finish=finish)
+    invalidate_dashboard_stats(user_id)
+    return status
+
+
+async def ingest_message(user_id: int, message: str, event_id: str = None) -> dict:
+    """
+    Synchronous webhook path in two transactions: the extraction runs first,
+    then the event, its lead and their rollups are committed together, then
+    the CRM attempt and the final event status.
+
+    Connections are checked out for the cache lookup, the writes and each
+    step of the CRM stage; none is held while the model or the CRM runs, so
+    slow extractions and pushes do not exhaust the pool.
+
+    A message whose extraction or lead insert fails is still recorded as a
+    failed event; a failure in the CRM stage marks the event failed.
+
+    Args:
+        user_id: Owner of the message
+        message: The webhook message
+        event_id: Event ID to record the message under, generated when None
+
+    Returns:
+        The event_id, final status and extracted lead info
+
+    Raises:
+        ValueError: The lead information could not be extracted
+    """
+    event_id = event_id or str(uuid.uuid4())
+    received_at = datetime.now(timezone.utc)
+
+    try:
+        extracted = await extract_stage(None, message)
+    except Exception:
+        async with pooled_cursor() as cursor:
+            await _record_failed_event(cursor, user_id, event_id, message, received_at)
+        raise
+    return await _store_message(user_id, message, event_id, received_at, extracted)
+
+
+async def _store_message(
+    user_id: int,
+    message: str,
+    event_id: str,
+    received_at: datetime,
+    extracted: tuple,
+) -> dict:
+    """Lead, event and CRM stages of ingest_message, after the extraction."""
+    extracted_info, extraction, to_cache = extracted
+    async with pooled_cursor() as cursor:
+        try:
+            # Create the lead and its event in one statement
+            lead_created_at = datetime.now(timezone.utc)
+            await cursor.execute(
+                """
+                WITH lead AS (
+                    INSERT INTO leads (name, email, company, raw_message, user_id, created_at)
+                    VALUES (
+                        %(name)s, %(email)s, %(company)s,
+                        %(message)s, %(user_id)s, %(lead_created_at)s
+                    )
+                    RETURNING id
+                )
+                INSERT INTO events (
+                    event_type, event_id, user_id, payload, status, lead_id, created_at,
+                    extraction_started_at, extraction_finished_at, extraction_backend,
+                    lead_persisted_at
+                )
+                SELECT
+                    'webhook', %(event_id)s, %(user_id)s, %(message)s,
+                    'processing', lead.id, %(received_at)s,
+                    %(extraction_started_at)s, %(extraction_finished_at)s,
+                    %(extraction_backend)s, %(lead_created_at)s
+                FROM lead
+                RETURNING id, lead_id
+                """,
+                {
+                    "name": extracted_info["name"],
+                    "email": extracted_info["email"],
+                    "company": extracted_info["company"],
+                    "message": message,
+                    "user_id": user_id,
+                    "lead_created_at": lead_created_at,
+                    "event_id": event_id,
+                    "received_at": received_at,
+                    **extraction,
+                },
+            )
+            event = await cursor.fetchone()
+            await record_event(cursor, user_id, "webhook")
+            await record_lead(cursor, user_id, lead_created_at)
+            await get_lead_extractor().cache.store(cursor, to_cache)
+            await cursor.connection.commit()
+        except Exception:
+            await cursor.connection.rollback()
+            await _record_failed_event(cursor, user_id, event_id, message, received_at)
+            raise
+    invalidate_dashboard_stats(user_id)
+
+    try:
+        status = await deliver_to_crm(user_id, event["id"], event["lead_id"])
+    except Exception:
+        async with pooled_cursor() as cursor:
+            await set_event_status(cursor, event["id"], "failed")
+        raise
+
+    return {"event_id": event_id, "status": status, "lead": extracted_info}
+
+
+async def _record_failed_event(
+    cursor, user_id: int, event_id: str, message: str, received_at: datetime
+):
+    await cursor.execute(
+        """
+        INSERT INTO events (event_type, event_id, user_id, payload, status, created_at)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        """,
+        ("webhook", event_id, user_id, message, "failed", received_at),
+    )
+    await record_event(cursor, user_id, "webhook")
+    await cursor.connection.commit()
+    invalidate_dashboard_stats(user_id)
+
+
+@job_handler("webhook", checkout=False)
+async def process_webhook_job(job: dict):
+    """
+    Process a webhook event accepted in asynchronous mode. The extraction
+    and the CRM push run between connection checkouts, so a job waiting on
+    the model or the CRM holds no connection.
+    """
+    async with pooled_cursor() as cursor:
+        await cursor.execute(
+            """
+            SELECT id, user_id, payload, status, lead_id
+            FROM events
+            WHERE event_id = %s
+            """,
+            (job["payload"]["event_id"],),
+        )
+        event = await cursor.fetchone()
+        if event is None or event["status"] in FINAL_EVENT_STATUSES:
+            return
+        await set_event_status(cursor, event["id"], "processing")
+
+    try:
+        extracted = None
+        if event["lead_id"] is None:
+            extracted = await extract_stage(None, event["payload"])
+        await process_event(
+            event["user_id"],
+            event["id"],
+            event["payload"],
+            event["lead_id"],
+            extracted,
+        )
+    except ValueError as ve:
+        # Extraction errors are permanent, retrying would not help
+        logger.error(
+            f"Lead extraction error for event {job['payload']['event_id']}: {ve}"
+        )
+        async with pooled_cursor() as cursor:
+            await set_event_status(cursor, event["id"], "failed")
+    except Exception:
+        if job["attempts"] >= job["max_attempts"]:
+            async with pooled_cursor() as cursor:
+                await set_event_status(cursor, event["id"], "failed")
+        raise
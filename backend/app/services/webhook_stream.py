@@ -0,0 +1,174 @@
+import asyncio
+import json
+import logging
+import uuid
+from typing import AsyncIterator
+
+from pydantic import ValidationError
+
+from app.core.config import settings
+from app.models.schemas import WebhookBatchItemResult, WebhookMessage
+from app.services.resilience import AdmissionController, AdmissionRejected
+from app.services.webhook_pipeline import ingest_message
+
+logger = logging.getLogger(__name__)
+
+# Streaming ingestion: an NDJSON request body is split into messages that go
+# through a bounded work queue to a fixed set of workers, whose acks go
+# through a bounded ack queue to the NDJSON response. When the extractors or
+# the client reading the acks fall behind, both queues fill up, the body is
+# no longer read and the server's flow control stops the sender, so nothing
+# is buffered without limit. Each message also goes through the admission
+# control of single webhook messages, waiting while it is saturated, so
+# streams share the extraction capacity with every other ingestion path.
+
+# End of input marker on the work queue and end of work marker on the acks
+_DONE = object()
+
+SUCCEEDED_STATUSES = ("success", "partial_success", "crm_queued")
+
+
+def _parse_line(line: bytes) -> tuple:
+    """(message, error) for one NDJSON line."""
+    try:
+        raw_item = json.loads(line)
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        return None, f"Malformed line: {e}"
+    try:
+        return WebhookMessage.model_validate(raw_item).message, None
+    except ValidationError as e:
+        return None, f"Invalid message: {e.errors()[0]['msg']}"
+
+
+def _too_long() -> str:
+    return f"Message exceeds {settings.WEBHOOK_STREAM_MAX_LINE_BYTES} bytes"
+
+
+async def _read_messages(
+    chunks: AsyncIterator[bytes], queue: asyncio.Queue, workers: int
+):
+    """
+    Queue the lines of the body as (index, (message, error)) items, waiting
+    while the queue is full. Lines longer than WEBHOOK_STREAM_MAX_LINE_BYTES
+    are reported as invalid and skipped instead of being buffered.
+    """
+    index = 0
+    buffer = b""
+    skipping = False
+
+    async def put(item):
+        nonlocal index
+        await queue.put((index, item))
+        index += 1
+
+    try:
+        async for chunk in chunks:
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if skipping:
+                    skipping = False
+                elif len(line) > settings.WEBHOOK_STREAM_MAX_LINE_BYTES:
+                    await put((None, _too_long()))
+                elif line.strip():
+                    await put(_parse_line(line))
+            if len(buffer) > settings.WEBHOOK_STREAM_MAX_LINE_BYTES and not skipping:
+                await put((None, _too_long()))
+                skipping = True
+            if skipping:
+                buffer = b""
+        if buffer.strip() and not skipping:
+            await put(_parse_line(buffer))
+    except Exception as e:
+        logger.warning(f"Webhook stream input ended early: {e}")
+    finally:
+        for _ in range(workers):
+            await queue.put(_DONE)
+
+
+async def _ingest(
+    user_id: int, index: int, message: str, admission: AdmissionController
+) -> dict:
+    event_id = str(uuid.uuid4())
+    try:
+        while True:
+            try:
+                async with admission.admit():
+                    result = await ingest_message(user_id, message, event_id)
+                break
+            except AdmissionRejected as e:
+                # The stream is pushed back instead of failing the message
+                await asyncio.sleep(e.retry_after)
+    except ValueError as ve:
+        logger.error(f"Lead extraction error for stream item {index}: {ve}")
+        error = f"Error processing request: {ve}"
+    except Exception as e:
+        logger.error(f"Webhook stream processing error for item {index}: {e}")
+        error = f"An error occurred during request processing: {e}"
+    else:
+        return {"index": index, **result}
+    return {"index": index, "status": "failed", "event_id": event_id, "error": error}
+
+
+async def _work(
+    user_id: int,
+    queue: asyncio.Queue,
+    acks: asyncio.Queue,
+    admission: AdmissionController,
+):
+    while True:
+        item = await queue.get()
+        if item is _DONE:
+            await acks.put(_DONE)
+            return
+        index, (message, error) = item
+        if message is None:
+            await acks.put({"index": index, "status": "invalid", "error": error})
+        else:
+            await acks.put(await _ingest(user_id, index, message, admission))
+
+
+async def ingest_stream(
+    chunks: AsyncIterator[bytes], user_id: int, admission: AdmissionController
+):
+    """
+    Run a stream of NDJSON webhook messages through the pipeline.
+
+    Args:
+        chunks: The request body, as it arrives
+        user_id: Owner of the messages
+        admission: Admission control every message goes through
+
+    Yields:
+        One NDJSON ack per message, in completion order, with the message's
+        index in the stream, status, event_id and extracted lead or error,
+        then a final line with the total, succeeded and failed counts
+    """
+    workers = settings.WEBHOOK_STREAM_CONCURRENCY
+    queue = asyncio.Queue(maxsize=settings.WEBHOOK_STREAM_QUEUE_SIZE)
+    acks = asyncio.Queue(maxsize=settings.WEBHOOK_STREAM_QUEUE_SIZE)
+    tasks = [asyncio.create_task(_read_messages(chunks, queue, workers))]
+    tasks += [
+        asyncio.create_task(_work(user_id, queue, acks, admission))
+        for _ in range(workers)
+    ]
+
+    total = succeeded = finished = 0
+    try:
+        while finished < workers:
+            ack = await acks.get()
+            if ack is _DONE:
+                finished += 1
+                continue
+            total += 1
+            succeeded += ack["status"] in SUCCEEDED_STATUSES
+            ack = WebhookBatchItemResult.model_validate(ack)
+            yield ack.model_dump_json(exclude_none=True) + "\n"
+
+        logger.info(f"Webhook stream of {total} messages finished")
+        yield json.dumps(
+            {"total": total, "succeeded": succeeded, "failed": total - succeeded}
+        ) + "\n"
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,99 @@
+"""
+Concurrent-request throughput of blocking vs. awaited database access.
+
+Two routes run the same query (a short pg_sleep standing in for a slow
+statement). The "blocking" route executes it on the event loop with a plain
+psycopg2 cursor, the way endpoints did before get_db became async; the
+"async" route awaits it through the get_db dependency. Requests are fired
+concurrently through an in-process ASGI client.
+
+Usage (requires the Postgres database from create_database.py):
+    python benchmarks/bench_async_db.py --requests 200 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import httpx
+from fastapi import Depends, FastAPI
+
+from app.db.database import close_pool, db_connection
+from app.db.init_db import get_db
+
+QUERY = "SELECT pg_sleep(%s)"
+
+
+def build_app(query_seconds: float) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/blocking")
+    async def blocking_route():
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(QUERY, (query_seconds,))
+        return {"ok": True}
+
+    @app.get("/async")
+    async def async_route(cursor=Depends(get_db)):
+        await cursor.execute(QUERY, (query_seconds,))
+        return {"ok": True}
+
+    return app
+
+
+async def run(path: str, app: FastAPI, requests: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://bench"
+    ) as client:
+
+        async def one():
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(path)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "route": path,
+        "requests": requests,
+        "seconds": round(elapsed, 3),
+        "req_per_sec": round(requests / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--query-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    app = build_app(args.query_ms / 1000)
+    print(
+        f"{args.requests} requests, concurrency {args.concurrency}, "
+        f"{args.query_ms}ms per query"
+    )
+    for path in ("/blocking", "/async"):
+        result = asyncio.run(run(path, app, args.requests, args.concurrency))
+        print(result)
+    close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Lead push throughput of the HTTP CRM adapter against the local stub CRM.
+
+Pushes the same leads one request per lead and in batches of increasing
+size through one pooled keep-alive client, and reports the failures the
+stub injected. Start the stub first:
+    python stub_crm.py --latency-ms 50 --failure-rate 0.2
+
+Usage:
+    python benchmarks/bench_crm_adapter.py --leads 1000 --concurrency 20
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.crm_adapters import HTTPCRMAdapter
+
+
+def leads(count: int) -> list:
+    return [
+        {
+            "id": i,
+            "name": f"Bench User{i}",
+            "email": f"bench{i}@example.com",
+            "company": "Bench Corp",
+        }
+        for i in range(count)
+    ]
+
+
+async def run(url: str, payload: list, batch_size: int, concurrency: int) -> dict:
+    adapter = HTTPCRMAdapter(url, batch_size=batch_size)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def push(chunk):
+        async with semaphore:
+            return await adapter.push_leads(chunk)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(push(payload[i : i + batch_size]) for i in range(0, len(payload), batch_size))
+    )
+    elapsed = time.perf_counter() - started
+    await adapter.close()
+
+    failed = sum(len(errors) for errors in results)
+    return {
+        "batch_size": batch_size,
+        "leads": len(payload),
+        "seconds": round(elapsed, 3),
+        "leads_per_sec": round(len(payload) / elapsed, 1),
+        "failed": failed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--crm-url", default="http://localhost:9000")
+    parser.add_argument("--leads", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--batch-sizes", default="1,10,50")
+    args = parser.parse_args()
+
+    payload = leads(args.leads)
+    print(f"{args.leads} leads, concurrency {args.concurrency}")
+    for batch_size in (int(size) for size in args.batch_sizes.split(",")):
+        result = asyncio.run(run(args.crm_url, payload, batch_size, args.concurrency))
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
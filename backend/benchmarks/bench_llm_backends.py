@@ -0,0 +1,132 @@
+"""
+Speed and accuracy of the lead extraction backends.
+
+Runs the messages of a fixture set, each with its expected name, email and
+company, through LeadExtractor once per backend and reports messages/sec,
+generated tokens/sec (local models only; the endpoint does not report its
+token counts) and the share of each field extracted correctly. Comparison
+ignores case and surrounding whitespace, and every spelling of a missing
+value counts as "unknown". Extractions are sent concurrently, so the local
+models run micro-batched as in the webhook pipeline.
+
+Backends: regex, endpoint (HuggingFace Inference API), local and local-int8
+(in-process, from LLM_MODEL_PATH or the HuggingFace cache). Extractions the
+model failed, and that fell back to regex, are counted, as are the
+extractions answered by each tier: with EXTRACTION_RULES_MIN_CONFIDENCE
+above 1, every message goes to the model.
+
+Usage:
+    python benchmarks/bench_llm_backends.py --backends regex,local,local-int8 \\
+        --threads 4 --repeat 3
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.config import settings
+from app.services.lead_extractor import REGEX_BACKEND, LeadExtractor
+from app.services.llm_executor import llm_executor
+from app.services.local_llm import LocalSeq2SeqLLM
+
+FIXTURES = Path(__file__).parent / "fixtures" / "lead_messages.jsonl"
+FIELDS = ("name", "email", "company")
+UNKNOWN = ("", "unknown", "unknown@example.com")
+
+# Backend name -> (LLM_BACKEND, LLM_QUANTIZE)
+BACKENDS = {
+    "regex": ("none", False),
+    "endpoint": ("endpoint", False),
+    "local": ("local", False),
+    "local-int8": ("local", True),
+}
+
+
+def normalize(value) -> str:
+    value = str(value or "").strip().casefold()
+    return "unknown" if value in UNKNOWN else value
+
+
+def load_fixtures(path: Path) -> list:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def run(extractor, fixtures: list) -> tuple:
+    return await asyncio.gather(
+        *(extractor.extract_with_backend(item["message"]) for item in fixtures)
+    )
+
+
+def bench(backend: str, fixtures: list, repeat: int) -> dict:
+    settings.LLM_BACKEND, settings.LLM_QUANTIZE = BACKENDS[backend]
+    extractor = LeadExtractor()
+    if settings.LLM_BACKEND != "none" and extractor.llm is None:
+        return {"backend": backend, "error": "model failed to load, see the log"}
+
+    # Warm up, so lazy initialization is not timed
+    asyncio.run(run(extractor, fixtures[:1]))
+    local = isinstance(extractor.llm, LocalSeq2SeqLLM)
+    tokens_before = extractor.llm.stats()["generated_tokens"] if local else 0
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        results = asyncio.run(run(extractor, fixtures))
+    elapsed = time.perf_counter() - started
+
+    correct = dict.fromkeys(FIELDS, 0)
+    fallbacks = 0
+    for item, (info, used) in zip(fixtures, results):
+        fallbacks += settings.LLM_BACKEND != "none" and used == REGEX_BACKEND
+        for field in FIELDS:
+            correct[field] += normalize(info.get(field)) == normalize(
+                item["expected"][field]
+            )
+
+    messages = len(fixtures) * repeat
+    result = {
+        "backend": backend,
+        "msg_per_sec": round(messages / elapsed, 1),
+        "tokens_per_sec": None,
+        "accuracy": {
+            field: round(count / len(fixtures), 3) for field, count in correct.items()
+        },
+        "regex_fallbacks": fallbacks,
+        "tiers": extractor.stats()["tiers"],
+    }
+    if local:
+        tokens = extractor.llm.stats()["generated_tokens"] - tokens_before
+        result["tokens_per_sec"] = round(tokens / elapsed, 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backends", default="regex,local,local-int8")
+    parser.add_argument("--fixtures", type=Path, default=FIXTURES)
+    parser.add_argument("--threads", type=int, default=0, help="torch threads")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures)
+    settings.LLM_NUM_THREADS = args.threads
+    # Queue every call instead of shedding load to the regex fallback
+    llm_executor.max_queue = len(fixtures)
+
+    print(
+        f"{len(fixtures)} messages x {args.repeat}, "
+        f"{llm_executor.max_workers} inference workers, "
+        f"batches of {settings.LLM_BATCH_MAX_SIZE}"
+    )
+    for backend in args.backends.split(","):
+        print(bench(backend, fixtures, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
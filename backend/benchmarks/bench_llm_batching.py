@@ -0,0 +1,115 @@
+"""
+Extraction throughput and latency with LLM micro-batching.
+
+Sends messages to LeadExtractor at a fixed arrival rate against a simulated
+model whose calls cost a fixed overhead plus a smaller cost per prompt, as
+batched inference with the local model does, and reports throughput and per-extraction latency
+for each batch size and maximum wait. Batch size 1 disables batching.
+Calls run on the real inference pool (LLM_MAX_CONCURRENCY threads), with
+its queue unbounded so no extraction falls back to regex. The endpoint
+backend is never batched, its batch() sending one request per prompt.
+
+Usage:
+    python benchmarks/bench_llm_batching.py --messages 400 --rate 200 \\
+        --batch-sizes 1,4,8,16 --waits-ms 5,20
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.lead_extractor import LLM_BACKEND, LeadExtractor
+from app.services.llm_executor import llm_executor
+from app.services.micro_batcher import MicroBatcher
+
+OUTPUT = '```json\n{"name": "Bench User", "email": "bench@example.com", "company": "Bench"}\n```'
+
+
+class SimulatedLLM:
+    """Blocking model whose call costs overhead + per_item * prompts."""
+
+    def __init__(self, overhead: float, per_item: float):
+        self.overhead = overhead
+        self.per_item = per_item
+
+    def predict(self, prompt: str) -> str:
+        time.sleep(self.overhead + self.per_item)
+        return OUTPUT
+
+    def batch(self, prompts: list, return_exceptions: bool = False) -> list:
+        time.sleep(self.overhead + self.per_item * len(prompts))
+        return [OUTPUT] * len(prompts)
+
+
+async def run(extractor, messages: int, rate: float) -> dict:
+    latencies = []
+    fallbacks = 0
+
+    async def extract(i):
+        nonlocal fallbacks
+        started = time.perf_counter()
+        _, backend = await extractor.extract_with_backend(f"Message {i}")
+        latencies.append(time.perf_counter() - started)
+        fallbacks += backend != LLM_BACKEND
+
+    started = time.perf_counter()
+    tasks = []
+    for i in range(messages):
+        # Arrivals on a fixed schedule, whatever the sleeps overshoot
+        await asyncio.sleep(max(0.0, started + i / rate - time.perf_counter()))
+        tasks.append(asyncio.create_task(extract(i)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "msg_per_sec": round(messages / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 1),
+        "regex_fallbacks": fallbacks,
+        "avg_batch_size": extractor.batcher.stats()["avg_batch_size"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=400)
+    parser.add_argument("--rate", type=float, default=200, help="messages per second")
+    parser.add_argument("--overhead-ms", type=float, default=100)
+    parser.add_argument("--per-item-ms", type=float, default=10)
+    parser.add_argument("--batch-sizes", default="1,4,8,16")
+    parser.add_argument("--waits-ms", default="5,20")
+    args = parser.parse_args()
+
+    extractor = LeadExtractor()
+    extractor.llm = SimulatedLLM(args.overhead_ms / 1000, args.per_item_ms / 1000)
+    extractor.cache.persist = False
+    # Queue every call instead of shedding load to the regex fallback
+    llm_executor.max_queue = args.messages
+
+    print(
+        f"{args.messages} messages at {args.rate}/s, model call "
+        f"{args.overhead_ms} ms + {args.per_item_ms} ms per prompt"
+    )
+    for batch_size in (int(size) for size in args.batch_sizes.split(",")):
+        waits = [0.0] if batch_size == 1 else args.waits_ms.split(",")
+        for wait_ms in (float(wait) for wait in waits):
+            extractor.batcher = MicroBatcher(
+                extractor._predict_batch,
+                batch_size,
+                wait_ms / 1000,
+                max_concurrency=llm_executor.max_workers,
+                max_pending=llm_executor.max_queue,
+            )
+            result = asyncio.run(run(extractor, args.messages, args.rate))
+            print({"batch_size": batch_size, "max_wait_ms": wait_ms, **result})
+
+
+if __name__ == "__main__":
+    main()
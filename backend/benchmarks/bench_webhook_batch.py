@@ -0,0 +1,108 @@
+"""
+Ingestion throughput of single-message vs. batched webhook requests.
+
+The same messages are posted one request per message to /webhook/ and in
+batches to /webhook/batch through an in-process ASGI client, as the demo
+user. Failed CRM attempts are parked as retry jobs, so no request waits on
+a retry.
+
+Usage (requires the Postgres database from create_database.py):
+    python benchmarks/bench_webhook_batch.py --messages 500 --batch-size 100
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import httpx
+from fastapi import FastAPI
+
+from app.api.endpoints import webhook
+from app.db.database import close_pool, db_connection
+from app.services.auth import get_current_active_user
+
+
+def demo_user() -> dict:
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT * FROM users WHERE username = 'demo'")
+            return cur.fetchone()
+
+
+def build_app(user: dict) -> FastAPI:
+    app = FastAPI()
+    app.include_router(webhook.router, prefix="/webhook")
+    app.dependency_overrides[get_current_active_user] = lambda: user
+    return app
+
+
+def messages(count: int) -> list:
+    return [
+        {
+            "message": f"Hi, I'm Bench User{i} from Bench Corp {i}. "
+            f"Reach me at bench{i}@example.com"
+        }
+        for i in range(count)
+    ]
+
+
+async def run(app: FastAPI, payload: list, batch_size: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://bench"
+    ) as client:
+
+        async def single(item):
+            async with semaphore:
+                response = await client.post("/webhook/", json=item)
+                response.raise_for_status()
+
+        async def batch(items):
+            async with semaphore:
+                response = await client.post("/webhook/batch", json=items)
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        if batch_size <= 1:
+            await asyncio.gather(*(single(item) for item in payload))
+        else:
+            await asyncio.gather(
+                *(
+                    batch(payload[i : i + batch_size])
+                    for i in range(0, len(payload), batch_size)
+                )
+            )
+        elapsed = time.perf_counter() - started
+
+    return {
+        "mode": "single" if batch_size <= 1 else f"batch of {batch_size}",
+        "messages": len(payload),
+        "seconds": round(elapsed, 3),
+        "msg_per_sec": round(len(payload) / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    app = build_app(demo_user())
+    payload = messages(args.messages)
+    print(f"{args.messages} messages, concurrency {args.concurrency}")
+    for batch_size in (1, args.batch_size):
+        result = asyncio.run(run(app, payload, batch_size, args.concurrency))
+        print(result)
+    close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Single-message webhook throughput and commits per message.
+
+Posts messages one request each to /webhook/ through an in-process ASGI
+client, as the demo user, and reads the database's commit counter
+(pg_stat_database.xact_commit) before and after to report how many
+transactions each message costs. Every commit waits for a WAL flush, so
+the commit count bounds throughput on real disks.
+
+Usage (requires the Postgres database from create_database.py):
+    python benchmarks/bench_webhook_writes.py --messages 500 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import httpx
+from fastapi import FastAPI
+
+from app.api.endpoints import webhook
+from app.db.database import close_pool, db_connection
+from app.services.auth import get_current_active_user
+
+
+def demo_user() -> dict:
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT * FROM users WHERE username = 'demo'")
+            return cur.fetchone()
+
+
+def commit_count() -> int:
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            # Statistics are cached per transaction; read fresh ones
+            cur.execute("SELECT pg_stat_clear_snapshot()")
+            cur.execute("""
+                SELECT xact_commit FROM pg_stat_database
+                WHERE datname = current_database()
+                """)
+            count = cur.fetchone()["xact_commit"]
+        conn.rollback()
+        return count
+
+
+def build_app(user: dict) -> FastAPI:
+    app = FastAPI()
+    app.include_router(webhook.router, prefix="/webhook")
+    app.dependency_overrides[get_current_active_user] = lambda: user
+    return app
+
+
+async def run(app: FastAPI, messages: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://bench"
+    ) as client:
+
+        async def post(i):
+            async with semaphore:
+                response = await client.post(
+                    "/webhook/",
+                    json={
+                        "message": f"Hi, I'm Bench User{i} from Bench Corp. "
+                        f"Reach me at bench{i}@example.com"
+                    },
+                )
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(post(i) for i in range(messages)))
+        return {"seconds": time.perf_counter() - started}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    app = build_app(demo_user())
+    commits_before = commit_count()
+    result = asyncio.run(run(app, args.messages, args.concurrency))
+    # Backends report their statistics when they exit
+    close_pool()
+    time.sleep(1)
+    commits = commit_count() - commits_before
+
+    print(f"{args.messages} messages, concurrency {args.concurrency}")
+    print(
+        {
+            "seconds": round(result["seconds"], 3),
+            "msg_per_sec": round(args.messages / result["seconds"], 1),
+            "commits_per_msg": round(commits / args.messages, 2),
+        }
+    )
+    close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,55 +1,100 @@
+import asyncio
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from app.api.routes import api_router
+from app.api.pagination import APPROXIMATE_TOTAL_HEADER, NEXT_CURSOR_HEADER
 from app.core.config import settings
 from app.db.init_db import create_tables
-from app.db.database import get_db_connection
+from app.db.migrations import SchemaOutOfDate, check_schema_version
+from app.db.partitions import partition_maintenance_loop
+from app.db.database import close_pool, db_connection, get_pool
+from app.services.crm_adapters import close_crm_adapter
+from app.services.idempotency import REPLAYED_HEADER, idempotency_cleanup_loop
+from app.services.job_queue import job_cleanup_loop, start_job_workers
+from app.services.extraction_cache import extraction_cache_cleanup_loop
+from app.services.llm_executor import llm_executor
+from app.services.webhook_pipeline import get_lead_extractor
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Setup and teardown operations for the FastAPI app."""
-    # Startup: create database tables
-    create_tables()
+    # Startup: make sure the schema is current and warm up the connection pool
+    try:
+        check_schema_version()
+    except SchemaOutOfDate:
+        if not settings.DB_AUTO_MIGRATE:
+            raise
+        create_tables()
+    get_pool().open()
 
     # Log that the application is starting
     app.state.startup_message = "Application startup completed"
     print(f"Starting {app.title} v{app.version}")
 
     # Check database connection and create demo user if needed
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        # Check users table exists and has at least one user
-        cursor.execute("SELECT COUNT(*) FROM users")
-        user_count = cursor.fetchone()[0]
-
-        if user_count == 0:
-            print("Creating demo user...")
-            from app.services.auth import get_password_hash
-
-            hashed_password = get_password_hash("password")
-            cursor.execute(
-                """
-                INSERT INTO users (username, email, hashed_password, is_active)
-                VALUES (%s, %s, %s, %s)
-                """,
-                ("demo", "demo@example.com", hashed_password, True),
-            )
-            conn.commit()
-            print("Demo user created with username 'demo' and password 'password'")
-        else:
-            print(f"Database check passed: {user_count} users found")
-    except Exception as e:
-        print(f"Database check failed: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            # Check users table exists and has at least one user
+            cursor.execute("SELECT COUNT(*) AS count FROM users")
+            user_count = cursor.fetchone()["count"]
+
+            if user_count == 0:
+                print("Creating demo user...")
+                from app.services.auth import get_password_hash
+
+                hashed_password = get_password_hash("password")
+                cursor.execute(
+                    """
+                    INSERT INTO users (username, email, hashed_password, is_active)
+                    VALUES (%s, %s, %s, %s)
+                    """,
+                    ("demo", "demo@example.com", hashed_password, True),
+                )
+                conn.commit()
+                print("Demo user created with username 'demo' and password 'password'")
+            else:
+                print(f"Database check passed: {user_count} users found")
+        except Exception as e:
+            print(f"Database check failed: {e}")
+        finally:
+            cursor.close()
+
+    # Load the extraction model once, before requests arrive
+    lead_extractor = get_lead_extractor()
+
+    # Keep monthly partitions created ahead of time and apply retention
+    partition_maintenance = asyncio.create_task(partition_maintenance_loop())
+
+    # Forget webhook idempotency keys once they expire
+    idempotency_cleanup = asyncio.create_task(idempotency_cleanup_loop())
+
+    # Drop expired extraction results and those of previous prompt versions
+    extraction_cache_cleanup = asyncio.create_task(
+        extraction_cache_cleanup_loop(lead_extractor.cache.version)
+    )
+
+    # Process webhooks accepted in asynchronous mode
+    job_workers = start_job_workers()
+
+    # Delete done and dead jobs once their retention has passed
+    job_cleanup = asyncio.create_task(job_cleanup_loop())
 
     yield
-    # Shutdown: cleanup operations can go here
+    # Shutdown: stop background tasks and release pooled database connections
+    partition_maintenance.cancel()
+    idempotency_cleanup.cancel()
+    extraction_cache_cleanup.cancel()
+    job_cleanup.cancel()
+    for worker in job_workers:
+        worker.cancel()
+    await asyncio.gather(*job_workers, return_exceptions=True)
+    await close_crm_adapter()
+    llm_executor.shutdown()
+    close_pool()
 
 
 app = FastAPI(
@@ -66,6 +111,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, APPROXIMATE_TOTAL_HEADER, REPLAYED_HEADER],
     max_age=86400,  # Cache preflight requests for 24 hours
 )
 
@@ -0,0 +1,33 @@
+import argparse
+import sys
+from app.db.database import db_connection
+from app.db.partitions import PARTITIONED_TABLES, apply_retention, ensure_partitions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Create upcoming monthly partitions and drop expired ones"
+    )
+    parser.add_argument(
+        "--months-ahead", type=int, help="Months of partitions to create ahead"
+    )
+    parser.add_argument(
+        "--retention-months", type=int, help="Months to keep, 0 keeps everything"
+    )
+    parser.add_argument(
+        "--archive-dir", help="Dump expired partitions here as .csv.gz before dropping"
+    )
+    args = parser.parse_args()
+
+    print("==== Cloudilic Partition Maintenance ====")
+    try:
+        with db_connection() as conn:
+            for table in PARTITIONED_TABLES:
+                created = ensure_partitions(conn, table, args.months_ahead)
+                dropped = apply_retention(
+                    conn, table, args.retention_months, args.archive_dir
+                )
+                print(f"{table}: created {created or 'none'}")
+                print(f"{table}: dropped {dropped or 'none'}")
+    except Exception as e:
+        print(f"Error maintaining partitions: {e}")
+        sys.exit(1)
@@ -0,0 +1,118 @@
+"""Initial schema
+
+Creates the tables that create_tables() used to set up on every boot. The
+statements use IF NOT EXISTS so databases created before migrations were
+introduced can be upgraded in place.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 00:00:00
+"""
+
+from alembic import op
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id SERIAL PRIMARY KEY,
+            username VARCHAR UNIQUE NOT NULL,
+            email VARCHAR UNIQUE NOT NULL,
+            hashed_password VARCHAR NOT NULL,
+            is_active BOOLEAN DEFAULT TRUE,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS leads (
+            id SERIAL PRIMARY KEY,
+            name VARCHAR,
+            email VARCHAR,
+            company VARCHAR,
+            raw_message TEXT,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP WITH TIME ZONE,
+            user_id INTEGER REFERENCES users(id)
+        )
+        """
+    )
+
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS crm_attempts (
+            id SERIAL PRIMARY KEY,
+            lead_id INTEGER REFERENCES leads(id),
+            success BOOLEAN DEFAULT FALSE,
+            attempt_number INTEGER,
+            error_message TEXT,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS events (
+            id SERIAL PRIMARY KEY,
+            event_type VARCHAR,
+            event_id VARCHAR UNIQUE,
+            user_id INTEGER REFERENCES users(id),
+            payload TEXT,
+            status VARCHAR,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+
+    # Dashboard rollups maintained by the webhook and CRM write paths
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS user_rollups (
+            user_id INTEGER PRIMARY KEY REFERENCES users(id),
+            total_leads BIGINT NOT NULL DEFAULT 0,
+            successful_crm_saves BIGINT NOT NULL DEFAULT 0,
+            failed_crm_saves BIGINT NOT NULL DEFAULT 0
+        )
+        """
+    )
+
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS lead_hourly_rollups (
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            bucket TIMESTAMP WITH TIME ZONE NOT NULL,
+            lead_count BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, bucket)
+        )
+        """
+    )
+
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS event_type_rollups (
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            event_type VARCHAR NOT NULL,
+            event_count BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, event_type)
+        )
+        """
+    )
+
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS event_type_rollups")
+    op.execute("DROP TABLE IF EXISTS lead_hourly_rollups")
+    op.execute("DROP TABLE IF EXISTS user_rollups")
+    op.execute("DROP TABLE IF EXISTS events")
+    op.execute("DROP TABLE IF EXISTS crm_attempts")
+    op.execute("DROP TABLE IF EXISTS leads")
+    op.execute("DROP TABLE IF EXISTS users")
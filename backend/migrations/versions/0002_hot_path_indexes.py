@@ -0,0 +1,44 @@
+"""Indexes for the hot query paths
+
+Built with CREATE INDEX CONCURRENTLY so the migration can run against a
+live database without blocking writes.
+
+- leads / events listings filter by user_id and order by (created_at, id)
+- CRM attempts are looked up by lead_id, newest attempt first
+- event counts are grouped by event_type per user
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 00:00:00
+"""
+
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    "ix_leads_user_id_created_at_id": "leads (user_id, created_at DESC, id DESC)",
+    "ix_events_user_id_created_at_id": "events (user_id, created_at DESC, id DESC)",
+    "ix_crm_attempts_lead_id_attempt_number": (
+        "crm_attempts (lead_id, attempt_number DESC)"
+    ),
+    "ix_events_user_id_event_type": "events (user_id, event_type)",
+}
+
+
+def upgrade():
+    # CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        for name, definition in INDEXES.items():
+            # A failed concurrent build leaves an INVALID index behind
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            op.execute(f"CREATE INDEX CONCURRENTLY {name} ON {definition}")
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
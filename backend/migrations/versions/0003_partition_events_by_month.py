@@ -0,0 +1,144 @@
+"""Partition events by month
+
+Rebuilds events as a table range-partitioned on created_at with one
+partition per month plus a default partition. Existing rows are copied
+over once, so run this in a maintenance window on large tables; later
+partitions are created ahead of time by app.db.partitions.
+
+Partitioned tables need the partition key in every unique constraint, so
+the primary key becomes (id, created_at) and event_id is indexed rather
+than unique (it is a generated UUID). leads stays unpartitioned because
+crm_attempts.lead_id references leads(id) alone.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 00:00:00
+"""
+
+from datetime import date, datetime, timezone
+
+from alembic import op
+from sqlalchemy import text
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _create_monthly_partitions(first_month, last_month):
+    month = first_month
+    while month <= last_month:
+        name = f"events_{month.year:04d}_{month.month:02d}"
+        upper = _add_months(month, 1)
+        op.execute(
+            f"""
+            CREATE TABLE {name} PARTITION OF events
+            FOR VALUES FROM ('{month.isoformat()} UTC') TO ('{upper.isoformat()} UTC')
+            """
+        )
+        month = _add_months(month, 1)
+
+
+def upgrade():
+    op.execute("ALTER TABLE events RENAME TO events_unpartitioned")
+    op.execute(
+        "ALTER TABLE events_unpartitioned "
+        "RENAME CONSTRAINT events_pkey TO events_unpartitioned_pkey"
+    )
+    op.execute(
+        "ALTER TABLE events_unpartitioned "
+        "RENAME CONSTRAINT events_event_id_key TO events_unpartitioned_event_id_key"
+    )
+    op.execute("DROP INDEX IF EXISTS ix_events_user_id_created_at_id")
+    op.execute("DROP INDEX IF EXISTS ix_events_user_id_event_type")
+
+    op.execute(
+        """
+        CREATE TABLE events (
+            id INTEGER NOT NULL DEFAULT nextval('events_id_seq'),
+            event_type VARCHAR,
+            event_id VARCHAR,
+            user_id INTEGER REFERENCES users(id),
+            payload TEXT,
+            status VARCHAR,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+        """
+    )
+    op.execute("CREATE TABLE events_default PARTITION OF events DEFAULT")
+
+    now = datetime.now(timezone.utc)
+    current_month = date(now.year, now.month, 1)
+    oldest = (
+        op.get_bind()
+        .execute(text("SELECT MIN(created_at) FROM events_unpartitioned"))
+        .scalar()
+    )
+    first_month = (
+        min(date(oldest.year, oldest.month, 1), current_month)
+        if oldest
+        else current_month
+    )
+    _create_monthly_partitions(first_month, _add_months(current_month, MONTHS_AHEAD))
+
+    op.execute(
+        """
+        INSERT INTO events
+            (id, event_type, event_id, user_id, payload, status, created_at)
+        SELECT id, event_type, event_id, user_id, payload, status,
+               COALESCE(created_at, CURRENT_TIMESTAMP)
+        FROM events_unpartitioned
+        """
+    )
+    op.execute("ALTER SEQUENCE events_id_seq OWNED BY events.id")
+    op.execute("DROP TABLE events_unpartitioned")
+
+    # Indexes on the parent cascade to every current and future partition
+    op.execute(
+        "CREATE INDEX ix_events_user_id_created_at_id "
+        "ON events (user_id, created_at DESC, id DESC)"
+    )
+    op.execute(
+        "CREATE INDEX ix_events_user_id_event_type ON events (user_id, event_type)"
+    )
+    op.execute("CREATE INDEX ix_events_event_id ON events (event_id)")
+
+
+def downgrade():
+    op.execute("ALTER TABLE events RENAME TO events_partitioned")
+    op.execute(
+        "ALTER TABLE events_partitioned "
+        "RENAME CONSTRAINT events_pkey TO events_partitioned_pkey"
+    )
+    op.execute(
+        """
+        CREATE TABLE events (
+            id INTEGER PRIMARY KEY DEFAULT nextval('events_id_seq'),
+            event_type VARCHAR,
+            event_id VARCHAR UNIQUE,
+            user_id INTEGER REFERENCES users(id),
+            payload TEXT,
+            status VARCHAR,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    op.execute("INSERT INTO events SELECT * FROM events_partitioned")
+    op.execute("ALTER SEQUENCE events_id_seq OWNED BY events.id")
+    op.execute("DROP TABLE events_partitioned")
+    op.execute(
+        "CREATE INDEX ix_events_user_id_created_at_id "
+        "ON events (user_id, created_at DESC, id DESC)"
+    )
+    op.execute(
+        "CREATE INDEX ix_events_user_id_event_type ON events (user_id, event_type)"
+    )
@@ -0,0 +1,54 @@
+"""Durable job queue
+
+Adds the jobs table polled by the background workers (claimed with
+FOR UPDATE SKIP LOCKED) and events.lead_id, linking a webhook event to the
+lead it produced so clients can follow asynchronous processing.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 00:00:00
+"""
+
+from alembic import op
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id SERIAL PRIMARY KEY,
+            kind VARCHAR(50) NOT NULL,
+            payload JSONB NOT NULL DEFAULT '{}',
+            status VARCHAR(20) NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL,
+            run_after TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            locked_until TIMESTAMP WITH TIME ZONE,
+            locked_by VARCHAR(100),
+            last_error TEXT,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    # Only queued and running jobs are ever scanned by the workers
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS ix_jobs_claimable
+        ON jobs (run_after) WHERE status IN ('queued', 'running')
+        """
+    )
+    op.execute(
+        "ALTER TABLE events ADD COLUMN IF NOT EXISTS lead_id INTEGER "
+        "REFERENCES leads(id)"
+    )
+
+
+def downgrade():
+    op.execute("ALTER TABLE events DROP COLUMN IF EXISTS lead_id")
+    op.execute("DROP TABLE IF EXISTS jobs")
@@ -0,0 +1,67 @@
+"""Denormalized CRM status on leads
+
+Each lead carries the state of its CRM delivery (status, attempt count,
+last attempt time and error), kept up to date in the statement that logs
+an attempt, so the CRM path and the dashboard no longer aggregate
+crm_attempts. crm_attempts stays as the audit log and is used to backfill
+the new columns.
+
+crm_status is one of pending (no attempt yet), deferred (waiting for the
+CRM circuit breaker, no attempt yet), saved or failed (outcome of the
+latest attempt).
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 00:00:00
+"""
+
+from alembic import op
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        """
+        ALTER TABLE leads
+            ADD COLUMN IF NOT EXISTS crm_status VARCHAR(20) NOT NULL DEFAULT 'pending',
+            ADD COLUMN IF NOT EXISTS crm_attempt_count INTEGER NOT NULL DEFAULT 0,
+            ADD COLUMN IF NOT EXISTS crm_last_attempt_at TIMESTAMP WITH TIME ZONE,
+            ADD COLUMN IF NOT EXISTS crm_last_error TEXT
+        """
+    )
+    op.execute(
+        """
+        UPDATE leads
+        SET crm_status = CASE WHEN latest.success THEN 'saved' ELSE 'failed' END,
+            crm_attempt_count = latest.attempts,
+            crm_last_attempt_at = latest.created_at,
+            crm_last_error = latest.error_message
+        FROM (
+            SELECT DISTINCT ON (lead_id)
+                lead_id,
+                success,
+                created_at,
+                error_message,
+                COUNT(*) OVER (PARTITION BY lead_id) AS attempts
+            FROM crm_attempts
+            ORDER BY lead_id, attempt_number DESC
+        ) latest
+        WHERE leads.id = latest.lead_id
+        """
+    )
+
+
+def downgrade():
+    op.execute(
+        """
+        ALTER TABLE leads
+            DROP COLUMN IF EXISTS crm_last_error,
+            DROP COLUMN IF EXISTS crm_last_attempt_at,
+            DROP COLUMN IF EXISTS crm_attempt_count,
+            DROP COLUMN IF EXISTS crm_status
+        """
+    )
@@ -0,0 +1,42 @@
+"""Webhook idempotency keys
+
+Stores the outcome of webhook requests by (user_id, key), either the
+Idempotency-Key header or a content hash, so repeated deliveries replay
+the original response. Rows expire at expires_at and are purged through
+the expires_at index.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 00:00:00
+"""
+
+from alembic import op
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS webhook_idempotency (
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            key VARCHAR(255) NOT NULL,
+            request_hash CHAR(64) NOT NULL,
+            status VARCHAR(20) NOT NULL DEFAULT 'in_progress',
+            status_code INTEGER,
+            response JSONB,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            PRIMARY KEY (user_id, key)
+        )
+        """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_webhook_idempotency_expires_at
+        ON webhook_idempotency (expires_at)
+        """)
+
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS webhook_idempotency")
@@ -0,0 +1,41 @@
+"""Webhook event stage timestamps
+
+Records when each pipeline stage of a webhook event finished, next to
+created_at (the time the message was received), and which extraction
+backend produced the lead, so latency can be broken down per stage.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 00:00:00
+"""
+
+from alembic import op
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+STAGE_COLUMNS = (
+    "extraction_started_at",
+    "extraction_finished_at",
+    "lead_persisted_at",
+    "crm_finished_at",
+)
+
+
+def upgrade():
+    for column in STAGE_COLUMNS:
+        op.execute(
+            f"ALTER TABLE events ADD COLUMN IF NOT EXISTS {column} "
+            "TIMESTAMP WITH TIME ZONE"
+        )
+    op.execute(
+        "ALTER TABLE events ADD COLUMN IF NOT EXISTS extraction_backend VARCHAR(20)"
+    )
+
+
+def downgrade():
+    op.execute("ALTER TABLE events DROP COLUMN IF EXISTS extraction_backend")
+    for column in reversed(STAGE_COLUMNS):
+        op.execute(f"ALTER TABLE events DROP COLUMN IF EXISTS {column}")
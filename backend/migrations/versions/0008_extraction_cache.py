@@ -0,0 +1,37 @@
+"""Extraction cache
+
+Persistent tier of the lead extraction cache: extraction results keyed by
+a hash of the normalized message and the extractor version, expiring at
+expires_at. Rows of other extractor versions are purged by version.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 00:00:00
+"""
+
+from alembic import op
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS extraction_cache (
+            key CHAR(64) PRIMARY KEY,
+            version VARCHAR(64) NOT NULL,
+            result JSONB NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            expires_at TIMESTAMP WITH TIME ZONE NOT NULL
+        )
+        """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_extraction_cache_expires_at
+        ON extraction_cache (expires_at)
+        """)
+
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS extraction_cache")
@@ -0,0 +1,32 @@
+"""CRM error class on leads
+
+Records the class of the error behind a lead's latest failed CRM attempt
+(NULL after a success or before any attempt), so a new push of the lead is
+bounded by the retry policy of that error class instead of the most lenient
+policy. Leads failed before this revision have no class and fall back to
+the default policy.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 00:00:00
+"""
+
+from alembic import op
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        """
+        ALTER TABLE leads
+            ADD COLUMN IF NOT EXISTS crm_last_error_class VARCHAR(50)
+        """
+    )
+
+
+def downgrade():
+    op.execute("ALTER TABLE leads DROP COLUMN IF EXISTS crm_last_error_class")
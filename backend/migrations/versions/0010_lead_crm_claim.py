@@ -0,0 +1,30 @@
+"""CRM delivery claims on leads
+
+A lead being pushed to the CRM is claimed until crm_claimed_until, in a
+transaction committed before the push, so concurrent pushes of the same lead
+are refused instead of both reaching the CRM, and no connection or
+transaction is held over the network call. Claims of a pusher that died
+expire on their own.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 00:00:00
+"""
+
+from alembic import op
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        ALTER TABLE leads
+            ADD COLUMN IF NOT EXISTS crm_claimed_until TIMESTAMP WITH TIME ZONE
+        """)
+
+
+def downgrade():
+    op.execute("ALTER TABLE leads DROP COLUMN IF EXISTS crm_claimed_until")
@@ -0,0 +1,55 @@
+"""Index events by lead_id
+
+A crm_retry job marks the events of its lead with
+UPDATE events ... WHERE lead_id = %s, which otherwise scans every monthly
+partition.
+
+CREATE INDEX CONCURRENTLY is not supported on a partitioned table, so the
+index is created invalid on the parent alone, built concurrently on each
+partition and attached to it; the parent index becomes valid once every
+partition has its own. Partitions attached later by app.db.partitions get
+the index built with the attach.
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-18 00:00:00
+"""
+
+from alembic import op
+from sqlalchemy import text
+
+revision = "0011"
+down_revision = "0010"
+branch_labels = None
+depends_on = None
+
+INDEX = "ix_events_lead_id"
+
+PARTITIONS_QUERY = """
+    SELECT child.relname
+    FROM pg_inherits
+    JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+    JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+    WHERE parent.relname = 'events'
+    ORDER BY child.relname
+"""
+
+
+def upgrade():
+    op.execute(f"CREATE INDEX IF NOT EXISTS {INDEX} ON ONLY events (lead_id)")
+    rows = op.get_bind().execute(text(PARTITIONS_QUERY))
+    partitions = [row[0] for row in rows]
+
+    # CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        for partition in partitions:
+            name = f"{partition}_lead_id_idx"
+            # A failed concurrent build leaves an INVALID index behind
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            op.execute(f"CREATE INDEX CONCURRENTLY {name} ON {partition} (lead_id)")
+            op.execute(f"ALTER INDEX {INDEX} ATTACH PARTITION {name}")
+
+
+def downgrade():
+    # Drops the partitions' indexes along with the parent's
+    op.execute(f"DROP INDEX IF EXISTS {INDEX}")
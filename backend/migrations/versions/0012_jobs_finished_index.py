@@ -0,0 +1,36 @@
+"""Index finished jobs by updated_at
+
+Done and dead jobs are deleted once their retention has passed
+(app.services.job_queue.job_cleanup_loop); the partial index keeps that
+purge from scanning the whole jobs table. Built with CREATE INDEX
+CONCURRENTLY so it does not block the workers.
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-18 00:00:00
+"""
+
+from alembic import op
+
+revision = "0012"
+down_revision = "0011"
+branch_labels = None
+depends_on = None
+
+INDEX = "ix_jobs_finished"
+
+
+def upgrade():
+    # CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        # A failed concurrent build leaves an INVALID index behind
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {INDEX}")
+        op.execute(f"""
+            CREATE INDEX CONCURRENTLY {INDEX}
+            ON jobs (status, updated_at) WHERE status IN ('done', 'dead')
+            """)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {INDEX}")
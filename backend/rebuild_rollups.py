@@ -0,0 +1,20 @@
+import argparse
+import sys
+from app.db.database import db_connection
+from app.services.rollups import rebuild_rollups
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Rebuild the dashboard rollup tables from the raw tables"
+    )
+    parser.add_argument("--user-id", type=int, help="Only rebuild this user")
+    args = parser.parse_args()
+
+    print("==== Cloudilic Rollup Rebuild ====")
+    try:
+        with db_connection() as conn:
+            rebuild_rollups(conn, args.user_id)
+        print("Rollups rebuilt successfully!")
+    except Exception as e:
+        print(f"Error rebuilding rollups: {e}")
+        sys.exit(1)
@@ -0,0 +1,91 @@
+import argparse
+import asyncio
+import random
+
+import uvicorn
+from fastapi import FastAPI
+from pydantic import BaseModel
+from typing import List
+
+# Local stand-in for the CRM, speaking the protocol of HTTPCRMAdapter, to
+# load-test lead pushes and retries offline. Run it and start the backend
+# with CRM_ADAPTER=http CRM_URL=http://localhost:9000.
+
+
+class StubConfig(BaseModel):
+    latency_ms: float = 50.0  # per request, whatever the batch size
+    failure_rate: float = 0.2  # share of leads answered with a 503
+    rate_limit_rate: float = 0.0  # share of leads answered with a 429
+    reject_rate: float = 0.0  # share of leads answered with a 422
+
+
+class StubLead(BaseModel):
+    id: int
+    name: str
+    email: str
+    company: str
+
+
+class StubBatch(BaseModel):
+    leads: List[StubLead]
+
+
+app = FastAPI(title="Cloudilic Stub CRM")
+app.state.config = StubConfig()
+app.state.stats = {"requests": 0, "leads": 0, "saved": 0, "failed": 0}
+
+
+def _outcome(lead: StubLead) -> dict:
+    config = app.state.config
+    roll = random.random()
+    for status, rate, error in (
+        (503, config.failure_rate, "CRM temporarily unavailable"),
+        (429, config.rate_limit_rate, "Too many requests"),
+        (422, config.reject_rate, "Lead rejected"),
+    ):
+        if roll < rate:
+            app.state.stats["failed"] += 1
+            return {"id": lead.id, "ok": False, "status": status, "error": error}
+        roll -= rate
+    app.state.stats["saved"] += 1
+    return {"id": lead.id, "ok": True}
+
+
+@app.post("/leads/batch")
+async def push_leads(batch: StubBatch):
+    """Save a batch of leads, reporting an outcome per lead."""
+    await asyncio.sleep(app.state.config.latency_ms / 1000)
+    app.state.stats["requests"] += 1
+    app.state.stats["leads"] += len(batch.leads)
+    return {"results": [_outcome(lead) for lead in batch.leads]}
+
+
+@app.get("/stats")
+async def stats():
+    return {"config": app.state.config, **app.state.stats}
+
+
+@app.put("/config")
+async def update_config(config: StubConfig):
+    """Change latency and failure rates without restarting the stub."""
+    app.state.config = config
+    return config
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the local stub CRM")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--failure-rate", type=float, default=0.2)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--reject-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    app.state.config = StubConfig(
+        latency_ms=args.latency_ms,
+        failure_rate=args.failure_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        reject_rate=args.reject_rate,
+    )
+    print("==== Cloudilic Stub CRM ====")
+    uvicorn.run(app, host="127.0.0.1", port=args.port)
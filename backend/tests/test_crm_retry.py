@@ -0,0 +1,157 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import psycopg2
+import pytest
+
+# Add the parent directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.config import settings
+from app.db.database import DB_PARAMS, db_connection
+from app.services.auth import get_authenticated_user, get_current_active_user
+from app.services.crm_service import RetryPolicy, policy_for_lead
+from app.services.rollups import rebuild_rollups
+
+# Requires the Postgres database from create_database.py
+
+
+def database_available() -> bool:
+    try:
+        psycopg2.connect(**DB_PARAMS, connect_timeout=2).close()
+        return True
+    except psycopg2.OperationalError:
+        return False
+
+
+requires_db = pytest.mark.skipif(
+    not database_available(), reason="Postgres database not available"
+)
+
+
+RETRY_MESSAGES = [
+    f"I'm Retry Test{index}, retry{index}@example.com" for index in range(10)
+]
+
+
+def delete_test_rows(user_id: int):
+    """Delete the leads, events, attempts and jobs of RETRY_MESSAGES."""
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT id FROM leads WHERE user_id = %s AND raw_message = ANY(%s)",
+                (user_id, RETRY_MESSAGES),
+            )
+            lead_ids = [row["id"] for row in cursor.fetchall()]
+            cursor.execute(
+                """
+                DELETE FROM jobs
+                WHERE kind = 'crm_retry' AND (payload->>'lead_id')::int = ANY(%s)
+                """,
+                (lead_ids,),
+            )
+            cursor.execute(
+                "DELETE FROM crm_attempts WHERE lead_id = ANY(%s)", (lead_ids,)
+            )
+            cursor.execute(
+                """
+                DELETE FROM events
+                WHERE user_id = %s AND (lead_id = ANY(%s) OR payload = ANY(%s))
+                """,
+                (user_id, lead_ids, RETRY_MESSAGES),
+            )
+            cursor.execute("DELETE FROM leads WHERE id = ANY(%s)", (lead_ids,))
+        conn.commit()
+        # The dashboard rollups counted them too
+        rebuild_rollups(conn, user_id)
+
+
+def test_backoff_is_exponential_with_full_jitter():
+    policy = RetryPolicy(max_attempts=5, base_delay=2, max_delay=10)
+    for attempt, ceiling in ((1, 2), (2, 4), (3, 8), (4, 10), (5, 10)):
+        delays = [policy.delay(attempt) for _ in range(200)]
+        assert all(0 <= delay <= ceiling for delay in delays)
+        assert max(delays) > ceiling / 2
+
+
+def test_attempts_are_bounded_by_the_last_error_policy(monkeypatch):
+    monkeypatch.setattr(settings, "CRM_MAX_RETRIES", 3)
+    assert policy_for_lead(None).max_attempts == 3
+    assert policy_for_lead("CRMTransientError").max_attempts == 3
+    assert policy_for_lead("CRMRateLimitError").max_attempts == 5
+    assert policy_for_lead("CRMRejectedError").max_attempts == 1
+
+
+@pytest.fixture
+def app(monkeypatch):
+    from main import app
+
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT * FROM users WHERE username = 'demo'")
+            user = cursor.fetchone()
+
+    # Every CRM call fails and the retries are due far in the future
+    monkeypatch.setattr(settings, "CRM_ADAPTER", "simulated")
+    monkeypatch.setattr(settings, "CRM_SIMULATED_FAILURE_RATE", 1.0)
+    monkeypatch.setattr(settings, "CRM_RETRY_DELAY", 60)
+    app.dependency_overrides[get_current_active_user] = lambda: user
+    app.dependency_overrides[get_authenticated_user] = lambda: user
+    yield app
+    app.dependency_overrides.clear()
+    delete_test_rows(user["id"])
+
+
+@requires_db
+@pytest.mark.asyncio
+async def test_pending_retries_do_not_block_concurrent_requests(app):
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    ) as client:
+
+        async def post_webhook(index):
+            response = await client.post(
+                "/api/v1/webhook/",
+                json={"message": RETRY_MESSAGES[index]},
+            )
+            assert response.status_code == 200
+            return response
+
+        async def health_latency():
+            started = time.perf_counter()
+            response = await client.get("/api/v1/health/")
+            assert response.status_code == 200
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(post_webhook(index) for index in range(10)),
+            *(health_latency() for _ in range(10)),
+        )
+        elapsed = time.perf_counter() - started
+
+    # Without the scheduler each webhook would sleep through its retries
+    assert elapsed < settings.CRM_RETRY_DELAY
+    assert max(results[10:]) < 5
+
+    emails = [response.json()["email"] for response in results[:10]]
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT COUNT(*) AS pending, MIN(j.run_after) > now() AS in_future
+                FROM jobs j
+                JOIN leads l ON l.id = (j.payload->>'lead_id')::int
+                WHERE j.kind = 'crm_retry' AND j.status = 'queued'
+                  AND l.email = ANY(%s)
+                """,
+                (emails,),
+            )
+            parked = cursor.fetchone()
+
+    # Each failed lead is parked for a later attempt instead of retried inline
+    assert parked["pending"] == 10
+    assert parked["in_future"]
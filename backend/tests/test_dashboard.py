@@ -0,0 +1,72 @@
+import sys
+from pathlib import Path
+
+import httpx
+import psycopg2
+import pytest
+
+# Add the parent directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.db.database import DB_PARAMS, db_connection
+from app.services.auth import get_current_active_user
+
+# Requires the Postgres database from create_database.py
+
+
+def database_available() -> bool:
+    try:
+        psycopg2.connect(**DB_PARAMS, connect_timeout=2).close()
+        return True
+    except psycopg2.OperationalError:
+        return False
+
+
+requires_db = pytest.mark.skipif(
+    not database_available(), reason="Postgres database not available"
+)
+
+
+@pytest.fixture
+def app():
+    from main import app
+
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT * FROM users WHERE username = 'demo'")
+            user = cursor.fetchone()
+
+    app.dependency_overrides[get_current_active_user] = lambda: user
+    yield app
+    app.dependency_overrides.clear()
+
+
+@requires_db
+@pytest.mark.asyncio
+@pytest.mark.parametrize("granularity, buckets", [("hour", 48), ("day", 60)])
+async def test_windows_longer_than_a_day_keep_every_bucket(app, granularity, buckets):
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        response = await client.get(
+            "/api/v1/dashboard/stats",
+            params={"granularity": granularity, "buckets": buckets},
+        )
+
+    assert response.status_code == 200
+    assert len(response.json()["leads_per_time"]) == buckets
+
+
+@requires_db
+@pytest.mark.asyncio
+@pytest.mark.parametrize("granularity, buckets", [("minute", 1441), ("hour", 745)])
+async def test_windows_are_capped_per_granularity(app, granularity, buckets):
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        response = await client.get(
+            "/api/v1/dashboard/stats",
+            params={"granularity": granularity, "buckets": buckets},
+        )
+
+    assert response.status_code == 422
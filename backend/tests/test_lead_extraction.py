@@ -0,0 +1,192 @@
+import asyncio
+import contextlib
+import sys
+import types
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Add the parent directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.lead_extractor import LLM_BACKEND, RULES_BACKEND, LeadExtractor
+from app.services.lead_rules import extract_with_rules
+from app.services.llm_executor import InferenceQueueFull
+from app.services.local_llm import LocalSeq2SeqLLM
+from app.services.micro_batcher import MicroBatcher
+
+
+class RecordingLLM:
+    """Model answering every field, recording the prompts it was given."""
+
+    def __init__(self):
+        self.prompts = []
+
+    def predict(self, prompt: str) -> str:
+        self.prompts.append(prompt)
+        return (
+            '```json\n{"name": "Model Name", "email": "model@example.com", '
+            '"company": "Model Co"}\n```'
+        )
+
+    def batch(self, prompts: list, return_exceptions: bool = False) -> list:
+        return [self.predict(prompt) for prompt in prompts]
+
+
+def make_extractor():
+    extractor = LeadExtractor()
+    extractor.llm = RecordingLLM()
+    extractor.cache.persist = False
+    return extractor
+
+
+def test_rules_score_explicit_phrases_above_loose_ones():
+    fields = extract_with_rules(
+        "Hi, my name is Jane Doe, founder of Acme Labs. jane@acme.io"
+    )
+    assert fields["name"] == ("Jane Doe", 0.9)
+    assert fields["email"] == ("jane@acme.io", 1.0)
+    assert fields["company"] == ("Acme Labs", 0.9)
+
+    fields = extract_with_rules("Write to a@x.io or b@x.io, we met with Team Blue")
+    assert fields["email"][1] < 0.8
+    assert fields["company"][1] < 0.8
+    assert "name" not in fields
+
+
+@pytest.mark.parametrize(
+    "message, field, wrong_value",
+    [
+        ("Hi, can we meet at Starbucks? jo@example.com", "company", "Starbucks"),
+        ("I am writing from London, jo@example.com", "company", "London"),
+        ("This is Acme Corp support, jo@example.com", "name", "Acme Corp"),
+        (
+            "I'm Interested In your product, jo@example.com. from Bob Jones",
+            "name",
+            "Interested In",
+        ),
+        (
+            "I'm Interested In your product, jo@example.com. from Bob Jones",
+            "company",
+            "Bob Jones",
+        ),
+        ("Thanks for the demo. Best Regards", "name", "Best Regards"),
+    ],
+)
+def test_ambiguous_phrases_are_not_confident(message, field, wrong_value):
+    fields = extract_with_rules(message)
+    if field in fields:
+        value, confidence = fields[field]
+        assert value != wrong_value or confidence < 0.8
+
+    extractor = make_extractor()
+    assert extractor.resolve_with_rules(message) is None
+    _, backend = asyncio.run(extractor.extract_with_backend(message))
+    assert backend == LLM_BACKEND
+
+
+def test_confident_rules_skip_the_model():
+    extractor = make_extractor()
+    info, backend = asyncio.run(
+        extractor.extract_with_backend(
+            "I'm Sarah Connor from Cyberdyne Systems, sarah@cyberdyne.com"
+        )
+    )
+    assert backend == RULES_BACKEND
+    assert info == {
+        "name": "Sarah Connor",
+        "email": "sarah@cyberdyne.com",
+        "company": "Cyberdyne Systems",
+    }
+    assert extractor.llm.prompts == []
+    assert extractor.stats()["tiers"][RULES_BACKEND] == 1
+
+
+def test_model_is_only_asked_for_unresolved_fields():
+    extractor = make_extractor()
+    info, backend = asyncio.run(
+        extractor.extract_with_backend("Please call me back, jane@acme.io")
+    )
+    assert backend == LLM_BACKEND
+    # The rule email is kept, the model fills the rest
+    assert info == {
+        "name": "Model Name",
+        "email": "jane@acme.io",
+        "company": "Model Co",
+    }
+    (prompt,) = extractor.llm.prompts
+    assert '"name": string' in prompt and '"company": string' in prompt
+    assert '"email": string' not in prompt
+    assert extractor.stats()["llm_field_share"] == round(2 / 3, 4)
+
+
+def test_batcher_sheds_load_beyond_max_pending():
+    async def batch_fn(items):
+        await asyncio.sleep(0.01)
+        return items
+
+    async def main():
+        batcher = MicroBatcher(
+            batch_fn, max_batch_size=2, max_wait=1, max_concurrency=1, max_pending=3
+        )
+        results = await asyncio.gather(
+            *(batcher.submit(item) for item in range(6)), return_exceptions=True
+        )
+        return results, batcher.stats()
+
+    results, stats = asyncio.run(main())
+    # The first batch of two runs, three more items wait, the sixth is refused
+    assert results[:5] == [0, 1, 2, 3, 4]
+    assert isinstance(results[5], InferenceQueueFull)
+    assert stats["rejected"] == 1
+
+
+class StubTokenizer:
+    """Tokenizer recording the batches it encodes; token 0 is the padding."""
+
+    pad_token_id = 0
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, prompts, **kwargs):
+        self.batches.append(list(prompts))
+        return {"input_ids": np.ones((len(prompts), 4), dtype=int)}
+
+    def batch_decode(self, outputs, skip_special_tokens=False):
+        return [" ".join(str(token) for token in row if token) for row in outputs]
+
+
+class StubSeq2SeqModel:
+    """Answers prompt i with i + 1 tokens after the decoder start token."""
+
+    def generate(self, input_ids, max_new_tokens, do_sample):
+        outputs = np.zeros((len(input_ids), len(input_ids) + 1), dtype=int)
+        for row in range(len(input_ids)):
+            outputs[row, 1 : row + 2] = 7
+        return outputs
+
+
+def test_local_llm_batches_prompts_into_one_generate_call(monkeypatch):
+    # The model is not loaded and torch only provides inference_mode
+    monkeypatch.setattr(LocalSeq2SeqLLM, "_load", lambda self: None)
+    monkeypatch.setitem(
+        sys.modules,
+        "torch",
+        types.SimpleNamespace(inference_mode=contextlib.nullcontext),
+    )
+    llm = LocalSeq2SeqLLM(model_path="stub")
+    llm._tokenizer = StubTokenizer()
+    llm._model = StubSeq2SeqModel()
+
+    assert llm.batch(["first", "second", "third"]) == ["7", "7 7", "7 7 7"]
+    assert llm._tokenizer.batches == [["first", "second", "third"]]
+    # The decoder start token and the padding are not generated tokens
+    assert llm.stats() == {
+        "model_path": "stub",
+        "quantized": False,
+        "calls": 1,
+        "prompts": 3,
+        "generated_tokens": 6,
+    }
@@ -0,0 +1,54 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add the parent directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.db.pool import ConnectionPool
+
+
+class FakeConnection:
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def failing_connect(successes: int):
+    """connect callable returning `successes` connections, then failing."""
+    calls = []
+
+    def connect():
+        calls.append(None)
+        if len(calls) > successes:
+            raise ConnectionError("database unavailable")
+        return FakeConnection()
+
+    return connect
+
+
+def test_failed_open_releases_the_slots_it_did_not_fill():
+    pool = ConnectionPool(failing_connect(2), min_size=5, max_size=5, pre_ping=False)
+
+    with pytest.raises(ConnectionError):
+        pool.open()
+
+    stats = pool.stats()
+    assert stats["size"] == 2
+    assert stats["idle"] == 2
+    assert stats["in_use"] == 0
+
+
+def test_open_fills_the_pool_again_after_a_failure():
+    pool = ConnectionPool(failing_connect(2), min_size=3, max_size=3, pre_ping=False)
+    with pytest.raises(ConnectionError):
+        pool.open()
+
+    pool._connect = FakeConnection
+    pool.open()
+
+    assert pool.stats()["size"] == 3
+    assert pool.stats()["idle"] == 3
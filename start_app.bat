@@ -5,7 +5,7 @@ echo ================================================
 echo.
 
 REM Start the backend in a new window
-start cmd /k "cd %~dp0backend && python -m uvicorn main:app --reload"
+start cmd /k "cd %~dp0backend && python create_database.py && python -m uvicorn main:app --reload"
 
 REM Wait a moment for the backend to start
 timeout /t 3 /nobreak > nul